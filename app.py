@@ -1,14 +1,45 @@
 # -*- coding: utf-8 -*-
 import sys
+from modules.startup import StartupClock, warm_up, importtime_report
+from modules.perf import PERF
+
+_clock = StartupClock()     # mốc 0 = lúc bắt đầu chạy app.py
+
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 from ui.theme import apply_electric_theme   # <-- import theme
 
+_clock.mark("imports")
+
+
 def main():
-    app = QApplication(sys.argv)
+    # --startup-report: in thời gian các pha + bảng -X importtime khi khởi động xong
+    # --perf: bật đo đường nóng + bảng p50/p95 (Ctrl+Shift+P trong app)
+    report = "--startup-report" in sys.argv
+    if "--perf" in sys.argv:
+        PERF.enabled = True
+    argv = [a for a in sys.argv if a not in ("--startup-report", "--perf")]
+
+    app = QApplication(argv)
     apply_electric_theme(app)               # <-- GỌI theme Ở ĐÂY
     win = MainWindow()
+    _clock.mark("window built")
     win.show()
+    # module nặng (pandas, openpyxl, pygame, gTTS, matplotlib) nạp trên thread nền
+    # sau khi cửa sổ đã hiện; lần dùng đầu không phải chờ import
+    def _on_warm(took):
+        if not report:
+            return
+        print(_clock.report())
+        print("warm-up (background thread):      ms")
+        for name, ms in took.items():
+            print(f"  {name:<32} {ms:8.1f}")
+        print(importtime_report("ui.main_window"))
+
+    warm_up(clock=_clock, on_done=_on_warm)
+    QTimer.singleShot(0, lambda: _clock.mark("event loop running"))
+
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
+import heapq
 from datetime import datetime
-from typing import Optional, Dict, Tuple, Callable
+from typing import Optional, Dict, List, Tuple, Callable
 
 def due(now: datetime, at: Optional[datetime]) -> bool:
     if not at:
@@ -21,3 +22,99 @@ def check_and_fire(
                 say(messages.get(key, key))
                 flags[key] = True
     return flags
+
+
+# ---- Scheduler theo sự kiện (thay cho polling 1 Hz) ----
+# độ ưu tiên phát (nhỏ = phát trước, xem AudioWorker): hết HOLD / xong lệnh nối
+# quan trọng hơn mốc đạt tải, mốc 429 chỉ là nhắc
+ALARM_PRIORITIES: Dict[str, int] = {
+    "override": 0,
+    "hold_10_min": 0,
+    "holding_complete": 1,
+    "final_load": 1,
+    "429": 2,
+}
+DEFAULT_ALARM_PRIORITY = 1
+
+def fire_time(at: datetime) -> datetime:
+    """Mốc phát thực tế: đầu phút của `at` (cùng quy ước với due())."""
+    return at.replace(second=0, microsecond=0)
+
+
+class AlarmScheduler:
+    """
+    Hàng đợi báo động dạng min-heap (fire_time, key, message).
+    - Mỗi key chỉ có 1 mốc hiệu lực; đặt lại key -> entry cũ trong heap bị bỏ qua khi pop (lazy delete).
+    - Không tự chạy timer: bên ngoài (QTimer single-shot) hỏi next_due() để hẹn giờ,
+      đến hạn thì gọi fire_due(now).
+    - say(message, priority=...) nhận độ ưu tiên theo key (priorities, mặc định ALARM_PRIORITIES).
+    """
+
+    def __init__(self, say: Callable[..., None], priorities: Optional[Dict[str, int]] = None):
+        self._say = say
+        self.priorities = dict(ALARM_PRIORITIES if priorities is None else priorities)
+        self._heap: List[Tuple[datetime, str, str]] = []
+        self._live: Dict[str, Tuple[datetime, str]] = {}   # key -> (fire_time, message) hiện hành
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def schedule(self, key: str, at: Optional[datetime], message: str) -> None:
+        """Đặt/đổi mốc cho key; at=None -> huỷ."""
+        if not at:
+            self.cancel(key)
+            return
+        entry = (fire_time(at), key, message)
+        self._live[key] = (entry[0], message)
+        heapq.heappush(self._heap, entry)
+
+    def cancel(self, key: str) -> None:
+        self._live.pop(key, None)
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._live.clear()
+
+    def set_timeline(
+        self,
+        timeline: Dict[str, Optional[datetime]],    # {"429": dt, "holding_complete": dt, ...}
+        flags: Dict[str, bool],                     # key đã phát -> bỏ qua
+        messages: Dict[str, str],
+    ) -> None:
+        """Nạp lại toàn bộ timeline (gọi khi Enter/override/reset)."""
+        self.clear()
+        for key, t_alarm in timeline.items():
+            if t_alarm and not flags.get(key, False):
+                self.schedule(key, t_alarm, messages.get(key, key))
+
+    def _drop_stale(self) -> None:
+        while self._heap:
+            at, key, message = self._heap[0]
+            if self._live.get(key) == (at, message):
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[datetime]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def priority(self, key: str) -> int:
+        return self.priorities.get(key, DEFAULT_ALARM_PRIORITY)
+
+    def fire_due(self, now: datetime) -> List[str]:
+        """
+        Phát mọi báo động đã đến hạn, trả về các key đã phát.
+        Nhiều mốc cùng đến hạn -> gửi theo độ ưu tiên rồi theo thời gian.
+        """
+        due_now: List[Tuple[datetime, str, str]] = []
+        while True:
+            at = self.next_due()
+            if at is None or at > now:
+                break
+            entry = heapq.heappop(self._heap)
+            del self._live[entry[1]]
+            due_now.append(entry)
+        due_now.sort(key=lambda e: (self.priority(e[1]), e[0]))
+        for _, key, message in due_now:
+            self._say(message, priority=self.priority(key))
+        return [key for _, key, _ in due_now]
@@ -1,17 +1,317 @@
 # -*- coding: utf-8 -*-
 import io
-from gtts import gTTS
-import pygame
+import os
+import time
+import heapq
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
-def tts_and_play(message: str, lang: str = "en"):
+# pygame/gTTS/pyttsx3 import lười (lần phát/tổng hợp đầu tiên) -> không làm chậm lúc mở app
+
+# ---- backend tổng hợp giọng nói: (text, lang) -> (bytes, định dạng "mp3"/"wav") ----
+SynthBackend = Callable[[str, str], Tuple[bytes, str]]
+
+
+def gtts_backend(text: str, lang: str) -> Tuple[bytes, str]:
+    """Google TTS (cần mạng)."""
+    from gtts import gTTS
+    audio_stream = io.BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(audio_stream)
+    return audio_stream.getvalue(), "mp3"
+
+
+def pyttsx3_backend(text: str, lang: str) -> Tuple[bytes, str]:
+    """Offline (SAPI5/espeak/nsss qua pyttsx3) – cho phòng điều khiển không có mạng; `lang` chỉ để làm khoá cache."""
+    import tempfile
+    import pyttsx3
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
     try:
-        tts = gTTS(text=message, lang=lang)
-        audio_stream = io.BytesIO()
-        tts.write_to_fp(audio_stream)
-        audio_stream.seek(0)
-        if not pygame.mixer.get_init():
-            pygame.mixer.init()
-        pygame.mixer.music.load(audio_stream, "mp3")
-        pygame.mixer.music.play()
-    except Exception as e:
-        print(f"❌ TTS error: {e}")
+        engine = pyttsx3.init()
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read(), "wav"
+    finally:
+        os.remove(path)
+
+
+_BACKENDS: Dict[str, SynthBackend] = {
+    "gtts": gtts_backend,
+    "pyttsx3": pyttsx3_backend,
+}
+
+
+class AudioCache:
+    """
+    Cache audio theo nội dung, khoá = sha1(lang + text):
+      - tầng RAM: LRU (maxsize bản ghi)
+      - tầng đĩa: <cache_dir>/<key>.<fmt> (giữ qua các lần chạy)
+    Trượt cả 2 tầng mới gọi backend để tổng hợp.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, *, maxsize: int = 32,
+                 backend: Union[str, SynthBackend] = "gtts"):
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), ".load_change", "tts_cache")
+        self.maxsize = maxsize
+        self._mem: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.set_backend(backend)
+
+    def set_backend(self, backend: Union[str, SynthBackend]) -> None:
+        if isinstance(backend, str):
+            if backend not in _BACKENDS:
+                raise ValueError(f"Unknown TTS backend: {backend!r} (available: {', '.join(_BACKENDS)})")
+            backend = _BACKENDS[backend]
+        self.backend = backend
+
+    @staticmethod
+    def key(text: str, lang: str) -> str:
+        return hashlib.sha1(f"{lang}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, item: Tuple[bytes, str]) -> None:
+        with self._lock:
+            self._mem[key] = item
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.maxsize:
+                self._mem.popitem(last=False)
+
+    def _load_disk(self, key: str) -> Optional[Tuple[bytes, str]]:
+        for fmt in ("mp3", "wav"):
+            path = os.path.join(self.cache_dir, f"{key}.{fmt}")
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    return f.read(), fmt
+        return None
+
+    def _save_disk(self, key: str, item: Tuple[bytes, str]) -> None:
+        data, fmt = item
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, f"{key}.{fmt}")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)   # ghi nguyên tử: không để lại file dở khi đang phát
+
+    def in_memory(self, text: str, lang: str = "en") -> bool:
+        """Đã có trong tầng RAM (không đọc đĩa – gọi được từ thread GUI)."""
+        with self._lock:
+            return self.key(text, lang) in self._mem
+
+    def get(self, text: str, lang: str = "en") -> Optional[Tuple[bytes, str]]:
+        """Chỉ đọc cache (RAM -> đĩa), không tổng hợp."""
+        key = self.key(text, lang)
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                self._mem.move_to_end(key)
+                return item
+        item = self._load_disk(key)
+        if item is not None:
+            self._remember(key, item)
+        return item
+
+    def get_or_synthesize(self, text: str, lang: str = "en") -> Tuple[bytes, str]:
+        item = self.get(text, lang)
+        if item is None:
+            item = self.backend(text, lang)
+            key = self.key(text, lang)
+            try:
+                self._save_disk(key, item)
+            except OSError as e:
+                print(f"⚠️ TTS cache write failed: {e}")
+            self._remember(key, item)
+        return item
+
+
+_audio_cache = AudioCache()
+
+
+def set_tts_backend(backend: Union[str, SynthBackend]) -> None:
+    """Đổi backend tổng hợp, vd set_tts_backend("pyttsx3") khi không có mạng."""
+    _audio_cache.set_backend(backend)
+
+
+class SynthWorker:
+    """
+    1 thread tổng hợp sống suốt app (thay vì mỗi lần presynthesize 1 thread mới):
+      - bỏ qua câu đã có trong cache RAM, đang chờ/đang tổng hợp, hoặc vừa lỗi
+        (trong retry_after_s) -> offline không in lại cùng lỗi sau mỗi lần Enter
+      - lỗi chỉ in 1 lần cho mỗi câu trong mỗi chu kỳ thử lại
+    """
+
+    def __init__(self, cache: AudioCache, *, retry_after_s: float = 300.0):
+        self.cache = cache
+        self.retry_after_s = retry_after_s
+        self._queue: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._inflight: set = set()                         # {(text, lang)} đang chờ + đang tổng hợp
+        self._failed: Dict[Tuple[str, str], float] = {}     # (text, lang) -> monotonic lúc lỗi
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def _skip(self, item: Tuple[str, str]) -> bool:
+        if item in self._inflight:
+            return True
+        failed_at = self._failed.get(item)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_after_s:
+            return True
+        return self.cache.in_memory(*item)
+
+    def submit(self, texts: Iterable[str], lang: str = "en") -> int:
+        """Xếp các câu cần tổng hợp; trả về số câu thực sự được xếp."""
+        added = 0
+        with self._cond:
+            for text in dict.fromkeys(texts):
+                item = (text, lang)
+                if not text or self._skip(item):
+                    continue
+                self._queue[item] = None
+                self._inflight.add(item)
+                added += 1
+            if added:
+                self._cond.notify()
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="tts-presynth", daemon=True)
+                    self._thread.start()
+        return added
+
+    def synthesize(self, text: str, lang: str = "en") -> bool:
+        """Tổng hợp 1 câu vào cache (đĩa + RAM); lỗi được ghi nhận để không thử lại ngay."""
+        item = (text, lang)
+        try:
+            self.cache.get_or_synthesize(text, lang)
+        except Exception as e:
+            with self._cond:
+                self._failed[item] = time.monotonic()
+            print(f"❌ TTS presynthesis error ({text!r}): {e}")
+            return False
+        with self._cond:
+            self._failed.pop(item, None)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                item, _ = self._queue.popitem(last=False)
+            try:
+                self.synthesize(*item)
+            finally:
+                with self._cond:
+                    self._inflight.discard(item)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._inflight)
+
+
+_synth_worker = SynthWorker(_audio_cache)
+
+
+def presynthesize(messages: Iterable[str], lang: str = "en", *, background: bool = True) -> int:
+    """
+    Tổng hợp trước các câu báo động vào cache để lúc phát chỉ cần đọc bytes.
+    Mặc định xếp vào thread tổng hợp dùng chung (không chặn GUI); trả về số câu được xếp.
+    """
+    if background:
+        return _synth_worker.submit(messages, lang)
+    texts = [m for m in dict.fromkeys(messages) if m]
+    return sum(_synth_worker.synthesize(text, lang) for text in texts)
+
+
+def _play_blocking(data: bytes, fmt: str, poll_s: float = 0.05) -> None:
+    """Phát 1 đoạn và chờ phát xong (chỉ gọi từ thread audio)."""
+    import pygame
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    pygame.mixer.music.load(io.BytesIO(data), fmt)
+    pygame.mixer.music.play()
+    while pygame.mixer.music.get_busy():
+        time.sleep(poll_s)
+
+
+class AudioWorker:
+    """
+    Thread audio riêng: hàng đợi ưu tiên các câu thông báo, phát lần lượt.
+      - không cắt ngang: câu đang phát luôn được phát hết
+      - priority nhỏ = phát trước; cùng priority thì theo thứ tự gửi
+      - bỏ trùng: câu (text, lang) đang chờ thì không xếp thêm
+      - hàng đợi có giới hạn: đầy thì bỏ câu kém ưu tiên nhất
+    UI thread chỉ gọi submit() (không chờ I/O audio).
+    """
+
+    def __init__(self, cache: AudioCache, *, maxsize: int = 16):
+        self.cache = cache
+        self.maxsize = maxsize
+        self._heap: List[Tuple[int, int, str, str]] = []    # (priority, seq, text, lang)
+        self._pending: set = set()                          # {(text, lang)}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="audio-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def submit(self, text: str, lang: str = "en", priority: int = 0) -> bool:
+        """Xếp 1 câu vào hàng đợi; False nếu bị bỏ (trùng / đầy)."""
+        with self._cond:
+            if (text, lang) in self._pending:
+                return False
+            if len(self._heap) >= self.maxsize:
+                worst = max(self._heap)
+                if (priority, next(self._seq)) >= worst[:2]:
+                    print(f"⚠️ Audio queue full, dropped: {text!r}")
+                    return False
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                self._pending.discard((worst[2], worst[3]))
+                print(f"⚠️ Audio queue full, dropped: {worst[2]!r}")
+            heapq.heappush(self._heap, (priority, next(self._seq), text, lang))
+            self._pending.add((text, lang))
+            self._cond.notify()
+        self.start()
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                _, _, text, lang = heapq.heappop(self._heap)
+                self._pending.discard((text, lang))
+            try:
+                data, fmt = self.cache.get_or_synthesize(text, lang)
+                _play_blocking(data, fmt)
+            except Exception as e:
+                print(f"❌ TTS error: {e}")
+
+
+_audio_worker = AudioWorker(_audio_cache)
+
+
+def tts_and_play(message: str, lang: str = "en", priority: int = 0) -> bool:
+    """Không chặn: xếp câu vào thread audio (phát sau câu đang phát, không cắt ngang)."""
+    return _audio_worker.submit(message, lang, priority)
@@ -0,0 +1,463 @@
+# modules/bench.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark các đường nóng Enter → vẽ lại trên dữ liệu tổng hợp cố định, so với baseline.
+
+    python -m modules.bench                     # chạy + so với benchmarks/baseline.json (chưa có -> ghi)
+    python -m modules.bench --update            # ghi lại baseline (sau khi đã chấp nhận thay đổi)
+    python -m modules.bench -k densify --quick  # lọc theo tên, bỏ các case 1M dòng
+    python -m modules.bench --list
+
+Nhóm case:
+  - ramp:    compute_power_change_and_pauses (không cache) theo cỡ ramp x chế độ Puls,
+             "+dense" = kèm sinh mảng theo giây (times_array/powers_array) như lúc vẽ
+  - plot_df: build_plot_df + densify_uniform trên 1k/100k/1M dòng
+  - energy:  energy_summary_mwh trên plot DF 1k/100k/1M dòng
+  - excel:   ExcelUpdater.append_data trên workbook có sẵn 100/1k/10k dòng
+  - draw:    draw_main_and_joined + canvas.draw (Agg, không cần màn hình) và PlotRenderer.update
+             như app dùng: "blit" = trục không đổi (restore nền + vẽ artist), "draw" = vẽ đầy đủ;
+             mỗi kiểu đo cả giảm điểm (mặc định) lẫn ",full" (max_points=0) để thấy lợi của decimate
+
+Mỗi case đo thời gian/lần gọi (ms) qua nhiều vòng, GC tắt khi đo; so với baseline theo vòng
+nhanh nhất (min – ít nhiễu nhất với case dưới 1 ms), median/p95 chỉ để tham khảo.
+Chậm hơn baseline quá `tolerance` lần và quá `min_delta_ms` -> REGRESSION, exit code 1.
+Case trên 1 ms đo ít nhất SLOW_MIN_ROUNDS vòng dù hết budget, để min không phụ thuộc 1-2 vòng.
+
+Baseline phụ thuộc máy nên KHÔNG commit (benchmarks/baseline.json nằm trong .gitignore):
+lần chạy đầu trên máy mới tự ghi baseline rồi thoát 0; thông tin máy lưu kèm, khác máy thì
+cảnh báo (vẫn so). CI: khôi phục benchmarks/baseline.json từ cache theo loại runner
+(key = OS + python), chạy `python -m modules.bench --quick`; job trên nhánh chính sau khi merge
+chạy thêm `--quick --update` rồi lưu lại cache – baseline luôn đo trên cùng loại máy với PR.
+Cache mất / đổi loại runner -> lần đầu chỉ ghi baseline, lần sau mới so.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "benchmarks", "baseline.json")
+DEFAULT_TOLERANCE = 1.5         # chậm hơn 1.5x baseline = hồi quy
+DEFAULT_MIN_DELTA_MS = 0.25     # bỏ qua chênh lệch tuyệt đối nhỏ (nhiễu lịch CPU ở case micro-giây)
+
+# dữ liệu tổng hợp cố định: cùng seed + cùng mốc giờ -> cùng input ở mọi lần chạy
+SEED = 20240101
+T0 = datetime(2024, 1, 1, 8, 0)
+ROW_SIZES = (1_000, 100_000, 1_000_000)
+RAMP_SIZES = ((420, 440), (200, 560), (560, 100))
+PULS_MODES = ("3 Puls", "4 Puls")
+EXCEL_ROWS = (100, 1_000, 10_000)
+DRAW_POINTS = 20_000            # ~5.5 giờ theo giây
+SLOW_MS = 1.0                   # case chậm hơn ngưỡng này ...
+SLOW_MIN_ROUNDS = 7             # ... đo ít nhất ngần này vòng
+
+
+@dataclass(frozen=True)
+class BenchCase:
+    name: str
+    group: str
+    setup: Callable[[], Any]                    # chuẩn bị dữ liệu (không tính giờ)
+    run: Callable[[Any], Any]                   # phần được đo
+    teardown: Optional[Callable[[Any], None]] = None
+    heavy: bool = False                         # bỏ qua với --quick
+
+
+# ---- dữ liệu tổng hợp ----
+def synthetic_plot_inputs(n: int, *, seed: int = SEED) -> Dict[str, Any]:
+    """
+    Input cho build_plot_df: main n điểm cách 1 giây (ramp 200→429, hold, →462, hold, →560
+    + nhiễu nhỏ), joined n//2 điểm từ trim_time (429→300), 2 cửa sổ hold, các mốc sự kiện.
+    """
+    rng = np.random.default_rng(seed)
+    t0 = np.datetime64(T0, "ns")
+    sec = np.int64(1_000_000_000)
+
+    def at(frac: float) -> datetime:
+        return T0 + timedelta(seconds=int(frac * n))
+
+    # knot theo tỉ lệ độ dài: ramp, hold @429, ramp, hold @462, ramp
+    knots_f = np.array([0.0, 0.25, 0.35, 0.42, 0.52, 1.0])
+    knots_mw = np.array([200.0, 429.0, 429.0, 462.0, 462.0, 560.0])
+    i = np.arange(n, dtype=np.float64)
+    main_y = np.interp(i / max(n - 1, 1), knots_f, knots_mw) + rng.normal(0.0, 0.05, n)
+    main_x = t0 + np.arange(n, dtype=np.int64) * sec
+
+    trim_time = at(0.6)
+    m = n // 2
+    joined_x = np.datetime64(trim_time, "ns") + np.arange(m, dtype=np.int64) * sec
+    joined_y = np.interp(np.arange(m, dtype=np.float64), [0.0, max(m - 1, 1)], [429.0, 300.0])
+
+    hold_windows = [(at(0.25), at(0.35), "Hold @429"), (at(0.42), at(0.52), "Hold @462")]
+    events = {
+        "t_429": at(0.25), "post_pause": at(0.35),
+        "hold_start_462": at(0.42), "hold_end_462": at(0.52),
+        "override_done": trim_time + timedelta(seconds=m - 1),
+    }
+    return {
+        "main_xy": {"x": main_x, "y": main_y},
+        "joined_xy": {"x": joined_x, "y": joined_y},
+        "trim_time": trim_time,
+        "trim_mw": 429.0,
+        "hold_windows": hold_windows,
+        "events": events,
+    }
+
+
+def _plot_df(inp: Dict[str, Any]):
+    from modules.df_plot import build_plot_df
+    return build_plot_df(
+        main_xy=inp["main_xy"],
+        joined_xy=inp["joined_xy"],
+        trim_time=inp["trim_time"],
+        trim_mw=inp["trim_mw"],
+        hold_windows=[(a, b) for a, b, _ in inp["hold_windows"]],
+        events=inp["events"],
+    )
+
+
+# ---- các case ----
+def _ramp_cases() -> List[BenchCase]:
+    from modules.power_logic import CalcConfig, compute_power_change_and_pauses
+
+    def make(start, target, mode, dense):
+        cfg = CalcConfig(pulverizer_mode=mode)
+
+        def run(_):
+            res = compute_power_change_and_pauses(start, target, T0, cfg)
+            if dense:
+                res.times_array, res.powers_array
+            return res
+        tag = "+dense" if dense else ""
+        return BenchCase(f"ramp[{start}-{target},{mode}]{tag}", "ramp", lambda: None, run)
+
+    return [make(s, t, mode, dense)
+            for s, t in RAMP_SIZES for mode in PULS_MODES for dense in (False, True)]
+
+
+def _plot_df_cases() -> List[BenchCase]:
+    def run(inp):
+        from modules.df_plot import densify_uniform
+        return densify_uniform(
+            _plot_df(inp),
+            step_minutes=1,
+            hold_windows_labeled=inp["hold_windows"],
+            plateau_429=429.0,
+            plateau_462=462.0,
+        )
+    return [BenchCase(f"build_plot_df+densify[{n}]", "plot_df",
+                      (lambda n=n: synthetic_plot_inputs(n)), run, heavy=n >= 1_000_000)
+            for n in ROW_SIZES]
+
+
+def _energy_cases() -> List[BenchCase]:
+    def run(df):
+        from modules.energy import energy_summary_mwh
+        return energy_summary_mwh(df)
+    return [BenchCase(f"energy_summary_mwh[{n}]", "energy",
+                      (lambda n=n: _plot_df(synthetic_plot_inputs(n))), run, heavy=n >= 1_000_000)
+            for n in ROW_SIZES]
+
+
+def _excel_row(i: int) -> dict:
+    target = 300 + (i % 260)
+    return {
+        "time_now": T0 + timedelta(minutes=i),
+        "start_power": 429,
+        "target_power": target,
+        "start_time_str": (T0 + timedelta(minutes=i)).strftime("%H:%M"),
+        "copy_text": f"Increase Unit load to {target} MW/Tăng tải lên {target} MW",
+    }
+
+
+def _excel_cases() -> List[BenchCase]:
+    def make(n_rows, buffered):
+        def setup():
+            from openpyxl import Workbook
+            from modules.excel_io import ExcelUpdater
+            tmp = tempfile.TemporaryDirectory(prefix="bench-xlsx-")
+            path = os.path.join(tmp.name, "bench.xlsx")
+            wb = Workbook()
+            ws = wb.active
+            keys = list(_excel_row(0).keys())
+            ws.append(keys)
+            for i in range(n_rows):
+                ws.append(list(_excel_row(i).values()))
+            wb.save(path)
+            # flush_interval_s lớn: buffered chỉ đẩy ra sidecar theo số dòng
+            upd = ExcelUpdater(path, buffered=buffered, flush_interval_s=3600.0)
+            return {"tmp": tmp, "upd": upd, "i": n_rows}
+
+        def run(state):
+            state["i"] += 1
+            state["upd"].append_data(_excel_row(state["i"]))
+
+        def teardown(state):
+            state["upd"].close()            # gộp sidecar ngay, atexit sau đó không còn gì để ghi
+            state["tmp"].cleanup()
+
+        tag = ",buffered" if buffered else ""
+        return BenchCase(f"excel_append_data[{n_rows}{tag}]", "excel", setup, run, teardown)
+
+    return [make(n, False) for n in EXCEL_ROWS] + [make(EXCEL_ROWS[-1], True)]
+
+
+def _draw_cases() -> List[BenchCase]:
+    def make(max_points):
+        def setup():
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            fig = Figure(figsize=(8, 4), dpi=100)
+            canvas = FigureCanvasAgg(fig)
+            ax = fig.add_subplot(111)
+            inp = synthetic_plot_inputs(DRAW_POINTS)
+            return {"ax": ax, "canvas": canvas, "inp": inp}
+
+        def run(state):
+            from modules.plotting import draw_main_and_joined
+            inp = state["inp"]
+            draw_main_and_joined(
+                state["ax"],
+                main_xy=inp["main_xy"],
+                joined_segments={"t": inp["joined_xy"]["x"], "mw": inp["joined_xy"]["y"]},
+                hold_windows=inp["hold_windows"],
+                trim_time=inp["trim_time"], trim_mw=inp["trim_mw"],
+                start_time=inp["trim_time"], start_mw=inp["trim_mw"],
+                main_keep=[inp["events"][k] for k in ("t_429", "post_pause", "hold_start_462")],
+                max_points=max_points,
+            )
+            state["canvas"].draw()
+
+        tag = "" if max_points is None else ",full"
+        return BenchCase(f"draw_main_and_joined[{DRAW_POINTS}{tag}]", "draw", setup, run)
+
+    def make_renderer(max_points, full_draw):
+        def setup():
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            from modules.plotting import PlotRenderer
+            fig = Figure(figsize=(8, 4), dpi=100)
+            canvas = FigureCanvasAgg(fig)
+            renderer = PlotRenderer(fig.add_subplot(111), max_points=max_points)
+            inp = synthetic_plot_inputs(DRAW_POINTS)
+            main, joined = inp["main_xy"], inp["joined_xy"]
+            ev = inp["events"]
+            args = dict(
+                main_xy=main,
+                joined_segments={"t": joined["x"], "mw": joined["y"]},
+                hold_windows=inp["hold_windows"],
+                trim_time=inp["trim_time"], trim_mw=inp["trim_mw"],
+                start_time=inp["trim_time"], start_mw=inp["trim_mw"],
+                # overlay như plot DF đã densify theo phút
+                overlay={"main": (main["x"][::60], main["y"][::60]),
+                         "joined": (joined["x"][::60], joined["y"][::60]),
+                         "events": (np.array(list(ev.values()), dtype="datetime64[ns]"),
+                                    np.interp(np.arange(len(ev)), [0, len(ev) - 1], [429.0, 462.0]))},
+                main_keep=[ev[k] for k in ("t_429", "post_pause", "hold_start_462", "hold_end_462")],
+            )
+            renderer.update(**args)
+            canvas.draw()           # chụp nền -> các lần update sau đi đường blit
+            return {"renderer": renderer, "args": args}
+
+        def run(state):
+            renderer = state["renderer"]
+            if full_draw:
+                renderer._bg = None     # như khi giới hạn trục/legend đổi: vẽ đầy đủ
+            renderer.update(**state["args"])
+
+        tag = ("draw" if full_draw else "blit") + ("" if max_points is None else ",full")
+        return BenchCase(f"PlotRenderer.update[{DRAW_POINTS},{tag}]", "draw", setup, run)
+
+    return ([make(None), make(0)]
+            + [make_renderer(mp, fd) for fd in (False, True) for mp in (None, 0)])
+
+
+CASE_GROUPS: Dict[str, Callable[[], List[BenchCase]]] = {
+    "ramp": _ramp_cases,
+    "plot_df": _plot_df_cases,
+    "energy": _energy_cases,
+    "excel": _excel_cases,
+    "draw": _draw_cases,
+}
+
+
+def all_cases() -> List[BenchCase]:
+    out: List[BenchCase] = []
+    for group, factory in CASE_GROUPS.items():
+        try:
+            out.extend(factory())
+        except ImportError as e:       # thiếu openpyxl/matplotlib... -> bỏ nhóm, không dừng cả suite
+            print(f"[WARN] bench: bỏ nhóm {group}: {e}")
+    return out
+
+
+# ---- đo ----
+def time_case(case: BenchCase, *, budget_s: float = 0.5, min_rounds: int = 3,
+              max_rounds: int = 200) -> Dict[str, float]:
+    """
+    1 lần chạy làm nóng, sau đó đo tới khi hết budget_s (ít nhất min_rounds vòng,
+    SLOW_MIN_ROUNDS nếu lần làm nóng chậm hơn SLOW_MS).
+    """
+    state = case.setup()
+    try:
+        t = time.perf_counter()
+        case.run(state)
+        if (time.perf_counter() - t) * 1000.0 > SLOW_MS:
+            min_rounds = max(min_rounds, SLOW_MIN_ROUNDS)
+        samples: List[float] = []
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            while len(samples) < max_rounds:
+                t = time.perf_counter()
+                case.run(state)
+                samples.append((time.perf_counter() - t) * 1000.0)
+                if len(samples) >= min_rounds and time.perf_counter() - start >= budget_s:
+                    break
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    finally:
+        if case.teardown:
+            case.teardown(state)
+    arr = np.asarray(samples)
+    return {
+        "median_ms": float(np.median(arr)),
+        "min_ms": float(arr.min()),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "rounds": len(samples),
+    }
+
+
+def machine_info() -> Dict[str, str]:
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, float]], *,
+                  old: Optional[dict] = None, tolerance: float = DEFAULT_TOLERANCE) -> None:
+    """Ghi min/median của các case vừa chạy; case không chạy lần này (lọc -k/--quick) giữ baseline cũ."""
+    cases = dict((old or {}).get("cases", {}))
+    cases.update({name: {"min_ms": round(r["min_ms"], 4), "median_ms": round(r["median_ms"], 4)}
+                  for name, r in results.items()})
+    data = {
+        "machine": machine_info(),
+        "tolerance": (old or {}).get("tolerance", tolerance),
+        "updated": datetime.now().isoformat(timespec="seconds"),
+        "cases": dict(sorted(cases.items())),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: dict, *,
+            tolerance: float, min_delta_ms: float = DEFAULT_MIN_DELTA_MS) -> Dict[str, str]:
+    """name -> "ok" | "new" | "faster" | "REGRESSION"."""
+    base = baseline.get("cases", {})
+    status = {}
+    for name, r in results.items():
+        ref = base.get(name, {}).get("min_ms")
+        cur = r["min_ms"]
+        if ref is None:
+            status[name] = "new"
+        elif cur > ref * tolerance and cur - ref > min_delta_ms:
+            status[name] = "REGRESSION"
+        elif cur * tolerance < ref and ref - cur > min_delta_ms:
+            status[name] = "faster"
+        else:
+            status[name] = "ok"
+    return status
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m modules.bench",
+        description="Benchmark power_logic / df_plot / energy / excel_io / plotting, so với baseline.",
+    )
+    ap.add_argument("-k", dest="pattern", help="chỉ chạy case có tên chứa chuỗi này")
+    ap.add_argument("--quick", action="store_true", help="bỏ các case nặng (1M dòng)")
+    ap.add_argument("--list", action="store_true", help="liệt kê tên case rồi thoát")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE, help="file baseline JSON")
+    ap.add_argument("--update", action="store_true", help="ghi kết quả lần này vào baseline")
+    ap.add_argument("--tolerance", type=float, help="hệ số chậm cho phép (mặc định theo baseline, 1.5)")
+    ap.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA_MS,
+                    help="chênh lệch tuyệt đối tối thiểu (ms) mới tính là hồi quy")
+    ap.add_argument("--budget", type=float, default=0.5, help="thời gian đo mỗi case (giây)")
+    ap.add_argument("--json", dest="json_out", help="ghi kết quả chi tiết ra file JSON")
+    args = ap.parse_args(argv)
+
+    cases = [c for c in all_cases()
+             if (not args.pattern or args.pattern in c.name) and not (args.quick and c.heavy)]
+    if args.list:
+        for c in cases:
+            print(f"{c.group:<8} {c.name}")
+        return 0
+    if not cases:
+        print("[WARN] bench: không có case nào khớp", file=sys.stderr)
+        return 2
+
+    baseline = load_baseline(args.baseline)
+    tolerance = args.tolerance or (baseline or {}).get("tolerance", DEFAULT_TOLERANCE)
+    if baseline and baseline.get("machine") != machine_info():
+        print(f"[WARN] baseline đo trên máy khác: {baseline.get('machine')}")
+
+    results: Dict[str, Dict[str, float]] = {}
+    for c in cases:
+        try:
+            results[c.name] = time_case(c, budget_s=args.budget)
+        except ImportError as e:
+            print(f"[WARN] bench: bỏ {c.name}: {e}")
+
+    status = compare(results, baseline, tolerance=tolerance, min_delta_ms=args.min_delta) if baseline else {}
+    base_cases = (baseline or {}).get("cases", {})
+    print(f"{'case':<44} {'min ms':>10} {'median ms':>10} {'p95 ms':>10} {'baseline':>10} {'ratio':>6}  status")
+    for name, r in results.items():
+        ref = base_cases.get(name, {}).get("min_ms")
+        ratio = f"{r['min_ms'] / ref:6.2f}" if ref else f"{'—':>6}"
+        ref_s = f"{ref:10.3f}" if ref is not None else f"{'—':>10}"
+        print(f"{name:<44} {r['min_ms']:10.3f} {r['median_ms']:10.3f} {r['p95_ms']:10.3f} {ref_s} {ratio}  "
+              f"{status.get(name, 'no baseline')}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine_info(), "results": results, "status": status}, f, indent=2)
+
+    if args.update or baseline is None:
+        # chưa có baseline (máy/CI cache mới): lần này chỉ ghi, lần sau mới so
+        save_baseline(args.baseline, results, old=baseline, tolerance=tolerance)
+        print(f"[IO] baseline -> {args.baseline}")
+        return 0
+
+    regressions = [n for n, s in status.items() if s == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSION (> {tolerance:g}x baseline): " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# modules/compute_worker.py
+# -*- coding: utf-8 -*-
+"""
+Tính dữ liệu đồ thị ngoài thread GUI.
+
+- PlotRequest: ảnh chụp (bất biến) trạng thái widget cần cho 1 lần vẽ.
+- compute_plot_frame(req) -> PlotFrame: build_plot_df + densify_uniform + MWh
+  + mảng overlay; hàm thuần, không đụng Qt -> chạy được trên thread bất kỳ.
+- ComputeWorker: 1 thread nền, chỉ giữ kết quả MỚI NHẤT: lệnh chưa chạy bị huỷ khi
+  có lệnh mới, lệnh đã chạy xong nhưng cũ (ticket < ticket mới nhất) thì bỏ kết quả.
+  Báo kết quả qua callback on_result(ticket, result) / on_error(ticket, msg) – gọi từ
+  thread nền; bên UI nối vào Qt Signal (xem ui/compute_bridge.py).
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Callable, Mapping, Optional, Tuple
+
+import numpy as np
+
+from modules.perf import span, timed
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+XY = Tuple[np.ndarray, np.ndarray]
+HoldWindow = Tuple[datetime, datetime, str]
+
+
+def _frozen_xy(xs, ys) -> XY:
+    """Bản sao chỉ-đọc (thread GUI có gán lại mảng cũng không ảnh hưởng lệnh đang tính)."""
+    x = np.array(xs, dtype="datetime64[ns]")
+    y = np.array(ys, dtype=np.float64)
+    x.setflags(write=False)
+    y.setflags(write=False)
+    return x, y
+
+
+@dataclass(frozen=True)
+class PlotRequest:
+    main: Optional[XY]                  # ramp chính theo giây
+    joined: Optional[XY]                # plan nối lệnh (cột t/mw)
+    main_breakpoints: XY
+    joined_breakpoints: Optional[XY]
+    trim_time: Optional[datetime]
+    trim_mw: Optional[float]
+    hold_windows: Tuple[HoldWindow, ...]
+    events: Mapping[str, Optional[datetime]]
+    plateau_429: float
+    plateau_462: float
+    step_minutes: int = 1
+
+    @classmethod
+    def snapshot(cls, *, main_xy, joined_xy, main_breakpoints, joined_breakpoints,
+                 trim_time, trim_mw, hold_windows, events, plateau_429, plateau_462,
+                 step_minutes: int = 1) -> "PlotRequest":
+        """Tạo request từ dữ liệu dạng {"x","y"} của widget (sao chép + khoá ghi)."""
+        def xy(d):
+            return _frozen_xy(d["x"], d["y"]) if d else None
+        return cls(
+            main=xy(main_xy),
+            joined=xy(joined_xy),
+            main_breakpoints=xy(main_breakpoints) or _frozen_xy([], []),
+            joined_breakpoints=xy(joined_breakpoints),
+            trim_time=trim_time,
+            trim_mw=trim_mw,
+            hold_windows=tuple(tuple(hw) for hw in (hold_windows or [])),
+            events=MappingProxyType(dict(events or {})),
+            plateau_429=plateau_429,
+            plateau_462=plateau_462,
+            step_minutes=step_minutes,
+        )
+
+
+@dataclass(frozen=True)
+class PlotFrame:
+    df: pd.DataFrame                        # plot DF đã densify (không sửa tại chỗ)
+    summary: Mapping[str, float]            # origin/override/total/hold/ramp MWh
+    overlay: Mapping[str, XY]               # "main" / "joined" / "events" (mảng chỉ-đọc)
+
+
+def _overlay_arrays(df: pd.DataFrame) -> Mapping[str, XY]:
+    overlay = {}
+    if df is None or df.empty:
+        return MappingProxyType(overlay)
+    dfo = df.sort_values(["seg_id", "t"], kind="stable")
+    for key, part in (("main", dfo[dfo["source"] == "main"]),
+                      ("joined", dfo[dfo["source"] == "joined"]),
+                      ("events", dfo[dfo["evt"].notna()])):
+        if not part.empty:
+            overlay[key] = _frozen_xy(part["t"].to_numpy(), part["mw"].to_numpy())
+    return MappingProxyType(overlay)
+
+
+@timed("compute_plot_frame")
+def compute_plot_frame(req: PlotRequest, *, echo: bool = False) -> PlotFrame:
+    """DF hậu cắt-ghép + densify + MWh dạng đóng + overlay, từ 1 PlotRequest."""
+    # pandas (qua df_plot/energy) import ở lần tính đầu tiên, trên thread nền
+    from modules.df_plot import build_plot_df, densify_uniform, trim_and_join_xy
+    from modules.energy import energy_summary_from_breakpoints
+
+    def as_dict(xy):
+        return {"x": xy[0], "y": xy[1]} if xy is not None else None
+
+    df = build_plot_df(
+        main_xy=as_dict(req.main) or {"x": [], "y": []},
+        joined_xy=as_dict(req.joined),
+        trim_time=req.trim_time,
+        trim_mw=req.trim_mw,
+        hold_windows=[(hw[0], hw[1]) for hw in req.hold_windows if len(hw) >= 2],   # (start,end) để is_hold
+        events=dict(req.events),
+    )
+    # Nội suy đều cả main + joined; ép phẳng vùng hold
+    df = densify_uniform(
+        df,
+        step_minutes=req.step_minutes,
+        hold_windows_labeled=list(req.hold_windows),
+        plateau_429=req.plateau_429,
+        plateau_462=req.plateau_462,
+    )
+    # tích phân dạng đóng trên điểm gãy (cùng cắt-ghép như DF), không phụ thuộc lưới densify
+    bp_main, bp_joined = trim_and_join_xy(
+        as_dict(req.main_breakpoints),
+        as_dict(req.joined_breakpoints),
+        trim_time=req.trim_time,
+        trim_mw=req.trim_mw,
+    )
+    summary = energy_summary_from_breakpoints(
+        bp_main, bp_joined,
+        hold_windows_labeled=list(req.hold_windows),
+        plateau_429=req.plateau_429,
+        plateau_462=req.plateau_462,
+    )
+    if echo:
+        with span("plot_df.echo"):
+            print("\n=== PLOT_DF (first 40 rows) ===")
+            print(df.head(40).to_string(index=False))
+    return PlotFrame(df=df, summary=MappingProxyType(summary), overlay=_overlay_arrays(df))
+
+
+class ComputeWorker:
+    """Thread tính nền, chỉ giao kết quả của lệnh gửi sau cùng."""
+
+    def __init__(
+        self,
+        *,
+        on_result: Optional[Callable[[int, Any], None]] = None,
+        on_error: Optional[Callable[[int, str], None]] = None,
+    ):
+        self.on_result = on_result
+        self.on_error = on_error
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plot-compute")
+        self._lock = threading.Lock()
+        self._ticket = 0
+        self._future: Optional[Future] = None
+        self.cancelled = 0      # lệnh bị huỷ trước khi chạy
+        self.stale = 0          # lệnh chạy xong nhưng kết quả đã cũ
+
+    @property
+    def latest(self) -> int:
+        return self._ticket
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> int:
+        """Xếp fn(*args, **kwargs); huỷ lệnh cũ còn chờ. Trả về ticket của lệnh."""
+        with self._lock:
+            self._ticket += 1
+            ticket = self._ticket
+            if self._future is not None and self._future.cancel():
+                self.cancelled += 1
+            self._future = self._pool.submit(self._run, ticket, fn, args, kwargs)
+        return ticket
+
+    def cancel(self) -> None:
+        """Bỏ mọi kết quả đang chờ/đang tính (vd khi reset)."""
+        with self._lock:
+            self._ticket += 1
+            if self._future is not None and self._future.cancel():
+                self.cancelled += 1
+
+    def _is_stale(self, ticket: int) -> bool:
+        with self._lock:
+            return ticket != self._ticket
+
+    def _run(self, ticket: int, fn, args, kwargs) -> None:
+        if self._is_stale(ticket):
+            self.stale += 1
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if not self._is_stale(ticket) and self.on_error:
+                self.on_error(ticket, str(e))
+            return
+        if self._is_stale(ticket):
+            self.stale += 1
+            return
+        if self.on_result:
+            self.on_result(ticket, result)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Chờ lệnh mới nhất tính xong; False nếu hết timeout."""
+        with self._lock:
+            fut = self._future
+        if fut is None:
+            return True
+        try:
+            fut.result(timeout)
+        except Exception:
+            return fut.done()
+        return True
+
+    def close(self) -> None:
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
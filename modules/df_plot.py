@@ -2,50 +2,131 @@
 from __future__ import annotations
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
+from modules.perf import timed
+
 # ---- helpers: cắt đến trim_time, ghép mối hàn ----
-def _trim_main_until(xs: List[datetime],
-                     ys: List[float],
+def _as_arrays(xs, ys) -> Tuple[np.ndarray, np.ndarray]:
+    """list hoặc mảng -> (datetime64[ns], float64) cùng độ dài; không copy nếu đã đúng kiểu."""
+    xs = np.asarray(xs, dtype="datetime64[ns]")
+    ys = np.asarray(ys, dtype=np.float64)
+    n = min(len(xs), len(ys))
+    return xs[:n], ys[:n]
+
+def _is_sorted(xs: np.ndarray) -> bool:
+    return len(xs) < 2 or not (xs[1:] < xs[:-1]).any()
+
+def _trim_main_until(xs, ys,
                      trim_time: Optional[datetime],
-                     trim_mw: Optional[float]) -> Tuple[List[datetime], List[float]]:
-    if not xs or not ys or trim_time is None:
+                     trim_mw: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+    xs, ys = _as_arrays(xs, ys)
+    if len(xs) == 0 or trim_time is None:
         return xs, ys
-    kept_x, kept_y = [], []
-    for t, y in zip(xs, ys):
-        if t <= trim_time:
-            kept_x.append(t)
-            kept_y.append(y)
+    tt = np.datetime64(trim_time, "ns")
+    if _is_sorted(xs):
+        # chuỗi đã sort: cắt bằng tìm kiếm nhị phân (view, không copy)
+        stop = np.searchsorted(xs, tt, side="right")
+        kept_x, kept_y = xs[:stop], ys[:stop]
+    else:
+        keep = xs <= tt
+        kept_x, kept_y = xs[keep], ys[keep]
     # “mối hàn” tại trim_time
-    if (not kept_x) or (kept_x[-1] < trim_time):
-        kept_x.append(trim_time)
-        kept_y.append(trim_mw if trim_mw is not None else (kept_y[-1] if kept_y else 0.0))
+    if len(kept_x) == 0 or kept_x[-1] < tt:
+        fill = trim_mw if trim_mw is not None else (kept_y[-1] if len(kept_y) else 0.0)
+        kept_x = np.append(kept_x, tt)
+        kept_y = np.append(kept_y, fill)
     return kept_x, kept_y
 
-def _prepare_joined_from(xs: List[datetime],
-                         ys: List[float],
+def _prepare_joined_from(xs, ys,
                          trim_time: Optional[datetime],
-                         trim_mw: Optional[float]) -> Tuple[List[datetime], List[float]]:
-    if not xs or not ys or trim_time is None:
+                         trim_mw: Optional[float]) -> Tuple[np.ndarray, np.ndarray]:
+    xs, ys = _as_arrays(xs, ys)
+    if len(xs) == 0 or trim_time is None:
         return xs, ys
-    jx, jy = [], []
-    for t, y in zip(xs, ys):
-        if t >= trim_time:
-            jx.append(t)
-            jy.append(y)
-    # chèn điểm đầu = trim_time (nếu thiếu) để khớp mối hàn
-    if jx:
-        if jx[0] > trim_time:
-            jx.insert(0, trim_time)
-            jy.insert(0, trim_mw if trim_mw is not None else jy[0])
+    tt = np.datetime64(trim_time, "ns")
+    if _is_sorted(xs):
+        start = np.searchsorted(xs, tt, side="left")
+        jx, jy = xs[start:], ys[start:]
     else:
-        # không có điểm nào >= trim_time, có thể vẫn cần 1 điểm mồi để thể hiện mối hàn
-        if trim_time is not None and trim_mw is not None:
-            jx = [trim_time]
-            jy = [trim_mw]
+        keep = xs >= tt
+        jx, jy = xs[keep], ys[keep]
+    # chèn điểm đầu = trim_time (nếu thiếu) để khớp mối hàn
+    if len(jx):
+        if jx[0] > tt:
+            jx = np.insert(jx, 0, tt)
+            jy = np.insert(jy, 0, trim_mw if trim_mw is not None else jy[0])
+    elif trim_mw is not None:
+        # không có điểm nào >= trim_time, vẫn cần 1 điểm mồi để thể hiện mối hàn
+        jx = np.array([tt])
+        jy = np.array([trim_mw], dtype=np.float64)
     return jx, jy
 
+def _hold_mask(t_ns: np.ndarray, hold_windows) -> np.ndarray:
+    """
+    is_hold cho từng điểm (t_ns: int64 nano giây) bằng quét khoảng:
+    gộp các window [hs, he] đã sort rồi tra searchsorted một lượt.
+    """
+    wins = sorted(
+        (np.datetime64(hs, "ns").astype(np.int64), np.datetime64(he, "ns").astype(np.int64))
+        for hs, he in hold_windows
+        if hs is not None and he is not None and hs <= he
+    )
+    if not wins:
+        return np.zeros(len(t_ns), dtype=bool)
+    starts, ends = [wins[0][0]], [wins[0][1]]
+    for hs, he in wins[1:]:
+        if hs <= ends[-1]:
+            ends[-1] = max(ends[-1], he)
+        else:
+            starts.append(hs)
+            ends.append(he)
+    starts, ends = np.array(starts), np.array(ends)
+    idx = np.searchsorted(starts, t_ns, side="right") - 1
+    return (idx >= 0) & (t_ns <= ends[np.maximum(idx, 0)])
+
+def _nearest_rows(t_ns: np.ndarray, evt_ns: np.ndarray) -> np.ndarray:
+    """
+    Với mỗi mốc sự kiện: chỉ số dòng có |t - t_evt| nhỏ nhất
+    (hoà thì lấy dòng đứng trước – giống idxmin), kiểu merge_asof direction="nearest".
+    """
+    order = np.argsort(t_ns, kind="stable")
+    ts = t_ns[order]
+    n = len(ts)
+    pos = np.searchsorted(ts, evt_ns, side="left")
+    right = np.minimum(pos, n - 1)
+    # đầu nhóm các dòng trùng thời điểm bên trái
+    left = np.searchsorted(ts, ts[np.maximum(pos - 1, 0)], side="left")
+    d_right = np.where(pos < n, np.abs(ts[right] - evt_ns), np.iinfo(np.int64).max)
+    d_left = np.where(pos > 0, evt_ns - ts[left], np.iinfo(np.int64).max)
+    row_left, row_right = order[left], order[right]
+    pick_left = (d_left < d_right) | ((d_left == d_right) & (row_left < row_right))
+    return np.where(pick_left, row_left, row_right)
+
 # ---- public API ----
+def trim_and_join_xy(
+    main_xy: Dict[str, List],
+    joined_xy: Optional[Dict[str, List]] = None,
+    *,
+    trim_time: Optional[datetime] = None,
+    trim_mw: Optional[float] = None,
+) -> Tuple[Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+    """
+    Cắt main đến trim_time và ghép joined từ trim_time (đúng như khi vẽ),
+    trả về ((mx, my), (jx, jy)) dạng mảng. Dùng được cho cả điểm dày lẫn
+    điểm gãy (breakpoints) – vd để tính MWh mà không cần dựng DataFrame.
+    """
+    mx, my = main_xy.get("x", []), main_xy.get("y", [])
+    mx, my = _trim_main_until(mx, my, trim_time, trim_mw)
+
+    jx, jy = _as_arrays([], [])
+    if joined_xy:
+        jx, jy = joined_xy.get("x", []), joined_xy.get("y", [])
+        jx, jy = _prepare_joined_from(jx, jy, trim_time, trim_mw)
+    return (mx, my), (jx, jy)
+
+@timed("build_plot_df")
 def build_plot_df(
     main_xy: Dict[str, List],
     joined_xy: Optional[Dict[str, List]] = None,
@@ -67,53 +148,55 @@ def build_plot_df(
       - evt: Optional[str]  (gắn label sự kiện vào điểm gần nhất)
 
     Params:
-      - main_xy: {"x": [datetime], "y": [float]}
+      - main_xy: {"x": [datetime] | datetime64[ns], "y": [float] | float64}
+        (mảng NumPy được dùng trực tiếp, không copy sang list)
       - joined_xy: {"x": [...], "y": [...]}, nếu có đoạn nối/override
       - trim_time/trim_mw: mốc cắt và giá trị MW tại “mối hàn”
       - hold_windows: list[(start_dt, end_dt)] để đánh dấu is_hold
       - events: dict tên_sự_kiện -> datetime (vd: {"t_429": dt, "post_pause": dt, ...})
-    """
-    mx, my = main_xy.get("x", []), main_xy.get("y", [])
-    mx, my = _trim_main_until(mx, my, trim_time, trim_mw)
-
-    rows = []
-    for t, mw in zip(mx, my):
-        rows.append((t, float(mw), "main", 0))
 
-    if joined_xy:
-        jx, jy = joined_xy.get("x", []), joined_xy.get("y", [])
-        jx, jy = _prepare_joined_from(jx, jy, trim_time, trim_mw)
-        for t, mw in zip(jx, jy):
-            rows.append((t, float(mw), "joined", 1))
+    Toàn bộ tính trên mảng NumPy (cắt bằng searchsorted, hold bằng quét khoảng,
+    sự kiện bằng tra gần nhất) rồi dựng DataFrame một lần.
+    """
+    (mx, my), (jx, jy) = trim_and_join_xy(main_xy, joined_xy, trim_time=trim_time, trim_mw=trim_mw)
 
-    if not rows:
+    if len(mx) + len(jx) == 0:
         return pd.DataFrame(columns=["t", "mw", "source", "seg_id", "is_hold", "evt"])
 
-    df = pd.DataFrame(rows, columns=["t", "mw", "source", "seg_id"])
-    # đảm bảo thứ tự: theo seg rồi theo thời gian
-    df = df.sort_values(["seg_id", "t"], kind="stable").reset_index(drop=True)
+    # đảm bảo thứ tự: theo seg rồi theo thời gian (mỗi đoạn thường đã sort sẵn)
+    if not _is_sorted(mx):
+        o = np.argsort(mx, kind="stable")
+        mx, my = mx[o], my[o]
+    if not _is_sorted(jx):
+        o = np.argsort(jx, kind="stable")
+        jx, jy = jx[o], jy[o]
+
+    counts = [len(mx), len(jx)]
+    t = np.concatenate([mx, jx])
+    t_ns = t.astype(np.int64)
 
     # is_hold
-    df["is_hold"] = False
-    if hold_windows:
-        for (hs, he) in hold_windows:
-            mask = (df["t"] >= hs) & (df["t"] <= he)
-            df.loc[mask, "is_hold"] = True
+    is_hold = _hold_mask(t_ns, hold_windows) if hold_windows else np.zeros(len(t), dtype=bool)
 
     # gắn sự kiện vào điểm gần nhất
-    df["evt"] = pd.Series([None] * len(df), dtype="object")
+    evt = np.full(len(t), None, dtype=object)
     if events:
         # chỉ xét những event có timestamp
-        for name, t_evt in events.items():
-            if t_evt is None:
-                continue
-            # tìm chỉ số gần nhất theo |t - t_evt|
-            # (chú ý: df['t'] là datetime -> trừ nhau được timedelta)
-            idx = (df["t"] - t_evt).abs().idxmin()
-            if pd.notna(idx):
-                df.at[idx, "evt"] = name
-
-    return df
+        named = [(name, t_evt) for name, t_evt in events.items() if t_evt is not None and not pd.isna(t_evt)]
+        if named:
+            evt_ns = np.array([np.datetime64(t_evt, "ns") for _, t_evt in named]).astype(np.int64)
+            # gán theo thứ tự dict: sự kiện sau ghi đè nếu trùng điểm
+            for (name, _), row in zip(named, _nearest_rows(t_ns, evt_ns)):
+                evt[row] = name
+
+    return pd.DataFrame({
+        "t": t,
+        "mw": np.concatenate([my, jy]),
+        "source": np.repeat(np.array(["main", "joined"], dtype=object), counts),
+        "seg_id": np.repeat(np.array([0, 1], dtype=np.int64), counts),
+        "is_hold": is_hold,
+        "evt": evt,
+    })
 
 def dfplot_to_draw_inputs(df: pd.DataFrame) -> Tuple[Dict[str, List], Optional[Dict[str, List]]]:
     """
@@ -191,68 +274,102 @@ from datetime import timedelta
 #         d = d.sort_values(["seg_id", "t"], kind="stable").reset_index(drop=True)
 
     # return d
+def _labeled_plateaus(hold_windows_labeled, plateau_429, plateau_462):
+    """[(start, end, label), ...] -> [(hs_ns, he_ns, mw_plateau | None)] hợp lệ, giữ thứ tự."""
+    out = []
+    for hw in hold_windows_labeled or []:
+        if not hw or len(hw) < 2:
+            continue
+        hs, he = hw[0], hw[1]
+        label = hw[2] if len(hw) >= 3 else ""
+        if hs is None or he is None or he <= hs:
+            continue
+        mw_plat = None
+        if "429" in str(label) and plateau_429 is not None:
+            mw_plat = float(plateau_429)
+        elif "462" in str(label) and plateau_462 is not None:
+            mw_plat = float(plateau_462)
+        out.append((np.datetime64(hs, "ns").astype(np.int64),
+                    np.datetime64(he, "ns").astype(np.int64),
+                    mw_plat))
+    return out
+
+@timed("densify_uniform")
 def densify_uniform(
     df: pd.DataFrame,
     *,
-    step_minutes: int = 1,
+    step_minutes: float = 1,
     hold_windows_labeled=None,      # [(start, end, label), ...]
     plateau_429: float | None = None,
     plateau_462: float | None = None,
 ) -> pd.DataFrame:
     """
     Nội suy đều theo phút cho TẤT CẢ các nguồn ('main' và 'joined'):
-      - Resample theo bậc thời gian: mỗi step_minutes một điểm.
-      - 'mw' nội suy tuyến tính theo thời gian (interpolate time).
+      - Resample theo bậc thời gian: mỗi step_minutes một điểm
+        (nhận số lẻ cho lưới dưới 1 phút, vd 10/60 = 10 giây).
+      - 'mw' nội suy tuyến tính theo thời gian (np.interp trên int64 ns).
       - 'evt' chỉ giữ tại mốc gốc (không lan truyền).
       - Áp cờ 'is_hold' và ép phẳng 429/462 trong các window có label.
     """
     if df is None or df.empty:
         return df
 
-    outs = []
-    for sid, g in df.groupby("source", sort=False):
-        g = g.sort_values("t").drop_duplicates("t")
-        if g.empty:
-            continue
+    step_ns = int(round(float(step_minutes) * 60 * 1e9))
+    if step_ns <= 0:
+        raise ValueError("step_minutes phải > 0.")
+    windows = _labeled_plateaus(hold_windows_labeled, plateau_429, plateau_462)
 
-        full_t = pd.date_range(g["t"].min(), g["t"].max(), freq=f"{step_minutes}min")
-        gi = g.set_index("t").reindex(full_t)
+    t_all = df["t"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    mw_all = df["mw"].to_numpy(dtype=np.float64)
+    src_all = df["source"].to_numpy()
+    seg_all = df["seg_id"].to_numpy()
+    evt_all = df["evt"].to_numpy(dtype=object) if "evt" in df.columns else None
 
-        # nội suy MW theo thời gian
-        gi["mw"] = gi["mw"].interpolate(method="time")
-
-        gi["source"] = sid
-        gi["seg_id"] = int(g["seg_id"].iloc[0])  # 0=main, 1=joined
-
-        # evt: chỉ giữ ở thời điểm gốc
-        if "evt" in gi.columns:
-            gi["evt"] = gi["evt"].where(gi.index.isin(g.set_index("t").index))
-        else:
-            gi["evt"] = None
-
-        # is_hold set sau theo windows
-        gi["is_hold"] = False
-
-        gi = gi.reset_index(names="t")
-        outs.append(gi)
-
-    d = pd.concat(outs, ignore_index=True) if outs else df.copy()
-
-    # Áp hold windows + plateau
-    if hold_windows_labeled:
-        for hw in hold_windows_labeled:
-            if not hw or len(hw) < 2:
-                continue
-            hs, he = hw[0], hw[1]
-            label = hw[2] if len(hw) >= 3 else ""
-            if hs is None or he is None or he <= hs:
-                continue
-            mask = (d["t"] >= hs) & (d["t"] <= he)
-            d.loc[mask, "is_hold"] = True
-            if "429" in str(label) and plateau_429 is not None:
-                d.loc[mask, "mw"] = float(plateau_429)
-            elif "462" in str(label) and plateau_462 is not None:
-                d.loc[mask, "mw"] = float(plateau_462)
-
-    return d.sort_values(["seg_id", "t"], kind="stable").reset_index(drop=True)
+    outs = []
+    for sid in pd.unique(src_all):
+        idx = np.flatnonzero(src_all == sid)
+        # sort theo t (ổn định) + bỏ trùng t (giữ điểm đầu)
+        idx = idx[np.argsort(t_all[idx], kind="stable")]
+        t_src = t_all[idx]
+        first = np.ones(len(idx), dtype=bool)
+        first[1:] = t_src[1:] != t_src[:-1]
+        idx, t_src = idx[first], t_src[first]
+        if len(idx) == 0:
+            continue
 
+        t0 = t_src[0]
+        grid = t0 + np.arange((t_src[-1] - t0) // step_ns + 1, dtype=np.int64) * step_ns
+
+        # nội suy MW theo thời gian (offset từ t0 để giữ chính xác khi đổi sang float)
+        mw = np.interp((grid - t0).astype(np.float64), (t_src - t0).astype(np.float64), mw_all[idx])
+
+        # evt: chỉ giữ ở thời điểm gốc trùng lưới
+        evt = np.full(len(grid), np.nan, dtype=object)
+        if evt_all is not None:
+            pos = np.searchsorted(t_src, grid)
+            hit = pos < len(t_src)
+            hit[hit] = t_src[pos[hit]] == grid[hit]
+            evt[hit] = evt_all[idx[pos[hit]]]
+
+        # hold windows: gán theo khoảng (grid đã sort -> cắt bằng searchsorted)
+        is_hold = np.zeros(len(grid), dtype=bool)
+        for hs, he, mw_plat in windows:
+            a = np.searchsorted(grid, hs, side="left")
+            b = np.searchsorted(grid, he, side="right")
+            is_hold[a:b] = True
+            if mw_plat is not None:
+                mw[a:b] = mw_plat
+
+        outs.append((int(seg_all[idx[0]]), sid, grid, mw, evt, is_hold))
+
+    # 0=main, 1=joined; mỗi nguồn đã sort theo t
+    outs.sort(key=lambda o: o[0])
+    counts = [len(o[2]) for o in outs]
+    return pd.DataFrame({
+        "t": np.concatenate([o[2] for o in outs]).astype("datetime64[ns]"),
+        "mw": np.concatenate([o[3] for o in outs]),
+        "source": np.repeat(np.array([o[1] for o in outs], dtype=object), counts),
+        "seg_id": np.repeat(np.array([o[0] for o in outs], dtype=np.int64), counts),
+        "is_hold": np.concatenate([o[5] for o in outs]),
+        "evt": np.concatenate([o[4] for o in outs]),
+    })
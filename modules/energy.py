@@ -1,15 +1,22 @@
 # -*- coding: utf-8 -*-
 """Energy calculators (trapezoid method) for Load-Change app."""
 from __future__ import annotations
-from typing import Dict
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
 import pandas as pd
 
+from modules.perf import timed
+
 __all__ = [
     "energy_trapezoid_mwh",
     "energy_by_source_mwh",
     "energy_summary_mwh",
+    "energy_polyline_mwh",
+    "energy_summary_from_breakpoints",
 ]
 
+_NS_PER_HOUR = 3600.0 * 1e9
+
 def _ensure_cols(df: pd.DataFrame, cols=("t","mw")) -> None:
     missing = [c for c in cols if c not in df.columns]
     if missing:
@@ -43,17 +50,88 @@ def energy_by_source_mwh(df: pd.DataFrame) -> Dict[str,float]:
     out["total"] = out.get("main", 0.0) + out.get("joined", 0.0)
     return out
 
+def _segment_areas_mwh(t_ns: np.ndarray, mw: np.ndarray, same: np.ndarray) -> np.ndarray:
+    """Trapezoid area of each step (i-1 -> i); 0 where same[i] is False or undefined."""
+    area = np.zeros(len(t_ns), dtype=np.float64)
+    if len(t_ns) > 1:
+        area[1:] = (mw[1:] + mw[:-1]) * 0.5 * np.diff(t_ns) / _NS_PER_HOUR
+        area[1:] = np.where(same[1:], area[1:], 0.0)
+    area[~np.isfinite(area)] = 0.0
+    return area
+
+def _source_codes(src: np.ndarray) -> Tuple[np.ndarray, list]:
+    """
+    Integer code per row for 'source'. Sources come in long runs
+    (main..., joined...), so label the runs instead of hashing every row;
+    fall back to pd.factorize when the column is heavily interleaved.
+    """
+    n = len(src)
+    change = np.flatnonzero(src[1:] != src[:-1]) + 1
+    if len(change) > 1024:
+        codes, uniq = pd.factorize(src)
+        return codes, list(uniq)
+    starts = np.concatenate([[0], change])
+    names: list = []
+    run_codes = []
+    for label in src[starts]:
+        if pd.isna(label):
+            run_codes.append(-1)
+            continue
+        if label not in names:
+            names.append(label)
+        run_codes.append(names.index(label))
+    return np.repeat(np.array(run_codes, dtype=np.int64), np.diff(np.append(starts, n))), names
+
+@timed("energy_summary_mwh")
 def energy_summary_mwh(df: pd.DataFrame) -> Dict[str,float]:
-    """Return origin/override/total + split hold/ramp."""
+    """
+    Return origin/override/total + split hold/ramp.
+    Single pass: one stable sort by t, then per-source and hold areas are
+    vectorized over NumPy arrays (no groupby / per-group sort+copy).
+    """
     if df is None or df.empty:
         return {"origin_mwh": 0.0, "override_mwh": 0.0, "total_mwh": 0.0, "hold_mwh": 0.0, "ramp_mwh": 0.0}
-    per = energy_by_source_mwh(df)
+    _ensure_cols(df, ("t","mw"))
+    t_ns = df["t"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    mw = df["mw"].to_numpy(dtype=np.float64)
+    # sort once (skipped when already in time order, the usual case)
+    order = None
+    if len(t_ns) > 1 and (t_ns[1:] < t_ns[:-1]).any():
+        order = np.argsort(t_ns, kind="stable")
+        t_ns, mw = t_ns[order], mw[order]
+    nat = np.iinfo(np.int64).min
+    valid = t_ns != nat
+
+    if "source" in df.columns:
+        codes, names = _source_codes(df["source"].to_numpy())
+        if order is not None:
+            codes = codes[order]
+    else:
+        codes, names = np.zeros(len(t_ns), dtype=np.int64), ["main"]
+
+    # per-source area: step i-1 -> i within the same source (in sorted-t order)
+    per: Dict[str,float] = {}
+    for c, sid in enumerate(names):
+        idx = np.flatnonzero(codes == c)
+        ok = valid[idx]
+        same = np.ones(len(idx), dtype=bool)
+        same[1:] = ok[1:] & ok[:-1]
+        per[str(sid)] = float(_segment_areas_mwh(t_ns[idx], mw[idx], same).sum())
     origin = float(per.get("main", 0.0))
     override = float(per.get("joined", 0.0))
     total = origin + override
+
     hold = 0.0
-    if "is_hold" in df.columns and df["is_hold"].any():
-        hold = energy_trapezoid_mwh(df[df["is_hold"] == True])  # noqa: E712
+    if "is_hold" in df.columns:
+        is_hold = df["is_hold"].to_numpy()
+        if order is not None:
+            is_hold = is_hold[order]
+        hidx = np.flatnonzero(is_hold == True)  # noqa: E712
+        if len(hidx):
+            ok = valid[hidx]
+            same = np.ones(len(hidx), dtype=bool)
+            same[1:] = ok[1:] & ok[:-1]
+            hold = float(_segment_areas_mwh(t_ns[hidx], mw[hidx], same).sum())
     ramp = max(total - hold, 0.0)
     return {
         "origin_mwh": origin,
@@ -62,3 +140,93 @@ def energy_summary_mwh(df: pd.DataFrame) -> Dict[str,float]:
         "hold_mwh": hold,
         "ramp_mwh": ramp,
     }
+
+# ---- closed-form from breakpoints (piecewise linear, no resampling) ----
+
+def _polyline_arrays(xy) -> Tuple[np.ndarray, np.ndarray]:
+    """{"x": times, "y": mw} | (xs, ys) | None -> (int64 ns sorted, float64)."""
+    if xy is None:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    xs, ys = (xy.get("x", []), xy.get("y", [])) if isinstance(xy, dict) else xy
+    t = np.asarray(xs, dtype="datetime64[ns]").astype(np.int64)
+    y = np.asarray(ys, dtype=np.float64)
+    n = min(len(t), len(y))
+    t, y = t[:n], y[:n]
+    if n > 1 and (t[1:] < t[:-1]).any():
+        o = np.argsort(t, kind="stable")
+        t, y = t[o], y[o]
+    return t, y
+
+def _area_mwh(t: np.ndarray, y: np.ndarray) -> float:
+    if len(t) < 2:
+        return 0.0
+    return float(np.sum((y[1:] + y[:-1]) * np.diff(t)) * 0.5 / _NS_PER_HOUR)
+
+def _window_area_mwh(t: np.ndarray, y: np.ndarray, a: int, b: int) -> Tuple[float, float]:
+    """(MWh, hours) of the polyline restricted to [a, b] ∩ [t0, tn]."""
+    if len(t) < 2:
+        return 0.0, 0.0
+    a, b = max(a, int(t[0])), min(b, int(t[-1]))
+    if b <= a:
+        return 0.0, 0.0
+    i, j = np.searchsorted(t, a, side="right"), np.searchsorted(t, b, side="left")
+    wt = np.concatenate([[a], t[i:j], [b]])
+    wy = np.concatenate([[np.interp(a, t, y)], y[i:j], [np.interp(b, t, y)]])
+    return _area_mwh(wt, wy), (b - a) / _NS_PER_HOUR
+
+def _windows_ns(hold_windows_labeled, plateau_429, plateau_462):
+    out = []
+    for hw in hold_windows_labeled or []:
+        if not hw or len(hw) < 2 or hw[0] is None or hw[1] is None or hw[1] <= hw[0]:
+            continue
+        label = str(hw[2]) if len(hw) >= 3 else ""
+        plat = None
+        if "429" in label and plateau_429 is not None:
+            plat = float(plateau_429)
+        elif "462" in label and plateau_462 is not None:
+            plat = float(plateau_462)
+        out.append((int(np.datetime64(hw[0], "ns").astype(np.int64)),
+                    int(np.datetime64(hw[1], "ns").astype(np.int64)), plat))
+    return out
+
+def energy_polyline_mwh(xs: Sequence, ys: Sequence[float]) -> float:
+    """Exact MWh of a piecewise-linear trajectory given its breakpoints."""
+    return _area_mwh(*_polyline_arrays((xs, ys)))
+
+@timed("energy_summary_from_breakpoints")
+def energy_summary_from_breakpoints(
+    main_xy,
+    joined_xy=None,
+    *,
+    hold_windows_labeled=None,      # [(start, end, label), ...]
+    plateau_429: Optional[float] = None,
+    plateau_462: Optional[float] = None,
+) -> Dict[str,float]:
+    """
+    Same keys as energy_summary_mwh, integrated in closed form over the
+    breakpoints of 'main'/'joined' (already trimmed/joined), O(segments).
+    Inside a labeled hold window the curve is flattened to the 429/462
+    plateau, like densify_uniform; windows are assumed not to overlap.
+    """
+    windows = _windows_ns(hold_windows_labeled, plateau_429, plateau_462)
+    per = []
+    hold = 0.0
+    for xy in (main_xy, joined_xy):
+        t, y = _polyline_arrays(xy)
+        area = _area_mwh(t, y)
+        for a, b, plat in windows:
+            w_area, w_hours = _window_area_mwh(t, y, a, b)
+            if plat is not None:
+                area += plat * w_hours - w_area
+                w_area = plat * w_hours
+            hold += w_area
+        per.append(area)
+    origin, override = per
+    total = origin + override
+    return {
+        "origin_mwh": origin,
+        "override_mwh": override,
+        "total_mwh": total,
+        "hold_mwh": hold,
+        "ramp_mwh": max(total - hold, 0.0),
+    }
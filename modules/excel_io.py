@@ -1,43 +1,216 @@
 # modules/excel_io.py
 # -*- coding: utf-8 -*-
+from __future__ import annotations
 
 import os
+import json
+import time
+import atexit
 import zipfile
-from openpyxl import Workbook, load_workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.utils.exceptions import InvalidFileException
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from openpyxl import Workbook
+
+
+# ---- sidecar .pending.jsonl: ghi nối đuôi O(1)/dòng, giữ kiểu datetime ----
+def _encode_value(v):
+    if isinstance(v, datetime):
+        return {"$dt": v.isoformat()}
+    return v
+
+def _decode_value(v):
+    if isinstance(v, dict) and "$dt" in v:
+        return datetime.fromisoformat(v["$dt"])
+    return v
 
 
 class ExcelUpdater:
     """CLASS XUẤT DỮ LIỆU TĂNG GIẢM TẢI TRONG CA"""
-    def __init__(self, file_name: str):
+    def __init__(self, file_name: str, *, buffered: bool = False,
+                 flush_rows: int = 50, flush_interval_s: float = 60.0):
+        """
+        buffered=False: như cũ, mỗi lần append là save workbook.
+        buffered=True : gom dòng trong RAM, đủ flush_rows dòng hoặc quá flush_interval_s
+                        (timer hẹn từ dòng đầu tiên của buffer, không cần lần ghi kế tiếp)
+                        thì ghi nối vào sidecar <file>.pending.jsonl (không save xlsx);
+                        merge vào xlsx khi gọi merge_pending()/close() (tự gọi lúc thoát).
+        """
         self.file_name = file_name
+        # workbook mở lười ở lần ghi đầu tiên (xem property wb)
+        self._wb: Optional[Workbook] = None
+        self._sheet = None
+        self._header: Dict[str, int] = {}     # tên cột -> chỉ số cột (1-based), từ dòng tiêu đề
+        self._next_row = 1                    # con trỏ dòng ghi tiếp theo (giữ trong RAM)
+
+        self.buffered = buffered
+        self.flush_rows = flush_rows
+        self.flush_interval_s = flush_interval_s
+        self.pending_file = os.path.splitext(self.file_name)[0] + ".pending.jsonl"
+        self._buffer: List[Tuple[List[str], list]] = []
+        self._last_flush = time.monotonic()
+        # buffer được ghi từ thread ghi file và timer flush -> khoá chung
+        self._buf_lock = threading.RLock()
+        self._flush_timer: Optional[threading.Timer] = None
+        if self.buffered:
+            atexit.register(self.close)
+
+    # ---- mở workbook lười + cache map cột theo tiêu đề ----
+    def _open(self) -> None:
+        # openpyxl import lười: chỉ khi thật sự ghi Excel lần đầu
+        from openpyxl import Workbook, load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
         if os.path.exists(self.file_name):
             try:
-                self.wb = load_workbook(filename=self.file_name)
+                self._wb = load_workbook(filename=self.file_name)
             except (InvalidFileException, zipfile.BadZipFile):
                 # ❗ file hỏng, tạo mới
-                self.wb = Workbook()
+                self._wb = Workbook()
         else:
             # ❗ chưa có, tạo mới
-            self.wb = Workbook()
+            self._wb = Workbook()
+        self._sheet = self._wb.active
+        # max_row quét toàn bộ ô -> chỉ gọi 1 lần, sau đó dùng con trỏ _next_row
+        last = self._sheet.max_row
+        if last == 1 and all(c.value is None for c in self._sheet[1]):
+            last = 0
+        self._next_row = last + 1
+        self._header = {}
+        if last >= 1:
+            first = [c.value for c in self._sheet[1]]
+            # dòng 1 toàn chuỗi -> là tiêu đề; ngược lại file cũ không có tiêu đề (ghi theo vị trí)
+            if all(v is None or isinstance(v, str) for v in first):
+                self._header = {v: i for i, v in enumerate(first, start=1) if v is not None}
+
+    @property
+    def wb(self) -> Workbook:
+        if self._wb is None:
+            self._open()
+        return self._wb
+
+    @property
+    def sheet(self):
+        if self._wb is None:
+            self._open()
+        return self._sheet
+
+    def _columns_for(self, keys: List[str]) -> List[int]:
+        """
+        Vị trí cột cho từng key:
+          - sheet rỗng: ghi dòng tiêu đề từ keys
+          - có tiêu đề: theo tên cột; key chưa có (vd dòng HOLD khác schema dòng thường)
+            -> thêm cột tiêu đề ở cuối, không bao giờ ghi lệch sang cột tên khác
+          - file cũ không có dòng tiêu đề: theo vị trí như cũ
+        """
+        sheet = self.sheet
+        if self._next_row == 1:
+            for col, key in enumerate(keys, start=1):
+                sheet.cell(row=1, column=col, value=key)
+            self._header = {key: col for col, key in enumerate(keys, start=1)}
+            self._next_row = 2
+        if not self._header:
+            return list(range(1, len(keys) + 1))
+        cols = []
+        for key in keys:
+            if key not in self._header:
+                col = max(self._header.values(), default=0) + 1
+                sheet.cell(row=1, column=col, value=key)
+                self._header[key] = col
+            cols.append(self._header[key])
+        return cols
 
-        self.sheet = self.wb.active
+    def _write_rows(self, rows: List[Tuple[List[str], list]]) -> None:
+        sheet = self.sheet
+        for keys, values in rows:
+            cols = self._columns_for(keys)      # có thể ghi dòng tiêu đề -> lấy con trỏ sau
+            row = self._next_row
+            for col, value in zip(cols, values):
+                sheet.cell(row=row, column=col, value=value)
+            self._next_row = row + 1
+
+    def append_rows(self, rows: List[dict]) -> None:
+        """Ghi nhiều dòng (mỗi dict = 1 dòng, theo thứ tự key) – 1 lần save cho cả lô."""
+        values = [([str(k) for k in r.keys()], list(r.values())) for r in rows]
+        if not values:
+            return
+        if not self.buffered:
+            self._write_rows(values)
+            self.wb.save(self.file_name)
+            return
+        with self._buf_lock:
+            was_empty = not self._buffer
+            self._buffer.extend(values)
+            if (len(self._buffer) >= self.flush_rows
+                    or time.monotonic() - self._last_flush >= self.flush_interval_s):
+                self.flush()
+            elif was_empty:
+                # buffer vừa có dòng đầu -> hẹn flush sau flush_interval_s dù không có lần ghi nào nữa
+                self._arm_flush_timer()
+
+    def _arm_flush_timer(self) -> None:
+        self._cancel_flush_timer()
+        t = threading.Timer(self.flush_interval_s, self._on_flush_timer)
+        t.daemon = True
+        t.name = "excel-flush"
+        self._flush_timer = t
+        t.start()
+
+    def _cancel_flush_timer(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    def _on_flush_timer(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[WARN] ExcelUpdater timed flush failed: {e}")
 
     def append_data(self, data: dict):
-        row = self.sheet.max_row + 1
-        col = 1
-        for _, value in data.items():
-            column_letter = get_column_letter(col)
-            self.sheet[f'{column_letter}{row}'] = value
-            col += 1
-        self.wb.save(self.file_name)
+        self.append_rows([data])
 
     def append_data1(self, data1: dict):
-        row = self.sheet.max_row + 1
-        col = 1
-        for _, value in data1.items():
-            column_letter = get_column_letter(col)
-            self.sheet[f'{column_letter}{row}'] = value
-            col += 1
-        self.wb.save(self.file_name)
+        self.append_rows([data1])
+
+    # tên mới cho dữ liệu HOLD (append_data1 giữ lại cho code cũ)
+    append_data_hold = append_data1
+
+    def flush(self) -> None:
+        """Đẩy buffer RAM ra sidecar (append, không đụng tới xlsx)."""
+        with self._buf_lock:
+            self._cancel_flush_timer()
+            self._last_flush = time.monotonic()
+            if not self._buffer:
+                return
+            with open(self.pending_file, "a", encoding="utf-8") as f:
+                for keys, values in self._buffer:
+                    rec = {"k": keys, "v": [_encode_value(v) for v in values]}
+                    f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            self._buffer.clear()
+
+    def merge_pending(self) -> int:
+        """Gộp buffer + sidecar vào workbook, save 1 lần, xoá sidecar. Trả về số dòng đã gộp."""
+        with self._buf_lock:
+            self.flush()
+            if not os.path.exists(self.pending_file):
+                return 0
+            with open(self.pending_file, encoding="utf-8") as f:
+                recs = [json.loads(line) for line in f if line.strip()]
+            rows = [(rec["k"], [_decode_value(v) for v in rec["v"]]) for rec in recs]
+            if rows:
+                self._write_rows(rows)
+                self.wb.save(self.file_name)
+            os.remove(self.pending_file)
+            return len(rows)
+
+    def close(self) -> Optional[int]:
+        if not self.buffered:
+            return None
+        try:
+            return self.merge_pending()
+        except Exception as e:
+            # đừng làm hỏng lúc thoát; dữ liệu vẫn còn trong sidecar để gộp lần sau
+            print(f"[WARN] ExcelUpdater.close failed: {e}")
+            return None
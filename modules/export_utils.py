@@ -1,12 +1,129 @@
 # -*- coding: utf-8 -*-
 """Export helpers for Load-Change app."""
 from __future__ import annotations
+import os
+import gzip
+from typing import List, Optional
 import pandas as pd
 
-def export_df_with_minutes(df: pd.DataFrame, path: str) -> None:
+__all__ = [
+    "export_df_with_minutes",
+    "read_plot_df",
+    "export_format",
+]
+
+# đuôi file -> định dạng (đuôi ghép như .csv.gz xét trước)
+_EXT_FORMATS = (
+    (".csv.gz", "csv"),
+    (".csv", "csv"),
+    (".parquet", "parquet"),
+    (".pq", "parquet"),
+    (".feather", "feather"),
+    (".arrow", "feather"),
+    (".xlsx", "excel"),     # .xls (Excel 97-2003): pandas/openpyxl không còn writer -> báo lỗi định dạng
+)
+
+# số dòng mỗi lần ghi (row group parquet / chunk feather / khối csv)
+DEFAULT_CHUNK_ROWS = 500_000
+
+
+def export_format(path: str) -> str:
+    """Định dạng theo đuôi file: 'excel' | 'parquet' | 'feather' | 'csv'."""
+    low = os.fspath(path).lower()
+    for ext, fmt in _EXT_FORMATS:
+        if low.endswith(ext):
+            return fmt
+    raise ValueError(f"Không hỗ trợ định dạng file: {path!r} (dùng .xlsx/.parquet/.feather/.csv/.csv.gz)")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Xuất/đọc Parquet/Feather cần cài pyarrow (pip install pyarrow).") from e
+
+
+def _arrow_safe(d: pd.DataFrame) -> pd.DataFrame:
+    """Cột object (vd 'evt': nhãn hoặc NaN) -> None cho ô trống để Arrow suy ra kiểu string."""
+    for col in d.columns:
+        if d[col].dtype == object:
+            d[col] = d[col].where(d[col].notna(), None)
+    return d
+
+
+def _arrow_chunks(d: pd.DataFrame, chunk_rows: int):
+    """
+    (schema, iterator pa.Table) – mỗi khối chunk_rows dòng chuyển sang Arrow riêng,
+    bộ nhớ đỉnh ~ 1 khối thay vì cả bảng. Schema lấy từ khối đầu; cột toàn ô trống ở
+    khối đầu (kiểu null) coi là string để các khối sau khớp schema.
+    """
+    import pyarrow as pa
+
+    def part(start):
+        return _arrow_safe(d.iloc[start:start + chunk_rows].copy())
+
+    first = part(0)
+    schema = pa.Schema.from_pandas(first, preserve_index=False)
+    schema = pa.schema(
+        [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema],
+        metadata=schema.metadata,
+    )
+
+    def tables():
+        yield pa.Table.from_pandas(first, schema=schema, preserve_index=False)
+        for start in range(chunk_rows, len(d), chunk_rows):
+            yield pa.Table.from_pandas(part(start), schema=schema, preserve_index=False)
+
+    return schema, tables()
+
+
+def _write_arrow_chunked(d: pd.DataFrame, path: str, fmt: str, chunk_rows: int) -> None:
+    """Parquet (1 row group / khối) hoặc Feather v2 (Arrow IPC, 1 record batch / khối)."""
+    _require_pyarrow()
+    import pyarrow as pa
+    schema, tables = _arrow_chunks(d, chunk_rows)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        with pq.ParquetWriter(path, schema) as writer:
+            for table in tables:
+                writer.write_table(table)
+        return
+    # như feather.write_feather: nén lz4 nếu bản pyarrow có codec
+    codec = "lz4" if pa.Codec.is_available("lz4") else None
+    with pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression=codec)) as writer:
+        for table in tables:
+            writer.write_table(table, max_chunksize=chunk_rows)
+
+
+def _write_csv_chunked(d: pd.DataFrame, path: str, chunk_rows: int) -> None:
+    """CSV (.gz nếu đuôi .gz) theo khối; dùng writer của pyarrow nếu có (nhanh hơn to_csv nhiều lần)."""
+    gz = os.fspath(path).lower().endswith(".gz")
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        # khối đầu ghi header, các khối sau append (gzip nhiều member vẫn đọc được)
+        for start in range(0, len(d), chunk_rows):
+            d.iloc[start:start + chunk_rows].to_csv(
+                path, index=False, mode="w" if start == 0 else "a", header=(start == 0),
+            )
+        return
+    schema, tables = _arrow_chunks(d, chunk_rows)
+    # gzip mức 6 qua module gzip: nhanh hơn nhiều so với mức 9 mặc định của Arrow, file gần bằng
+    raw = gzip.open(path, "wb", compresslevel=6) if gz else open(path, "wb")
+    with raw, pa.PythonFile(raw, mode="w") as sink, pacsv.CSVWriter(sink, schema) as writer:
+        for table in tables:
+            writer.write_table(table)
+
+def export_df_with_minutes(df: pd.DataFrame, path: str, *, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                           group_col: Optional[str] = None) -> None:
     """
-    Ghi DataFrame ra Excel kèm cột minute_offset (phút từ mốc đầu).
+    Ghi DataFrame kèm cột minute_offset (phút từ mốc đầu).
     Yêu cầu DF có cột 't' (datetime).
+    Định dạng theo đuôi file: .xlsx (Excel cho vận hành), .parquet, .feather, .csv/.csv.gz;
+    Parquet/Feather/CSV ghi theo khối chunk_rows dòng.
+    group_col: nhiều chuỗi trong 1 file (vd cột 'plan') -> sắp theo (group_col, t),
+    minute_offset tính từ mốc đầu của từng nhóm.
     """
     if df is None or df.empty:
         raise ValueError("DataFrame rỗng.")
@@ -14,9 +131,47 @@ def export_df_with_minutes(df: pd.DataFrame, path: str) -> None:
     if "t" not in df.columns:
         raise ValueError("Thiếu cột 't' trong DataFrame.")
 
-    d = df.copy().sort_values("t").reset_index(drop=True)
-    t0 = d["t"].iloc[0]
+    fmt = export_format(path)
+
+    if group_col is None:
+        d = df.copy().sort_values("t").reset_index(drop=True)
+        t0 = d["t"].iloc[0]
+    else:
+        d = df.copy().sort_values([group_col, "t"], kind="stable").reset_index(drop=True)
+        t0 = d.groupby(group_col, sort=False)["t"].transform("min")
     d["minute_offset"] = (d["t"] - t0).dt.total_seconds() / 60.0
 
-    # Xuất Excel
-    d.to_excel(path, index=False)
+    if fmt == "excel":
+        # Xuất Excel
+        d.to_excel(path, index=False)
+        return
+
+    if fmt == "csv":
+        _write_csv_chunked(d, path, chunk_rows)
+        return
+
+    _write_arrow_chunked(d, path, fmt, chunk_rows)
+
+
+def read_plot_df(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Đọc lại plot DF đã export (cùng quy ước đuôi file) để so sánh.
+    Parquet/Feather chỉ đọc các cột cần (columns) -> nhanh với file dài.
+    """
+    fmt = export_format(path)
+    if fmt in ("parquet", "feather"):
+        _require_pyarrow()
+        if fmt == "parquet":
+            return pd.read_parquet(path, columns=columns)
+        return pd.read_feather(path, columns=columns)
+    if fmt == "csv":
+        try:
+            import pyarrow  # noqa: F401
+            d = pd.read_csv(path, usecols=columns, engine="pyarrow")
+        except ImportError:
+            d = pd.read_csv(path, usecols=columns)
+    else:
+        d = pd.read_excel(path, usecols=columns)
+    if "t" in d.columns:
+        d["t"] = pd.to_datetime(d["t"])
+    return d
@@ -0,0 +1,330 @@
+# modules/headless.py
+# -*- coding: utf-8 -*-
+"""
+Lập kế hoạch tăng/giảm tải không cần giao diện (không import PySide6/matplotlib).
+
+Thư viện:
+    from modules.headless import PlanSpec, OverrideSpec, run_plan, load_plans
+    res = run_plan(PlanSpec(start_mw=200, target_mw=560, start_time=datetime(...)))
+    res.events, res.energy, res.timeline(step_minutes=1)
+
+Dòng lệnh:
+    python -m modules.headless plans.json --summary out.csv --timeline tl.parquet
+
+File vào:
+  - JSON: 1 plan, list plan, hoặc {"plans": [...]}; mỗi plan:
+        {"start_mw": 200, "target_mw": 560, "start_time": "08:00",
+         "pulverizer_mode": "3 Puls", "pause_time_429_min": 0, "pause_time_hold_min": 30,
+         "overrides": [{"target_mw": 500, "time": "09:00", "hold_minutes": 0}, ...]}
+  - CSV: mỗi dòng 1 plan, cột như trên; overrides dạng "500@09:00;300@10:30"
+    (giờ có thể bỏ: "500;300").
+  Giờ "HH:MM[:SS]" được ghép với --date (mặc định hôm nay); ISO datetime dùng nguyên.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from modules.power_logic import CalcConfig, CalcResult, compute_power_change_cached
+from modules.planner import Command, OverridePlanner
+
+# thứ tự cột sự kiện trong summary
+EVENT_KEYS = ("t_429", "post_pause", "hold_start_462", "hold_end_462", "final_load", "override_done")
+ENERGY_KEYS = ("origin_mwh", "override_mwh", "total_mwh", "hold_mwh", "ramp_mwh")
+
+
+@dataclass(frozen=True)
+class OverrideSpec:
+    target_mw: float
+    time: Optional[datetime] = None     # giờ người dùng nhập; None = ngay khi được phép
+    hold_minutes: int = 0
+
+
+@dataclass(frozen=True)
+class PlanSpec:
+    start_mw: float
+    target_mw: float
+    start_time: datetime
+    overrides: Tuple[OverrideSpec, ...] = ()
+    pulverizer_mode: str = "3 Puls"
+    pause_time_429_min: int = 0
+    pause_time_hold_min: int = 30
+    threshold_429: float = 429.0
+    hold_power: float = 462.0
+    name: str = ""
+
+    def config(self) -> CalcConfig:
+        return CalcConfig(
+            threshold_429=self.threshold_429,
+            hold_power=self.hold_power,
+            pause_time_429_min=self.pause_time_429_min,
+            pause_time_hold_min=self.pause_time_hold_min,
+            pulverizer_mode=self.pulverizer_mode,
+        )
+
+
+@dataclass
+class PlanResult:
+    spec: PlanSpec
+    main: CalcResult
+    commands: List[Command]
+    events: Dict[str, Optional[datetime]]
+    hold_windows: List[Tuple[datetime, datetime, str]]
+    energy: Dict[str, float]
+    notes: List[str] = field(default_factory=list)      # thông báo dời lịch override
+    segments: dict = field(default_factory=dict)        # plan nối dạng cột {"t","mw","tag"}
+    breakpoints: dict = field(default_factory=dict)     # điểm gãy plan nối {"x","y"}
+
+    @property
+    def trim_time(self) -> Optional[datetime]:
+        """Có override -> cắt main tại HOLD_END @429 (fallback: mốc đầu plan nối)."""
+        if not self.commands:
+            return None
+        if self.main.post_pause_time is not None:
+            return self.main.post_pause_time
+        if len(self.segments.get("t", ())):
+            return self.segments["t"][0].astype("datetime64[us]").item()
+        return None
+
+    def timeline(self, step_minutes: int = 1):
+        """Plot DF hậu cắt-ghép, nội suy đều step_minutes (cột t, mw, source, is_hold, evt...)."""
+        from modules.df_plot import build_plot_df, densify_uniform
+        trim_time = self.trim_time
+        df = build_plot_df(
+            main_xy={"x": self.main.times_array, "y": self.main.powers_array},
+            joined_xy={"x": self.segments["t"], "y": self.segments["mw"]} if self.commands else None,
+            trim_time=trim_time,
+            trim_mw=self.spec.threshold_429 if trim_time is not None else None,
+            hold_windows=[(a, b) for a, b, _ in self.hold_windows],
+            events={k: self.events[k] for k in ("t_429", "post_pause", "hold_start_462",
+                                                 "hold_end_462", "override_done")},
+        )
+        return densify_uniform(
+            df,
+            step_minutes=step_minutes,
+            hold_windows_labeled=self.hold_windows,
+            plateau_429=self.spec.threshold_429,
+            plateau_462=self.spec.hold_power,
+        )
+
+    def to_record(self) -> Dict[str, Any]:
+        """1 dòng phẳng cho summary (sự kiện ISO, MWh, lịch override)."""
+        rec: Dict[str, Any] = {
+            "name": self.spec.name,
+            "start_mw": self.spec.start_mw,
+            "target_mw": self.spec.target_mw,
+            "start_time": _iso(self.spec.start_time),
+        }
+        rec.update({k: _iso(self.events.get(k)) for k in EVENT_KEYS})
+        rec.update({k: round(self.energy[k], 6) for k in ENERGY_KEYS})
+        rec["overrides"] = ";".join(
+            f"{c.target_mw:g}@{_iso(c.scheduled_start)}->{_iso(c.hold_start)}" for c in self.commands
+        )
+        return rec
+
+
+def _iso(t) -> Optional[str]:
+    return t.isoformat(timespec="seconds") if t is not None else None
+
+
+def run_plan(spec: PlanSpec) -> PlanResult:
+    """Ramp chính + chuỗi override (cùng quy tắc với PowerChangeWidget) + sự kiện + MWh."""
+    from modules.df_plot import trim_and_join_xy
+    from modules.energy import energy_summary_from_breakpoints
+
+    cfg = spec.config()
+    main = compute_power_change_cached(spec.start_mw, spec.target_mw, spec.start_time, cfg)
+
+    planner = OverridePlanner(threshold_429=spec.threshold_429)
+    notes: List[str] = []
+    for ov in spec.overrides:
+        cmd = Command(
+            start_mw=spec.threshold_429,
+            target_mw=ov.target_mw,
+            start_time=ov.time or main.post_pause_time or spec.start_time,
+            hold_minutes=ov.hold_minutes,
+        )
+        ok, scheduled, msg = planner.schedule(
+            cmd,
+            time_reaching_429=main.time_reaching_429,
+            post_pause_time=main.post_pause_time,
+            pause_time_429_min=spec.pause_time_429_min,
+            now=lambda: spec.start_time,    # không phụ thuộc giờ máy khi chạy batch
+        )
+        if not ok and msg and ov.time is not None:
+            notes.append(msg.replace("\n", " "))
+        cmd.scheduled_start = scheduled
+        planner.add(cmd, cfg)
+    commands = planner.commands
+    segments, breakpoints = planner.segments, planner.breakpoints
+
+    hold_windows = []
+    if main.time_reaching_429 and main.post_pause_time:
+        hold_windows.append((main.time_reaching_429, main.post_pause_time, "Hold @429"))
+    if main.time_holding_462 and main.hold_complete_time:
+        hold_windows.append((main.time_holding_462, main.hold_complete_time, "Hold @462"))
+
+    events = {
+        "t_429": main.time_reaching_429,
+        "post_pause": main.post_pause_time,
+        "hold_start_462": main.time_holding_462,
+        "hold_end_462": main.hold_complete_time,
+        "final_load": main.final_load_time,
+        "override_done": commands[-1].hold_start if commands else None,
+    }
+
+    result = PlanResult(spec=spec, main=main, commands=commands, events=events,
+                        hold_windows=hold_windows, energy={}, notes=notes,
+                        segments=segments, breakpoints=breakpoints)
+    trim_time = result.trim_time
+    bx, by = main.breakpoints()
+    bp_main, bp_joined = trim_and_join_xy(
+        {"x": bx, "y": by},
+        breakpoints if commands else None,
+        trim_time=trim_time,
+        trim_mw=spec.threshold_429 if trim_time is not None else None,
+    )
+    result.energy = energy_summary_from_breakpoints(
+        bp_main, bp_joined,
+        hold_windows_labeled=hold_windows,
+        plateau_429=spec.threshold_429,
+        plateau_462=spec.hold_power,
+    )
+    return result
+
+
+# ---- đọc plan từ JSON / CSV ----
+def _parse_dt(value, day: date) -> Optional[datetime]:
+    if value is None or value == "" or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, datetime):
+        return value
+    s = str(value).strip()
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            t = datetime.strptime(s, fmt).time()
+            return datetime.combine(day, t)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(s)
+
+
+def _parse_overrides(value, day: date) -> Tuple[OverrideSpec, ...]:
+    if value is None or value == "" or (isinstance(value, float) and value != value):
+        return ()
+    if isinstance(value, str):
+        out = []
+        for part in value.split(";"):
+            part = part.strip()
+            if not part:
+                continue
+            target, _, at = part.partition("@")
+            out.append(OverrideSpec(target_mw=float(target), time=_parse_dt(at or None, day)))
+        return tuple(out)
+    return tuple(
+        OverrideSpec(
+            target_mw=float(ov["target_mw"]),
+            time=_parse_dt(ov.get("time"), day),
+            hold_minutes=int(ov.get("hold_minutes", 0) or 0),
+        )
+        for ov in value
+    )
+
+
+def plan_from_dict(d: Dict[str, Any], *, day: Optional[date] = None, name: str = "") -> PlanSpec:
+    day = day or date.today()
+    opt = {}
+    for key, conv in (("pulverizer_mode", str), ("pause_time_429_min", int),
+                      ("pause_time_hold_min", int), ("threshold_429", float), ("hold_power", float)):
+        v = d.get(key)
+        if v is not None and v == v and v != "":
+            opt[key] = conv(v)
+    return PlanSpec(
+        start_mw=float(d["start_mw"]),
+        target_mw=float(d["target_mw"]),
+        start_time=_parse_dt(d["start_time"], day),
+        overrides=_parse_overrides(d.get("overrides"), day),
+        name=str(d.get("name") or name),
+        **opt,
+    )
+
+
+def load_plans(path: str, *, day: Optional[date] = None) -> List[PlanSpec]:
+    """Đọc plan từ .json hoặc .csv (xem docstring module)."""
+    if os.fspath(path).lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("plans", [data])
+        return [plan_from_dict(d, day=day, name=str(i)) for i, d in enumerate(data)]
+    import csv
+    with open(path, newline="", encoding="utf-8") as f:
+        return [plan_from_dict(row, day=day, name=str(i)) for i, row in enumerate(csv.DictReader(f))]
+
+
+# ---- ghi kết quả ----
+def write_summary(results: Sequence[PlanResult], path: Optional[str]) -> None:
+    """Summary mỗi plan 1 dòng: .csv / .json; path None -> JSON lines ra stdout."""
+    records = [r.to_record() for r in results]
+    if path is None:
+        for r, rec in zip(results, records):
+            rec["notes"] = r.notes
+            print(json.dumps(rec, ensure_ascii=False))
+        return
+    if os.fspath(path).lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        return
+    import csv
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]) if records else ["name"])
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def write_timeline(results: Sequence[PlanResult], path: str, *, step_minutes: int = 1) -> None:
+    """Timeline của mọi plan (cột 'plan' = tên plan), định dạng theo đuôi file như export_df_with_minutes."""
+    import pandas as pd
+    from modules.export_utils import export_df_with_minutes
+    frames = []
+    for r in results:
+        df = r.timeline(step_minutes=step_minutes)
+        df.insert(0, "plan", r.spec.name)
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["plan", "t", "mw"])
+    export_df_with_minutes(df, path, group_col="plan")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="python -m modules.headless",
+        description="Tính timeline/sự kiện/MWh cho plan tăng giảm tải (không cần GUI).",
+    )
+    ap.add_argument("plans", help="file plan .json hoặc .csv")
+    ap.add_argument("--date", help="ngày ghép với giờ HH:MM (YYYY-MM-DD, mặc định hôm nay)")
+    ap.add_argument("--summary", help="ghi summary .csv/.json (mặc định: JSON lines ra stdout)")
+    ap.add_argument("--timeline", help="ghi timeline (.csv/.csv.gz/.parquet/.feather/.xlsx)")
+    ap.add_argument("--step", type=int, default=1, help="bước nội suy timeline (phút)")
+    args = ap.parse_args(argv)
+
+    day = date.fromisoformat(args.date) if args.date else None
+    try:
+        specs = load_plans(args.plans, day=day)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ERROR] đọc plan thất bại: {e}", file=sys.stderr)
+        return 2
+
+    results = [run_plan(spec) for spec in specs]
+    write_summary(results, args.summary)
+    if args.timeline:
+        write_timeline(results, args.timeline, step_minutes=args.step)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# modules/io_worker.py
+# -*- coding: utf-8 -*-
+"""
+Thread ghi file duy nhất cho app (Excel log, export plot DF, ...).
+
+- Mọi lệnh ghi đi qua 1 hàng đợi có giới hạn -> các file (abc.xlsx,
+  last_plot_df.xlsx, export theo timestamp) được ghi tuần tự, UI không chờ I/O.
+- coalesce=True: lệnh ghi cùng path còn đang chờ sẽ bị thay bằng lệnh mới nhất
+  (vd export plot DF mỗi lần update_plot -> chỉ ghi bản cuối).
+- Báo kết quả qua callback on_done(path) / on_error(path, msg) – gọi từ thread ghi;
+  bên UI nối vào Qt Signal để về lại thread GUI (xem ui/io_bridge.py).
+"""
+from __future__ import annotations
+
+import atexit
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+@dataclass
+class _WriteJob:
+    path: str
+    fn: Callable[..., Any]
+    args: tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    coalesce: bool = False
+
+
+class FileWriter:
+    def __init__(
+        self,
+        *,
+        maxsize: int = 64,
+        on_done: Optional[Callable[[str], None]] = None,
+        on_error: Optional[Callable[[str, str], None]] = None,
+    ):
+        self.maxsize = maxsize
+        self.on_done = on_done
+        self.on_error = on_error
+        self._jobs: Deque[_WriteJob] = deque()
+        self._coalescable: Dict[str, _WriteJob] = {}   # path -> job coalesce đang chờ
+        self._cond = threading.Condition()
+        self._busy = False
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self.coalesced = 0      # số lần ghi bị gộp (bỏ bản cũ)
+        atexit.register(self.close)     # gỡ trong close(): writer đã đóng không bị giữ tới lúc thoát
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="file-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, path: str, fn: Callable[..., Any], *args, coalesce: bool = False, **kwargs) -> bool:
+        """
+        Xếp lệnh ghi fn(*args, **kwargs) cho `path`. Không chặn UI:
+        trả về False (và báo on_error) nếu hàng đợi đầy hoặc writer đã đóng.
+        """
+        with self._cond:
+            if self._stopping:
+                reason = "writer closed"
+            elif coalesce and path in self._coalescable:
+                # thay nội dung lệnh đang chờ, giữ nguyên vị trí trong hàng
+                job = self._coalescable[path]
+                job.fn, job.args, job.kwargs = fn, args, kwargs
+                self.coalesced += 1
+                return True
+            elif len(self._jobs) >= self.maxsize:
+                reason = "write queue full"
+            else:
+                job = _WriteJob(path, fn, args, kwargs, coalesce)
+                self._jobs.append(job)
+                if coalesce:
+                    self._coalescable[path] = job
+                self._ensure_thread()
+                self._cond.notify_all()
+                return True
+        print(f"[WARN] FileWriter: {reason}, dropped write to {path}")
+        if self.on_error:
+            self.on_error(path, reason)
+        return False
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._jobs) + (1 if self._busy else 0)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._jobs and not self._stopping:
+                    self._cond.wait()
+                if not self._jobs:
+                    return          # đang đóng và đã ghi hết
+                job = self._jobs.popleft()
+                if self._coalescable.get(job.path) is job:
+                    del self._coalescable[job.path]
+                self._busy = True
+            try:
+                job.fn(*job.args, **job.kwargs)
+            except Exception as e:
+                print(f"[WARN] FileWriter: write to {job.path} failed: {e}")
+                if self.on_error:
+                    self.on_error(job.path, str(e))
+            else:
+                if self.on_done:
+                    self.on_done(job.path)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Chờ tới khi mọi lệnh đã ghi xong; False nếu hết timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._jobs and not self._busy, timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Ghi nốt hàng đợi rồi dừng thread (gọi lúc thoát app)."""
+        atexit.unregister(self.close)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
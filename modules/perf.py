@@ -0,0 +1,158 @@
+# modules/perf.py
+# -*- coding: utf-8 -*-
+"""
+Đo thời gian đường nóng (ramp, build_plot_df, densify, MWh, vẽ, canvas.draw) ngay trong app.
+
+    from modules.perf import timed, span, PERF
+
+    @timed("build_plot_df")
+    def build_plot_df(...): ...
+
+    with span("plot_df.echo"):
+        print(df.head(40).to_string())
+
+- Tắt (mặc định): @timed chỉ thêm 1 lần đọc cờ + 1 lời gọi hàm; span() trả về
+  nullcontext dùng chung – không cấp phát, không khoá.
+- Bật: LOADCHANGE_PERF=1, `python app.py --perf`, Ctrl+Shift+P trong app, hoặc PERF.enabled = True.
+- PERF.stats(): p50/p95/max trên `window` lần đo gần nhất mỗi tên (thread-safe, đo được cả
+  thread nền của compute worker).
+- PERF.export_trace(path): JSON theo Chrome Trace Event (mở bằng chrome://tracing hoặc
+  ui.perfetto.dev) – thấy rõ span lồng nhau + thread nào đang chạy.
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+F = TypeVar("F", bound=Callable)
+
+# (tên, bắt đầu ns, thời lượng ns, thread id)
+TraceEvent = Tuple[str, int, int, int]
+
+
+def _percentile(sorted_ms: List[float], q: float) -> float:
+    """Nearest-rank trên list đã sort (đủ cho cửa sổ vài trăm mẫu, không cần numpy)."""
+    if not sorted_ms:
+        return 0.0
+    k = min(len(sorted_ms), max(1, math.ceil(q / 100.0 * len(sorted_ms)))) - 1
+    return sorted_ms[k]
+
+
+class PerfRecorder:
+    """Cửa sổ lăn thời gian theo tên + vòng trace có giới hạn."""
+
+    def __init__(self, *, window: int = 200, trace_size: int = 20_000, enabled: bool = False):
+        self.enabled = enabled
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._trace: Deque[TraceEvent] = deque(maxlen=trace_size)
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter_ns()
+
+    def record(self, name: str, start_ns: int, end_ns: int) -> None:
+        dur = end_ns - start_ns
+        tid = threading.get_ident()
+        with self._lock:
+            buf = self._samples.get(name)
+            if buf is None:
+                buf = self._samples[name] = deque(maxlen=self.window)
+            buf.append(dur / 1e6)
+            self._counts[name] = self._counts.get(name, 0) + 1
+            self._trace.append((name, start_ns, dur, tid))
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """tên -> {count, last_ms, p50_ms, p95_ms, max_ms} (theo cửa sổ gần nhất)."""
+        with self._lock:
+            snap = {name: (list(buf), self._counts[name]) for name, buf in self._samples.items()}
+        out = {}
+        for name, (vals, count) in snap.items():
+            s = sorted(vals)
+            out[name] = {
+                "count": count,
+                "last_ms": vals[-1] if vals else 0.0,
+                "p50_ms": _percentile(s, 50),
+                "p95_ms": _percentile(s, 95),
+                "max_ms": s[-1] if s else 0.0,
+            }
+        return out
+
+    def snapshot_trace(self) -> Tuple[List[TraceEvent], Dict[int, str]]:
+        """Bản sao trace + tên thread (ghi file ở thread khác không cần giữ khoá)."""
+        with self._lock:
+            return list(self._trace), dict(self._threads)
+
+    def export_trace(self, path: str, snapshot: Optional[Tuple[List[TraceEvent], Dict[int, str]]] = None) -> int:
+        """Ghi Chrome Trace Event JSON; trả về số span đã ghi."""
+        events, threads = snapshot if snapshot is not None else self.snapshot_trace()
+        pid = os.getpid()
+        out = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": tname}}
+               for tid, tname in threads.items()]
+        out += [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                 "ts": (start - self._t0) / 1e3, "dur": dur / 1e3}
+                for name, start, dur, tid in events]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": out, "displayTimeUnit": "ms", "stats": self.stats()}, f)
+        return len(events)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._trace.clear()
+
+
+PERF = PerfRecorder(enabled=os.environ.get("LOADCHANGE_PERF", "") not in ("", "0"))
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("name", "rec", "t0")
+
+    def __init__(self, name: str, rec: PerfRecorder):
+        self.name = name
+        self.rec = rec
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.rec.record(self.name, self.t0, time.perf_counter_ns())
+        return False
+
+
+def span(name: str, rec: PerfRecorder = PERF):
+    """Context manager đo 1 khối; khi tắt trả về nullcontext dùng chung."""
+    if not rec.enabled:
+        return _NULL_SPAN
+    return _Span(name, rec)
+
+
+def timed(name: Optional[str] = None, rec: PerfRecorder = PERF) -> Callable[[F], F]:
+    """Decorator đo mỗi lần gọi hàm (tên mặc định: module.qualname)."""
+    def deco(fn: F) -> F:
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not rec.enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                rec.record(label, t0, time.perf_counter_ns())
+        return wrapper
+    return deco
@@ -0,0 +1,314 @@
+# modules/planner.py
+# -*- coding: utf-8 -*-
+"""
+Lập lịch nối lệnh (override) – thuần Python/NumPy, không Qt, không matplotlib.
+
+Quy tắc (giống PowerChangeWidget):
+  - mọi lệnh nối ramp từ mốc 429 MW (threshold_429)
+  - target > 429 (TĂNG) ⇒ bắt đầu tại HOLD_END của lệnh trước
+  - target < 429 (GIẢM) ⇒ bắt đầu tại HOLD_END + 45'
+  - chưa có lệnh nối: HOLD_END = hết pause tại 429 của ramp chính
+  - lệnh không có hold: HOLD_END = lúc đạt target (ramp end)
+
+OverridePlanner giữ hàng đợi Command + block segment từng lệnh; hold_start/hold_end
+nằm sẵn trên Command nên truy vấn lệnh cuối là O(1), không quét segments. Ghép block
+thành segments/breakpoints chỉ làm khi đọc (lazy, có cache), không làm ở mỗi lần thêm.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from modules.power_logic import CalcConfig, compute_power_change_cached
+
+# lệnh GIẢM phải chờ thêm sau HOLD_END
+DECREASE_DELAY = timedelta(minutes=45)
+
+
+@dataclass
+class Command:
+    start_mw: float
+    target_mw: float
+    start_time: datetime        # thời điểm người dùng nhập (ý định ban đầu)
+    hold_minutes: int           # thời gian hold sau khi đạt target (vd: 10’)
+    # các trường tính sau (điền khi lên timeline)
+    scheduled_start: datetime | None = None
+    hold_start: datetime | None = None
+    hold_end: datetime | None = None
+
+    @property
+    def end_time(self) -> datetime:
+        """HOLD_END; không có hold -> lúc đạt target; chưa lên lịch -> giờ bắt đầu."""
+        if self.hold_end is not None:
+            return self.hold_end
+        if self.hold_start is not None:
+            return self.hold_start
+        return self.scheduled_start or self.start_time
+
+
+def empty_segments() -> dict:
+    """Plan nối lệnh dạng cột: t (datetime64[ns]), mw (float64), tag (object)."""
+    return {
+        "t": np.empty(0, dtype="datetime64[ns]"),
+        "mw": np.empty(0, dtype=np.float64),
+        "tag": np.empty(0, dtype=object),
+    }
+
+
+def last_hold_window(
+    commands: List[Command],
+    *,
+    time_reaching_429: Optional[datetime],
+    post_pause_time: Optional[datetime],
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Cửa sổ HOLD của lệnh cuối; chưa có lệnh nối -> cửa sổ HOLD @429 của ramp chính."""
+    if commands:
+        last = commands[-1]
+        if last.hold_start is not None and last.hold_end is not None:
+            return last.hold_start, last.hold_end
+        return None, None
+    # kết thúc pause ở 429 ⇒ tiếp tục ramp (không dùng 462)
+    return time_reaching_429, post_pause_time
+
+
+def last_end_time(
+    commands: List[Command],
+    *,
+    time_reaching_429: Optional[datetime],
+    post_pause_time: Optional[datetime],
+    pause_time_429_min: int = 0,
+    now: Callable[[], datetime] = datetime.now,
+) -> datetime:
+    """Mốc kết thúc của lệnh cuối (HOLD_END, hoặc ramp end nếu không hold)."""
+    if not commands:
+        # end = HOLD_END của 429; nếu thiếu, suy từ 429 + pause_429
+        if post_pause_time:
+            return post_pause_time
+        if time_reaching_429 is not None:
+            return time_reaching_429 + timedelta(minutes=pause_time_429_min or 0)
+        return now()
+
+    return commands[-1].end_time
+
+
+def required_start(prev_end: datetime, target_mw: float, threshold_429: float) -> datetime:
+    """Giờ bắt đầu theo quy định: TĂNG tại HOLD_END lệnh trước, GIẢM tại HOLD_END + 45'."""
+    return prev_end if target_mw > threshold_429 else prev_end + DECREASE_DELAY
+
+
+def schedule_next_command(
+    new_cmd: Command,
+    commands: List[Command],
+    *,
+    threshold_429: float,
+    time_reaching_429: Optional[datetime],
+    post_pause_time: Optional[datetime],
+    pause_time_429_min: int = 0,
+    now: Callable[[], datetime] = datetime.now,
+) -> Tuple[bool, datetime, str]:
+    """
+    (ok, scheduled_start, msg): ok=False kèm thông báo khi giờ nhập nằm ngoài HOLD
+    của lệnh trước và phải dời theo quy định.
+    """
+    prev_hold_start, prev_hold_end = last_hold_window(
+        commands, time_reaching_429=time_reaching_429, post_pause_time=post_pause_time)
+    if prev_hold_start is None or prev_hold_end is None:
+        prev_hold_end = last_end_time(
+            commands, time_reaching_429=time_reaching_429, post_pause_time=post_pause_time,
+            pause_time_429_min=pause_time_429_min, now=now)
+
+    user_dt = new_cmd.start_time
+    is_increasing = new_cmd.target_mw > threshold_429
+    start_dt = required_start(prev_hold_end, new_cmd.target_mw, threshold_429)
+
+    in_hold_window = (prev_hold_start is not None and prev_hold_start <= user_dt <= prev_hold_end)
+    if in_hold_window:
+        return True, start_dt, ""
+    action = "Tăng (sau HOLD_END)" if is_increasing else "Giảm (sau HOLD_END + 45')"
+    msg = (
+        "Thời điểm anh nhập nằm trong giai đoạn HOLD của lệnh trước.\n"
+        "Để đảm bảo hold đủ thời gian, lệnh kế sẽ được tự động dời theo quy định:\n"
+        f"- {action} theo mốc 429 MW.\n"
+        f"Giờ người nhập: {user_dt.strftime('%H:%M')}\n"
+        f"Giờ yêu cầu:    {start_dt.strftime('%H:%M')}"
+    )
+    return False, start_dt, msg
+
+
+def command_segments(
+    start_mw: float,
+    target_mw: float,
+    start_dt: datetime,
+    hold_minutes: int,
+    cfg: CalcConfig,
+):
+    """
+    Kết quả: (segments, hold_start, hold_end)
+    segments dạng cột: {"t": datetime64[ns], "mw": float64, "tag": object}
+    kèm "bp_t"/"bp_mw": điểm gãy của cùng đường (dùng tính MWh dạng đóng).
+    cfg.pause_time_hold_min được thay bằng hold_minutes của lệnh.
+    """
+    cfg = CalcConfig(
+        threshold_429=cfg.threshold_429,
+        hold_power=cfg.hold_power,
+        pause_time_429_min=cfg.pause_time_429_min,
+        # dùng hold theo lệnh này để vẽ đoạn hold sau ramp
+        pause_time_hold_min=hold_minutes,
+        pulverizer_mode=cfg.pulverizer_mode,
+    )
+    # cache LRU: chỉ dời theo start_dt
+    result = compute_power_change_cached(
+        start_power=start_mw, target_power=target_mw, start_time=start_dt, cfg=cfg,
+    )
+
+    times = result.times_array
+    mw_values = result.powers_array
+    tags = np.full(len(times), "ramp", dtype=object)
+    bp_t, bp_mw = result.breakpoints()
+    bp_t = np.array(bp_t, dtype="datetime64[ns]")
+    bp_mw = np.array(bp_mw, dtype=np.float64)
+
+    ramp_end = result.final_load_time if len(times) else None
+    hold_start = ramp_end           # dùng như “thời điểm hoàn tất lệnh nối”
+    hold_end = None                 # không có HoldEnd khi hold_minutes == 0
+
+    if ramp_end is not None and hold_minutes > 0:
+        hold_end = ramp_end + timedelta(minutes=hold_minutes)
+        times = np.append(times, np.array([hold_start, hold_end], dtype="datetime64[ns]"))
+        mw_values = np.append(mw_values, [target_mw, target_mw])
+        tags = np.append(tags, np.array(["hold_start", "hold_end"], dtype=object))
+        bp_t = np.append(bp_t, np.array([hold_start, hold_end], dtype="datetime64[ns]"))
+        bp_mw = np.append(bp_mw, [target_mw, target_mw])
+
+    segs = {"t": times, "mw": mw_values, "tag": tags, "bp_t": bp_t, "bp_mw": bp_mw}
+    return segs, hold_start, hold_end
+
+
+def join_blocks(blocks: List[dict]) -> Tuple[dict, dict]:
+    """Ghép block từng lệnh -> (segments {"t","mw","tag"}, breakpoints {"x","y"})."""
+    if not blocks:
+        return empty_segments(), {"x": [], "y": []}
+    segments = {k: np.concatenate([segs[k] for segs in blocks]) for k in ("t", "mw", "tag")}
+    breakpoints = {
+        "x": np.concatenate([segs["bp_t"] for segs in blocks]),
+        "y": np.concatenate([segs["bp_mw"] for segs in blocks]),
+    }
+    return segments, breakpoints
+
+
+class OverridePlanner:
+    """
+    Hàng đợi lệnh nối + plan ghép:
+      - mỗi lệnh 1 block segment (song song commands); rebuild chỉ tính lệnh chưa có block
+      - segments/breakpoints ghép từ các block khi đọc lần đầu sau thay đổi (cache tới lần đổi sau)
+      - đổi cấu hình ramp -> tính lại toàn bộ; invalidate_from(idx) -> tính lại từ lệnh idx,
+        các lệnh sau được lên lịch lại theo HOLD_END mới của lệnh trước
+    Không giữ trạng thái ramp chính: các mốc HOLD @429 truyền vào khi lên lịch, nên
+    scheduled_start của lệnh đầu giữ nguyên như người gọi đặt.
+    """
+
+    def __init__(self, *, threshold_429: float = 429.0):
+        self.threshold_429 = threshold_429
+        self.commands: List[Command] = []
+        self._blocks: List[dict] = []
+        self._joined: Optional[Tuple[dict, dict]] = None
+        self._cfg: Optional[CalcConfig] = None
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    @property
+    def last(self) -> Optional[Command]:
+        return self.commands[-1] if self.commands else None
+
+    @property
+    def segments(self) -> dict:
+        """Plan ghép dạng cột {"t","mw","tag"} (theo các block đã tính)."""
+        return self._join()[0]
+
+    @property
+    def breakpoints(self) -> dict:
+        """Điểm gãy ghép {"x","y"} (tính MWh dạng đóng)."""
+        return self._join()[1]
+
+    def _join(self) -> Tuple[dict, dict]:
+        if self._joined is None:
+            self._joined = join_blocks(self._blocks)
+        return self._joined
+
+    def clear(self) -> None:
+        self.commands.clear()
+        self._blocks.clear()
+        self._joined = None
+        self._cfg = None
+
+    def schedule(
+        self,
+        new_cmd: Command,
+        *,
+        time_reaching_429: Optional[datetime],
+        post_pause_time: Optional[datetime],
+        pause_time_429_min: int = 0,
+        now: Callable[[], datetime] = datetime.now,
+    ) -> Tuple[bool, datetime, str]:
+        """Giờ bắt đầu hợp lệ cho lệnh mới (chưa thêm vào hàng đợi), xem schedule_next_command."""
+        return schedule_next_command(
+            new_cmd, self.commands,
+            threshold_429=self.threshold_429,
+            time_reaching_429=time_reaching_429,
+            post_pause_time=post_pause_time,
+            pause_time_429_min=pause_time_429_min,
+            now=now,
+        )
+
+    def invalidate_from(self, idx: int) -> None:
+        """
+        Lệnh thứ idx thay đổi → bỏ block của nó và các lệnh sau, xoá hold_* (và scheduled_start
+        của các lệnh sau) để lần rebuild tới lên lịch + tính lại phần đuôi.
+        """
+        idx = max(0, idx)
+        if idx < len(self._blocks):
+            del self._blocks[idx:]
+            self._joined = None
+        for i in range(idx, len(self.commands)):
+            cmd = self.commands[i]
+            cmd.hold_start = cmd.hold_end = None
+            if i > idx:
+                cmd.scheduled_start = None
+
+    def rebuild(self, cfg: CalcConfig) -> None:
+        """
+        Tính block cho các lệnh chưa có; lệnh sau lệnh đầu được lên lịch lại từ end_time
+        của lệnh trước (cùng quy định với schedule_next_command).
+        cfg: cấu hình ramp hiện tại (pause_time_hold_min bị thay bằng hold của từng lệnh).
+        """
+        # đổi cấu hình -> mọi block cũ không còn đúng; queue bị rút ngắn -> bỏ phần thừa
+        key = replace(cfg, pause_time_hold_min=0)
+        if key != self._cfg:
+            self.invalidate_from(0)
+            self._cfg = key
+        if len(self._blocks) > len(self.commands):
+            del self._blocks[len(self.commands):]
+            self._joined = None
+
+        # chỉ tính các lệnh chưa có block (thường chỉ là lệnh vừa thêm)
+        for idx in range(len(self._blocks), len(self.commands)):
+            cmd = self.commands[idx]
+            if idx > 0:
+                cmd.scheduled_start = required_start(
+                    self.commands[idx - 1].end_time, cmd.target_mw, self.threshold_429)
+            # lệnh đầu: scheduled_start do schedule() tính theo ramp chính, hoặc đúng giờ nhập
+            scheduled = cmd.scheduled_start or cmd.start_time
+            segs, cmd.hold_start, cmd.hold_end = command_segments(
+                self.threshold_429, cmd.target_mw, scheduled, cmd.hold_minutes, cfg)
+            self._blocks.append(segs)
+            self._joined = None
+
+    def add(self, cmd: Command, cfg: CalcConfig) -> Command:
+        """Thêm lệnh đã lên lịch (scheduled_start) rồi rebuild; hold_start/hold_end được điền."""
+        self.commands.append(cmd)
+        self.rebuild(cfg)
+        return cmd
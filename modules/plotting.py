@@ -1,7 +1,10 @@
 # modules/plotting.py
 # -*- coding: utf-8 -*-
+import numpy as np
 from matplotlib.figure import Figure
 
+from modules.perf import span, timed
+
 def make_figure():
     fig = Figure(figsize=(6, 4), dpi=120)
     ax = fig.add_subplot(111)
@@ -14,51 +17,48 @@ def make_figure():
 def _trim_main_until(main_xy, trim_time, trim_mw):
     if not main_xy or not trim_time:
         return main_xy
-    xs, ys = main_xy["x"], main_xy["y"]
-    if not xs or not ys:
+    xs = np.asarray(main_xy["x"], dtype="datetime64[ns]")
+    ys = np.asarray(main_xy["y"], dtype=np.float64)
+    if len(xs) == 0 or len(ys) == 0:
         return main_xy
 
-    kept_x, kept_y = [], []
-    for t, y in zip(xs, ys):
-        if t <= trim_time:
-            kept_x.append(t)
-            kept_y.append(y)
+    tt = np.datetime64(trim_time, "ns")
+    keep = xs <= tt
+    kept_x, kept_y = xs[keep], ys[keep]
 
     # đảm bảo có “mối hàn” tại trim_time với MW chuẩn
-    if not kept_x or kept_x[-1] < trim_time:
-        kept_x.append(trim_time)
-        kept_y.append(trim_mw)
-    else:
-        if kept_x[-1] == trim_time and kept_y[-1] != trim_mw:
-            kept_y[-1] = trim_mw
+    if len(kept_x) == 0 or kept_x[-1] < tt:
+        kept_x = np.append(kept_x, tt)
+        kept_y = np.append(kept_y, trim_mw)
+    elif kept_y[-1] != trim_mw:
+        kept_y[-1] = trim_mw
 
     return {"x": kept_x, "y": kept_y, "label": main_xy.get("label", "Plan")}
 
 
 def _prepare_joined_from(joined_segments, start_time, start_mw):
+    """joined_segments dạng cột: {"t": datetime64[ns], "mw": float64, ...}."""
     if not joined_segments or not start_time:
         return None
-    xs = [seg["t"] for seg in joined_segments]
-    ys = [seg["mw"] for seg in joined_segments]
-    if not xs:
+    xs = np.asarray(joined_segments["t"], dtype="datetime64[ns]")
+    ys = np.asarray(joined_segments["mw"], dtype=np.float64)
+    if len(xs) == 0:
         return None
 
-    kept_x, kept_y = [], []
-    for t, y in zip(xs, ys):
-        if t >= start_time:
-            kept_x.append(t)
-            kept_y.append(y)
+    st = np.datetime64(start_time, "ns")
+    keep = xs >= st
+    kept_x, kept_y = xs[keep], ys[keep]
 
-    if not kept_x or kept_x[0] > start_time:
-        kept_x.insert(0, start_time)
-        kept_y.insert(0, start_mw)
-    else:
-        if kept_x[0] == start_time and kept_y[0] != start_mw:
-            kept_y[0] = start_mw
+    if len(kept_x) == 0 or kept_x[0] > st:
+        kept_x = np.insert(kept_x, 0, st)
+        kept_y = np.insert(kept_y, 0, start_mw)
+    elif kept_y[0] != start_mw:
+        kept_y[0] = start_mw
 
     return {"x": kept_x, "y": kept_y, "label": "Plan"}
 
 
+@timed("draw_main_and_joined")
 def draw_main_and_joined(
     ax, *,
     main_xy=None,
@@ -70,9 +70,19 @@ def draw_main_and_joined(
     main_color="tab:green",
     joined_color="tab:orange",   # tách riêng với bridge
     bridge_color="tab:orange",
-    hold_color="#5dade2"
+    hold_color="#5dade2",
+    main_keep=None, joined_keep=None,   # mốc giữ đúng + marker (xem decimate_xy)
+    max_points=None,                    # None = theo bề rộng trục (pixel); 0 = không giảm điểm
 ):
     ax.clear()
+    n_out = max(int(ax.bbox.width), 200) if max_points is None else int(max_points)
+
+    def _plot(xy, keep, **kw):
+        x, y = xy["x"], xy["y"]
+        marks = [0, len(x) - 1]
+        if n_out > 0:
+            x, y, marks = decimate_xy(x, y, n_out, keep_times=keep)
+        ax.plot(x, y, marker="o", markevery=list(marks), linestyle="-", **kw)
 
     if hold_windows:
         for t0, t1, _label in hold_windows:
@@ -93,13 +103,13 @@ def draw_main_and_joined(
                 linestyle="-", color=bridge_color, label="_nolegend_", zorder=1)
 
     plotted = False
-    if main_xy and main_xy["x"]:
-        ax.plot(main_xy["x"], main_xy["y"],
-                marker="o", linestyle="-", color=main_color, label=main_xy.get("label", "Plan (Main)"), zorder=3)
+    if main_xy and len(main_xy["x"]):
+        _plot(main_xy, list(main_keep or []) + [trim_time],
+              color=main_color, label=main_xy.get("label", "Plan (Main)"), zorder=3)
         plotted = True
-    if joined_xy and joined_xy["x"]:
-        ax.plot(joined_xy["x"], joined_xy["y"],
-                marker="o", linestyle="-", color=joined_color, label="Plan (Joined)", zorder=2)
+    if joined_xy and len(joined_xy["x"]):
+        _plot(joined_xy, list(joined_keep or []) + [start_time] + ([override_point[0]] if override_point else []),
+              color=joined_color, label="Plan (Joined)", zorder=2)
         plotted = True
 
 
@@ -114,3 +124,368 @@ def draw_main_and_joined(
     ax.set_title('TREND: POWER DEPEND ON TIMES')
     ax.set_xlabel('TIMES')
     ax.set_ylabel('POWER (MW)')
+
+
+# ---- Giảm điểm trước khi vẽ (chuỗi theo giây vài giờ = hàng chục nghìn điểm) ----
+DECIMATE_METHODS = ("lttb", "minmax")
+DECIMATE_MIN_RATIO = 2      # chuỗi <= 2 x n_out điểm: vẽ nguyên, giảm điểm tốn hơn phần vẽ tiết kiệm được
+
+
+def _as_ns(times) -> np.ndarray:
+    return np.asarray(times, dtype="datetime64[ns]").astype(np.int64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: chọn n_out chỉ số (gồm điểm đầu/cuối),
+    mỗi bucket lấy điểm tạo tam giác lớn nhất với điểm đã chọn ở bucket trước và
+    trung bình bucket sau. x, y: float64 (x tăng dần).
+    Vector hoá trên view 2-D (bucket x điểm, đệm tới bucket dài nhất), không vòng lặp Python:
+    điểm "đã chọn ở bucket trước" lấy từ lượt 1 (neo = trung bình bucket trước), lượt 2
+    chọn lại với neo đó – gần như trùng LTTB tuần tự, sai khác chỉ ở bucket gần hoà.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 bucket ở giữa, chia đều theo số điểm (mỗi bucket >= 1 điểm)
+    edges = (np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+    lo, hi = edges[:-1], edges[1:]
+    cnt = (hi - lo).astype(np.float64)
+    mean_x = np.add.reduceat(x[1:n - 1], lo - 1) / cnt
+    mean_y = np.add.reduceat(y[1:n - 1], lo - 1) / cnt
+    # đỉnh thứ 3: trung bình bucket sau (bucket cuối -> điểm cuối)
+    nxt_x = np.append(mean_x[1:], x[-1])
+    nxt_y = np.append(mean_y[1:], y[-1])
+
+    cols = lo[:, None] + np.arange(int((hi - lo).max()))
+    pad = cols >= hi[:, None]
+    cols = np.minimum(cols, n - 2)
+    bx, by = x[cols], y[cols]
+    rows = np.arange(len(lo))
+
+    def pick(ax, ay):
+        ax, ay = ax[:, None], ay[:, None]
+        area = np.abs((ax - nxt_x[:, None]) * (by - ay) - (ax - bx) * (nxt_y[:, None] - ay))
+        area[pad] = -1.0
+        return cols[rows, np.argmax(area, axis=1)]
+
+    sel = pick(np.append(x[0], mean_x[:-1]), np.append(y[0], mean_y[:-1]))
+    sel = pick(np.append(x[0], x[sel[:-1]]), np.append(y[0], y[sel[:-1]]))
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    out[1:-1] = sel
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Min + max mỗi bucket (chia đều theo số điểm) + điểm đầu/cuối; vector hoá hoàn toàn."""
+    n = len(y)
+    if n_buckets < 1 or 2 * n_buckets + 2 >= n:
+        return np.arange(n)
+    k = -(-n // n_buckets)
+    pad = np.full(n_buckets * k, np.nan)
+    pad[:n] = y
+    pad = pad.reshape(n_buckets, k)
+    pad[~np.isfinite(pad)] = np.nan
+    base = np.arange(n_buckets) * k
+    valid = ~np.all(np.isnan(pad), axis=1)
+    filled = np.where(np.isnan(pad), np.inf, pad)
+    i_min = base + np.argmin(filled, axis=1)
+    filled = np.where(np.isnan(pad), -np.inf, pad)
+    i_max = base + np.argmax(filled, axis=1)
+    idx = np.concatenate([[0, n - 1], i_min[valid], i_max[valid]])
+    return np.unique(idx[idx < n])
+
+
+def decimate_xy(xs, ys, n_out: int, *, keep_times=None, method: str = "lttb"):
+    """
+    Giảm chuỗi (xs datetime, ys MW) còn khoảng n_out điểm, GIỮ ĐÚNG các mốc keep_times
+    (điểm gãy, 429, post-pause, hold start/end, override...):
+      - mốc trùng 1 mẫu -> giữ nguyên mẫu đó
+      - mốc nằm giữa 2 mẫu -> chèn điểm nội suy (nằm đúng trên đường đang vẽ)
+      - mốc ngoài [xs[0], xs[-1]] -> bỏ qua
+    Trả về (x datetime64[ns], y float64, marker_idx): marker_idx = vị trí các mốc
+    (và 2 đầu mút) trong chuỗi kết quả, dùng cho Line2D.set_markevery.
+    """
+    if method not in DECIMATE_METHODS:
+        raise ValueError(f"method phải là một trong {DECIMATE_METHODS}, nhận {method!r}")
+    t = _as_ns(xs)
+    y = np.asarray(ys, dtype=np.float64)
+    n = min(len(t), len(y))
+    t, y = t[:n], y[:n]
+    if n == 0:
+        return t.astype("datetime64[ns]"), y, np.empty(0, dtype=np.int64)
+
+    # mốc cần giữ, lọc NaT/ngoài khoảng
+    kt = np.empty(0, dtype=np.int64)
+    if keep_times is not None:
+        kt = _as_ns([k for k in keep_times if k is not None])
+        kt = kt[(kt != np.iinfo(np.int64).min) & (kt >= t[0]) & (kt <= t[-1])]
+    kt = np.unique(np.concatenate([[t[0], t[-1]], kt]))
+
+    if n > n_out * DECIMATE_MIN_RATIO:
+        tf = (t - t[0]).astype(np.float64)
+        if method == "lttb":
+            idx = lttb_indices(tf, y, n_out)
+        else:
+            idx = minmax_indices(y, max(n_out // 2, 1))
+    else:
+        idx = np.arange(n)
+
+    # mốc trùng mẫu -> thêm chỉ số; mốc lệch lưới -> chèn điểm nội suy
+    pos = np.searchsorted(t, kt)
+    hit = (pos < n) & (t[np.minimum(pos, n - 1)] == kt)
+    idx = np.union1d(idx, pos[hit])
+    extra_t = kt[~hit]
+    out_t = np.concatenate([t[idx], extra_t])
+    out_y = np.concatenate([y[idx], np.interp(extra_t, t, y)])
+    order = np.argsort(out_t, kind="stable")
+    out_t, out_y = out_t[order], out_y[order]
+    marker_idx = np.searchsorted(out_t, kt)
+    return out_t.astype("datetime64[ns]"), out_y, marker_idx
+
+
+# ---- Renderer giữ artist cố định: set_data + blit thay cho ax.clear() mỗi lần ----
+class PlotRenderer:
+    """
+    Tạo Line2D / vùng hold / annotate MỘT lần trên `ax`, mỗi lần update chỉ set_data.
+    - Artist dữ liệu để animated: nền (trục, lưới, nhãn, legend) được chụp lại sau mỗi
+      lần vẽ đầy đủ; nếu giới hạn trục/legend không đổi thì chỉ restore nền + vẽ lại
+      các artist dữ liệu + blit (vài ms).
+    - Giới hạn trục hoặc legend đổi -> draw_idle() (vẽ đầy đủ, gộp nhiều yêu cầu).
+    - Chuỗi main/joined/overlay được giảm còn ~ bề rộng trục theo pixel (decimate_xy),
+      giữ đúng điểm gãy + mốc sự kiện; marker chỉ vẽ tại các mốc đó.
+    Lưu ý: artist animated không có trong figure.savefig -> dùng PlotRenderer.savefig.
+    """
+
+    def __init__(
+        self, ax, *,
+        main_color="tab:green",
+        joined_color="tab:orange",
+        bridge_color="tab:orange",
+        hold_color="#5dade2",
+        overlay_main_color="tab:blue",
+        overlay_joined_color="blue",
+        event_color="tab:blue",
+        title='TREND: POWER DEPEND ON TIMES',
+        decimate_method="lttb",
+        max_points=None,        # None = theo bề rộng trục (pixel); 0 = không giảm điểm
+    ):
+        self.ax = ax
+        self.figure = ax.figure
+        self.canvas = ax.figure.canvas
+        self.colors = dict(main=main_color, joined=joined_color, bridge=bridge_color, hold=hold_color,
+                           ov_main=overlay_main_color, ov_joined=overlay_joined_color, event=event_color)
+        self.title = title
+        self.decimate_method = decimate_method
+        self.max_points = max_points
+        self._bg = None
+        self._saving = False
+        self._legend_key = None
+        self.full_draws = 0
+        self.blits = 0
+        self._build()
+        self._cid = self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    # -- tạo artist (gọi lại nếu ai đó đã ax.clear()) --
+    def _build(self):
+        ax, c = self.ax, self.colors
+        empty = np.empty(0, dtype="datetime64[ns]"), np.empty(0)
+        self.bridge_line, = ax.plot(*empty, linestyle="-", color=c["bridge"], label="_nolegend_", zorder=1)
+        self.main_line, = ax.plot(*empty, marker="o", linestyle="-", color=c["main"], label="Plan (Main)", zorder=3)
+        self.joined_line, = ax.plot(*empty, marker="o", linestyle="-", color=c["joined"], label="Plan (Joined)", zorder=2)
+        self.ov_main_line, = ax.plot(*empty, color=c["ov_main"], linestyle="--", linewidth=1.2, alpha=0.9,
+                                     label="DF main (check)", zorder=5)
+        self.ov_joined_line, = ax.plot(*empty, color=c["ov_joined"], linestyle="--", linewidth=1.2, alpha=0.9,
+                                       label="DF joined (check)", zorder=5)
+        self.event_marks, = ax.plot(*empty, linestyle="none", marker="o", markersize=18 ** 0.5,
+                                    color=c["event"], alpha=0.9, label="DF events", zorder=6)
+        self.override_text = ax.annotate("", (0, 0), xytext=(5, 5), textcoords="offset points")
+        self.override_text.set_visible(False)
+        self.spans = []     # pool axvspan, thiếu thì tạo thêm, thừa thì ẩn
+        self._lines = [self.bridge_line, self.main_line, self.joined_line,
+                       self.ov_main_line, self.ov_joined_line, self.event_marks]
+        for a in self._lines + [self.override_text]:
+            a.set_animated(True)
+        ax.set_title(self.title)
+        ax.set_xlabel('TIMES')
+        ax.set_ylabel('POWER (MW)')
+        self._legend_key = None
+        self._bg = None
+
+    def _alive(self) -> bool:
+        return self.main_line.axes is self.ax and self.main_line in self.ax.lines
+
+    def _animated_artists(self):
+        return self.spans + self._lines + [self.override_text]
+
+    def _set_spans(self, windows):
+        from matplotlib.dates import date2num
+        windows = [(t0, t1) for t0, t1, *_ in (windows or []) if t0 and t1 and t1 > t0]
+        while len(self.spans) < len(windows):
+            sp = self.ax.axvspan(0, 1, alpha=0.15, color=self.colors["hold"])
+            sp.set_animated(True)
+            self.spans.append(sp)
+        for sp, (t0, t1) in zip(self.spans, windows):
+            x0, x1 = date2num(t0), date2num(t1)
+            if hasattr(sp, "set_bounds"):       # matplotlib >= 3.9: Rectangle
+                sp.set_bounds(x0, 0, x1 - x0, 1)
+            else:                               # bản cũ: Polygon
+                sp.set_xy([(x0, 0), (x0, 1), (x1, 1), (x1, 0), (x0, 0)])
+            sp.set_visible(True)
+        for sp in self.spans[len(windows):]:
+            sp.set_visible(False)
+
+    @staticmethod
+    def _set_xy(line, xy):
+        if xy is not None and len(xy[0]):
+            line.set_data(xy[0], xy[1])
+            line.set_visible(True)
+        else:
+            line.set_data(np.empty(0, dtype="datetime64[ns]"), np.empty(0))
+            line.set_visible(False)
+
+    def _n_points(self) -> int:
+        """Số điểm tối đa mỗi đường: ~ bề rộng vùng trục theo pixel (LTTB cần cỡ 1 điểm/pixel)."""
+        if self.max_points is not None:
+            return int(self.max_points)
+        return max(int(self.ax.bbox.width), 200)
+
+    def _set_decimated(self, line, xy, keep_times=None, markers=False):
+        """set_data với chuỗi đã giảm điểm; markers=True -> marker chỉ tại mốc giữ lại."""
+        if xy is None or not len(xy[0]):
+            self._set_xy(line, None)
+            return
+        n_out = self._n_points()
+        if n_out <= 0:
+            x, y = xy
+            marks = [0, len(x) - 1]
+        else:
+            x, y, marks = decimate_xy(xy[0], xy[1], n_out, keep_times=keep_times,
+                                      method=self.decimate_method)
+        self._set_xy(line, (x, y))
+        if markers:
+            line.set_markevery(list(marks))
+
+    @timed("PlotRenderer.update")
+    def update(
+        self, *,
+        main_xy=None,
+        joined_segments=None,
+        hold_windows=None,
+        override_point=None,
+        trim_time=None, trim_mw=None,
+        start_time=None, start_mw=None,
+        overlay=None,       # {"main": (x, y), "joined": (x, y), "events": (x, y)} từ plot DF
+        main_keep=None,     # mốc giữ đúng + có marker trên main: điểm gãy, 429, post-pause, hold...
+        joined_keep=None,   # ... trên joined: điểm gãy plan nối, override
+    ):
+        """Cùng tham số/ngữ nghĩa với draw_main_and_joined, nhưng cập nhật artist có sẵn."""
+        if not self._alive():
+            self._build()
+
+        self._set_spans(hold_windows)
+
+        if main_xy and trim_time and trim_mw is not None:
+            main_xy = _trim_main_until(main_xy, trim_time, trim_mw)
+        joined_xy = None
+        if joined_segments and start_time and start_mw is not None:
+            joined_xy = _prepare_joined_from(joined_segments, start_time, start_mw)
+
+        bridge = None
+        if (trim_time is not None and start_time is not None and start_time > trim_time
+                and trim_mw is not None and start_mw is not None):
+            bridge = (np.array([trim_time, start_time], dtype="datetime64[ns]"),
+                      np.array([start_mw, start_mw], dtype=np.float64))
+        self._set_xy(self.bridge_line, bridge)
+
+        if main_xy:
+            self.main_line.set_label(main_xy.get("label", "Plan (Main)"))
+        main_keep = list(main_keep or []) + [trim_time]
+        joined_keep = list(joined_keep or []) + [start_time]
+        if override_point:
+            joined_keep.append(override_point[0])
+        self._set_decimated(self.main_line, (main_xy["x"], main_xy["y"]) if main_xy else None,
+                            main_keep, markers=True)
+        self._set_decimated(self.joined_line, (joined_xy["x"], joined_xy["y"]) if joined_xy else None,
+                            joined_keep, markers=True)
+
+        overlay = overlay or {}
+        self._set_decimated(self.ov_main_line, overlay.get("main"), main_keep)
+        self._set_decimated(self.ov_joined_line, overlay.get("joined"), joined_keep)
+        self._set_xy(self.event_marks, overlay.get("events"))
+
+        if override_point:
+            t_ov, mw_ov, text = override_point
+            self.override_text.xy = (t_ov, mw_ov)
+            self.override_text.set_text(text)
+            self.override_text.set_visible(True)
+        else:
+            self.override_text.set_visible(False)
+
+        self.refresh()
+
+    def clear(self):
+        """Ẩn toàn bộ dữ liệu (reset)."""
+        self.update()
+
+    # -- render --
+    def _sync_legend(self) -> bool:
+        """Legend theo các đường đang hiện; True nếu phải dựng lại (-> cần vẽ đầy đủ)."""
+        handles = [a for a in self._lines if a is not self.bridge_line and a.get_visible()]
+        key = tuple(h.get_label() for h in handles)
+        if key == self._legend_key:
+            return False
+        self._legend_key = key
+        old = self.ax.get_legend()
+        if old is not None:
+            old.remove()
+        if handles:
+            self.ax.legend(handles=handles)
+        return True
+
+    def refresh(self):
+        old_lim = (self.ax.get_xlim(), self.ax.get_ylim())
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view()
+        lim_changed = (self.ax.get_xlim(), self.ax.get_ylim()) != old_lim
+        legend_changed = self._sync_legend()
+        if lim_changed or legend_changed or self._bg is None:
+            self.figure.autofmt_xdate()
+            self.full_draws += 1
+            self.canvas.draw_idle()
+            return
+        # chỉ dữ liệu đổi: restore nền + vẽ artist + blit
+        self.blits += 1
+        with span("canvas.blit"):
+            self.canvas.restore_region(self._bg)
+            self._draw_animated()
+            self.canvas.blit(self.figure.bbox)
+
+    def _draw_animated(self):
+        for a in self._animated_artists():
+            if a.get_visible():
+                self.figure.draw_artist(a)
+
+    def _on_draw(self, event):
+        if self._saving or (event is not None and event.canvas is not self.canvas):
+            return      # đang savefig (artist đã vẽ thường) hoặc canvas khác
+        if not self._alive():
+            return
+        self._bg = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+    def savefig(self, *args, **kwargs):
+        """figure.savefig có cả các artist dữ liệu (bình thường animated nên bị bỏ qua)."""
+        arts = self._animated_artists()
+        for a in arts:
+            a.set_animated(False)
+        self._saving = True
+        try:
+            self.figure.savefig(*args, **kwargs)
+        finally:
+            self._saving = False
+            for a in arts:
+                a.set_animated(True)
+            self._bg = None     # nền cũ có thể đã bị ghi đè bởi lần vẽ để lưu
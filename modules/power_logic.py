@@ -1,11 +1,26 @@
 # power_logic.py
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Optional, Literal, Union
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, astuple, replace
+from functools import cached_property
+from typing import List, NamedTuple, Optional, Literal, Sequence, Union, Tuple
 from datetime import datetime, timedelta
+import numpy as np
+
+from modules.perf import timed
 
 PulsMode = Literal["3 Puls", "4 Puls"]
 
+# Quy ước ramp (MW/giây) và ngưỡng đổi tốc độ
+RATE_LOW = 0.11          # <330 MW  (6.6 MW/phút)
+RATE_HIGH = 0.22         # >=330 MW (13.2 MW/phút)
+RATE_KNEE_MW = 330.0
+# Tránh timeline vô hạn (1 ngày = 86400 bước 1 giây)
+MAX_SECONDS = 24 * 60 * 60
+EPS = 1e-9
+
 @dataclass
 class CalcConfig:
     threshold_429: float = 429.0
@@ -14,15 +29,111 @@ class CalcConfig:
     pause_time_hold_min: int = 30    # giữ tại holding MW (phút)
     pulverizer_mode: PulsMode = "4 Puls"
 
+@dataclass
+class BatchCalcResult:
+    """Kết quả tính hàng loạt: mỗi trường là 1 cột datetime64[ns] (NaT = không có mốc)."""
+    final_load_time: np.ndarray
+    time_reaching_429: np.ndarray
+    post_pause_time: np.ndarray
+    time_holding_462: np.ndarray
+    hold_complete_time: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.final_load_time)
+
+@dataclass(frozen=True)
+class RampPiece:
+    """
+    Một đoạn tuyến tính của timeline: n+1 điểm cách nhau 1 giây,
+    bắt đầu tại (t0, p0), mỗi bước thay đổi `rate` MW (có dấu).
+    """
+    t0: datetime
+    p0: float
+    rate: float
+    n: int
+
+    @property
+    def t1(self) -> datetime:
+        return self.t0 + timedelta(seconds=self.n)
+
+    @property
+    def p1(self) -> float:
+        return self.p0 + self.rate * self.n
+
 @dataclass
 class CalcResult:
-    times: List[datetime]
-    powers: List[float]
     final_load_time: datetime
     time_reaching_429: Optional[datetime]
     post_pause_time: Optional[datetime]
     time_holding_462: Optional[datetime]
     hold_complete_time: Optional[datetime]
+    # timeline dạng các đoạn tuyến tính; điểm dày (theo giây) chỉ sinh khi cần:
+    #   times_array/powers_array: mảng datetime64[ns]/float64
+    #   times/powers: list view tương thích code cũ
+    pieces: List[RampPiece] = field(default_factory=list)
+
+    def breakpoints(self) -> Tuple[List[datetime], List[float]]:
+        """Các điểm gãy (đầu/cuối mỗi đoạn) – đủ để vẽ/nội suy chính xác."""
+        xs: List[datetime] = []
+        ys: List[float] = []
+        for pc in self.pieces:
+            xs.append(pc.t0)
+            ys.append(pc.p0)
+            if pc.n > 0:
+                xs.append(pc.t1)
+                ys.append(pc.p1)
+        return xs, ys
+
+    def sample(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sinh chuỗi điểm theo GIÂY (1 điểm mỗi bước) dưới dạng mảng liên tục:
+        (datetime64[ns], float64). Không tạo object datetime cho từng điểm.
+        """
+        if not self.pieces:
+            return np.empty(0, dtype="datetime64[ns]"), np.empty(0, dtype=np.float64)
+        counts = np.array([pc.n + 1 for pc in self.pieces], dtype=np.int64)
+        t0 = np.array([pc.t0 for pc in self.pieces], dtype="datetime64[ns]")
+        p0 = np.array([pc.p0 for pc in self.pieces], dtype=np.float64)
+        rate = np.array([pc.rate for pc in self.pieces], dtype=np.float64)
+        # chỉ số bước trong từng đoạn: 0..n
+        offs = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        times = np.repeat(t0, counts) + offs.astype("timedelta64[s]")
+        powers = np.repeat(p0, counts) + np.repeat(rate, counts) * offs
+        return times, powers
+
+    @cached_property
+    def _dense(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.sample()
+
+    @property
+    def times_array(self) -> np.ndarray:
+        return self._dense[0]
+
+    @property
+    def powers_array(self) -> np.ndarray:
+        return self._dense[1]
+
+    def shifted(self, delta: timedelta) -> "CalcResult":
+        """Bản sao dời toàn bộ timeline đi `delta` (hình dạng ramp giữ nguyên)."""
+        def sh(t: Optional[datetime]) -> Optional[datetime]:
+            return t + delta if t is not None else None
+        return CalcResult(
+            final_load_time=self.final_load_time + delta,
+            time_reaching_429=sh(self.time_reaching_429),
+            post_pause_time=sh(self.post_pause_time),
+            time_holding_462=sh(self.time_holding_462),
+            hold_complete_time=sh(self.hold_complete_time),
+            pieces=[replace(pc, t0=pc.t0 + delta) for pc in self.pieces],
+        )
+
+    # view dạng list cho code cũ (tạo 1 lần khi truy cập)
+    @cached_property
+    def times(self) -> List[datetime]:
+        return self.times_array.astype("datetime64[us]").tolist()
+
+    @cached_property
+    def powers(self) -> List[float]:
+        return self.powers_array.tolist()
 
 def _parse_time_flex(s: str) -> datetime:
     try:
@@ -30,6 +141,83 @@ def _parse_time_flex(s: str) -> datetime:
     except ValueError:
         return datetime.strptime(s, "%H:%M")
 
+@dataclass(frozen=True)
+class _RampProfile:
+    """
+    Công suất theo số bước k (chưa clamp target):
+      k <= n_knee : start + d*r1*k
+      k >  n_knee : p_knee + d*r2*(k - n_knee)
+    """
+    start: float
+    d: float          # +1 tăng, -1 giảm
+    r1: float
+    r2: float
+    n_knee: int
+
+    @classmethod
+    def build(cls, start: float, increasing: bool) -> "_RampProfile":
+        if increasing:
+            if start >= RATE_KNEE_MW:
+                return cls(start, 1.0, RATE_HIGH, RATE_HIGH, 0)
+            line = cls(start, 1.0, RATE_LOW, RATE_LOW, 0)
+            # tốc độ thấp khi p < 330 -> đổi tốc độ ở bước đầu tiên p >= 330
+            return cls(start, 1.0, RATE_LOW, RATE_HIGH, line.steps_past(RATE_KNEE_MW))
+        if start < RATE_KNEE_MW:
+            return cls(start, -1.0, RATE_LOW, RATE_LOW, 0)
+        line = cls(start, -1.0, RATE_HIGH, RATE_HIGH, 0)
+        # tốc độ cao khi p >= 330 -> đổi tốc độ ở bước đầu tiên p < 330
+        return cls(start, -1.0, RATE_HIGH, RATE_LOW, line.steps_past(RATE_KNEE_MW, strict=True))
+
+    @property
+    def p_knee(self) -> float:
+        return self.start + self.d * self.r1 * self.n_knee
+
+    def power_at(self, k: int) -> float:
+        if k <= self.n_knee:
+            return self.start + self.d * self.r1 * k
+        return self.p_knee + self.d * self.r2 * (k - self.n_knee)
+
+    def rate_after(self, k: int) -> float:
+        """Tốc độ (có dấu) của bước k -> k+1."""
+        return self.d * (self.r1 if k < self.n_knee else self.r2)
+
+    def _accumulated_power(self, k: int) -> float:
+        """Giá trị cộng dồn từng bước (có sai số float) như vòng lặp theo giây cũ."""
+        p = self.start
+        for i in range(k):
+            p += self.rate_after(i)
+        return p
+
+    def steps_to(self, x: float) -> int:
+        """Số bước tới target (dừng khi |p - target| < EPS)."""
+        dist = self.d * (x - self.start)
+        if dist <= EPS:
+            return 0
+        dist_knee = self.d * (self.p_knee - self.start)
+        if dist <= dist_knee + EPS:
+            return max(0, math.ceil((dist - EPS) / self.r1 - EPS))
+        return self.n_knee + max(0, math.ceil((dist - dist_knee - EPS) / self.r2 - EPS))
+
+    def steps_past(self, x: float, strict: bool = False) -> int:
+        """
+        Bước đầu tiên công suất chạm ngưỡng x theo chiều ramp
+        (strict=True: phải vượt hẳn x) – dùng cho mốc 330/429/holding.
+        """
+        dist = self.d * (x - self.start)
+        dist_knee = self.d * (self.p_knee - self.start)
+        if dist <= dist_knee:
+            k0, q = 0, dist / self.r1
+        else:
+            k0, q = self.n_knee, (dist - dist_knee) / self.r2
+        k = k0 + round(q)
+        if abs(q - round(q)) > 1e-6:
+            return max(0, k0 + math.ceil(q))
+        # ngưỡng rơi đúng một bước: quyết định như vòng lặp cũ (so sánh giá trị cộng dồn)
+        over = self.d * (self._accumulated_power(k) - x)
+        reached = over > 0 if strict else over >= 0
+        return k if reached else k + 1
+
+@timed("compute_power_change_and_pauses")
 def compute_power_change_and_pauses(
     start_power: float,
     target_power: float,
@@ -41,103 +229,287 @@ def compute_power_change_and_pauses(
     Quy ước ramp mới:
       <330 MW: 0.11 MW/giây   (tương đương 6.6 MW/phút)
       >=330 MW: 0.22 MW/giây  (tương đương 13.2 MW/phút)
+
+    Tính dạng đóng (closed-form): mỗi mốc (429, hết pause, hold 462, đạt tải)
+    được suy trực tiếp từ số bước 1 giây cần thiết, không lặp từng giây.
+    Timeline trả về dưới dạng các đoạn tuyến tính (`CalcResult.pieces`);
+    `times`/`powers` theo giây chỉ được sinh khi truy cập.
     """
     if isinstance(start_time, str):
         start_time = _parse_time_flex(start_time)
 
-    current_power = float(start_power)
-    increasing = start_power < target_power
+    start = float(start_power)
+    target = float(target_power)
+    increasing = start < target
+    prof = _RampProfile.build(start, increasing)
 
-    times = [start_time]
-    powers = [start_power]
+    # số bước tới target (start == target vẫn đi 1 bước như vòng lặp cũ)
+    n_total = max(1, prof.steps_to(target))
+    capped = n_total > MAX_SECONDS
+    if capped:
+        n_total = MAX_SECONDS
 
-    time_reaching_429: Optional[datetime] = None
-    post_pause_time:   Optional[datetime] = None
-    time_holding_462:  Optional[datetime] = None
-    hold_complete_time:Optional[datetime] = None
-    pause_time_added = False
+    # các mốc pause: (bước k, tên, phút) – pause chèn sau điểm k
+    events: List[Tuple[int, str, int]] = []
+    if increasing:
+        if start < cfg.threshold_429:
+            k = prof.steps_past(cfg.threshold_429)
+            if k < n_total:
+                events.append((k, "429", 15 if cfg.pulverizer_mode == "3 Puls" else 0))
+    else:
+        if target < cfg.hold_power and start > cfg.hold_power:
+            k = prof.steps_past(cfg.hold_power)
+            if k < n_total:
+                minutes = 15 if cfg.pulverizer_mode == "3 Puls" else cfg.pause_time_hold_min
+                events.append((k, "hold", minutes))
+        if start > cfg.threshold_429:
+            k = prof.steps_past(cfg.threshold_429)
+            if k < n_total:
+                minutes = 25 if cfg.pulverizer_mode == "3 Puls" else cfg.pause_time_429_min
+                events.append((k, "429", minutes))
+    events.sort(key=lambda e: e[0])   # sort ổn định: hold trước 429 nếu cùng bước
 
-    t = start_time
+    marks = {}
+    shifts: List[Tuple[int, int]] = []   # (bước k, tổng giây pause tính đến sau k)
+    paused = 0
+    for k, name, minutes in events:
+        t_evt = start_time + timedelta(seconds=k + paused)
+        paused += minutes * 60
+        marks[name] = (t_evt, start_time + timedelta(seconds=k + paused))
+        shifts.append((k, paused))
 
-    # Bước thời gian theo giây
-    STEP = timedelta(seconds=1)
-    # Tránh vòng lặp vô hạn (1 ngày = 86400 bước)
-    MAX_SECONDS = 24 * 60 * 60
-    EPS = 1e-9
+    def time_at(k: int) -> datetime:
+        extra = 0
+        for ek, acc in shifts:
+            if ek < k:
+                extra = acc
+        return start_time + timedelta(seconds=k + extra)
 
-    for _ in range(MAX_SECONDS):
-        # tốc độ theo ngưỡng 330 MW (đơn vị MW/giây)
-        power_rate = 0.11 if current_power < 330 else 0.22
+    def power_at(k: int) -> float:
+        if k >= n_total and not capped:
+            return target
+        return prof.power_at(k)
 
-        if increasing:
-            # chạm 429 khi đang tăng
-            if (start_power < cfg.threshold_429
-                and current_power >= cfg.threshold_429
-                and time_reaching_429 is None):
-                time_reaching_429 = t
-                if not pause_time_added:
-                    if cfg.pulverizer_mode == "3 Puls":
-                        t += timedelta(minutes=15)
-                    else:  # 4 Puls
-                        t += timedelta(minutes=0)
-                    post_pause_time = t
-                    pause_time_added = True
-
-            # clamp bước cuối
-            if current_power + power_rate > target_power:
-                power_rate = max(0.0, target_power - current_power)
-
-            current_power += power_rate
+    # cắt đoạn sau các điểm: đổi tốc độ, pause, bước clamp cuối
+    cuts = {n_total - 1}
+    if 0 < prof.n_knee < n_total - 1:
+        cuts.add(prof.n_knee)
+    cuts.update(k for k, _, _ in events)
 
-        else:
-            # Giữ tại holding MW khi đang GIẢM
-            if (target_power < cfg.hold_power
-                and current_power <= cfg.hold_power
-                and start_power > cfg.hold_power
-                and time_holding_462 is None):
-                time_holding_462 = t
-                if cfg.pulverizer_mode == "3 Puls":
-                    t += timedelta(minutes=15)
-                else:
-                    t += timedelta(minutes=cfg.pause_time_hold_min)
-                hold_complete_time = t
-
-            # đạt 429 khi giảm tải
-            if (start_power > cfg.threshold_429
-                and current_power <= cfg.threshold_429
-                and time_reaching_429 is None):
-                time_reaching_429 = t
-                if not pause_time_added:
-                    if cfg.pulverizer_mode == "3 Puls":
-                        t += timedelta(minutes=25)
-                    else:
-                        t += timedelta(minutes=cfg.pause_time_429_min)
-                    post_pause_time = t
-                    pause_time_added = True
-
-            # clamp bước cuối
-            if current_power - power_rate < target_power:
-                power_rate = max(0.0, current_power - target_power)
-
-            current_power -= power_rate
-
-        # tiến thời gian 1 giây + lưu điểm
-        t += STEP
-        times.append(t)
-        powers.append(current_power)
-
-        # dừng khi đạt target
-        if abs(current_power - target_power) < EPS:
-            break
-
-    final_load_time = t
+    pieces: List[RampPiece] = []
+    a = 0
+    for c in sorted(cuts) + [n_total]:
+        if c < a:
+            continue
+        rate = prof.rate_after(a) if c > a else 0.0
+        pieces.append(RampPiece(t0=time_at(a), p0=power_at(a), rate=rate, n=c - a))
+        a = c + 1
+
+    time_reaching_429, post_pause_time = marks.get("429", (None, None))
+    time_holding_462, hold_complete_time = marks.get("hold", (None, None))
 
     return CalcResult(
-        times=times,
-        powers=powers,
-        final_load_time=final_load_time,
+        final_load_time=time_at(n_total),
         time_reaching_429=time_reaching_429,
         post_pause_time=post_pause_time,
         time_holding_462=time_holding_462,
         hold_complete_time=hold_complete_time,
+        pieces=pieces,
+    )
+
+
+# ---- cache LRU: hình dạng ramp chỉ phụ thuộc (start MW, target MW, CalcConfig) ----
+class RampCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+class RampCache:
+    """
+    LRU cache cho compute_power_change_and_pauses.
+    Lưu timeline tương đối (tính tại mốc gốc cố định) rồi dời tới start_time
+    được yêu cầu – start_time chỉ là độ lệch thời gian.
+    """
+    _ORIGIN = datetime(2000, 1, 1)
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[tuple, CalcResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        start_power: float,
+        target_power: float,
+        start_time: Union[str, datetime],
+        cfg: CalcConfig,
+    ) -> CalcResult:
+        if isinstance(start_time, str):
+            start_time = _parse_time_flex(start_time)
+        key = (float(start_power), float(target_power), astuple(cfg))
+        with self._lock:
+            rel = self._data.get(key)
+            if rel is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+        if rel is None:
+            rel = compute_power_change_and_pauses(start_power, target_power, self._ORIGIN, cfg)
+            with self._lock:
+                self.misses += 1
+                self._data[key] = rel
+                if len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return rel.shifted(start_time - self._ORIGIN)
+
+    def cache_info(self) -> RampCacheInfo:
+        with self._lock:
+            return RampCacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+_ramp_cache = RampCache()
+
+def compute_power_change_cached(
+    start_power: float,
+    target_power: float,
+    start_time: Union[str, datetime],
+    cfg: CalcConfig,
+) -> CalcResult:
+    """Như compute_power_change_and_pauses nhưng dùng cache LRU dùng chung của module."""
+    return _ramp_cache.get(start_power, target_power, start_time, cfg)
+
+def ramp_cache_info() -> RampCacheInfo:
+    """Số hit/miss của cache ramp dùng chung (kiểm tra hiệu quả trên chuỗi override dài)."""
+    return _ramp_cache.cache_info()
+
+def ramp_cache_clear() -> None:
+    _ramp_cache.cache_clear()
+
+
+# ---- tính hàng loạt (vector hoá NumPy) ----
+def _config_columns(cfg: Union[CalcConfig, Sequence[CalcConfig]], shape):
+    """CalcConfig hoặc mảng CalcConfig -> các cột (thr, hold, pause_429, pause_hold, is_3puls)."""
+    if isinstance(cfg, CalcConfig):
+        cols = (
+            np.float64(cfg.threshold_429),
+            np.float64(cfg.hold_power),
+            np.int64(cfg.pause_time_429_min),
+            np.int64(cfg.pause_time_hold_min),
+            np.bool_(cfg.pulverizer_mode == "3 Puls"),
+        )
+    else:
+        cfgs = list(np.asarray(cfg, dtype=object).ravel())
+        cols = (
+            np.array([c.threshold_429 for c in cfgs], dtype=np.float64),
+            np.array([c.hold_power for c in cfgs], dtype=np.float64),
+            np.array([c.pause_time_429_min for c in cfgs], dtype=np.int64),
+            np.array([c.pause_time_hold_min for c in cfgs], dtype=np.int64),
+            np.array([c.pulverizer_mode == "3 Puls" for c in cfgs], dtype=bool),
+        )
+    return [np.broadcast_to(c, shape) for c in cols]
+
+def _v_steps_past(s, inc, d, r1, r2, n_knee, x, strict, mask):
+    """
+    Bản vector của _RampProfile.steps_past. Chỉ các hàng `mask` có ý nghĩa;
+    hàng có ngưỡng rơi đúng biên bước được giải bằng bản scalar (có nhớ).
+    """
+    dist = d * (x - s)
+    dist_knee = r1 * n_knee
+    in1 = dist <= dist_knee
+    k0 = np.where(in1, 0, n_knee)
+    q = np.where(in1, dist / r1, (dist - dist_knee) / r2)
+    k = np.maximum(0, k0 + np.ceil(q).astype(np.int64))
+    amb = mask & (np.abs(q - np.rint(q)) <= 1e-6)
+    if amb.any():
+        x = np.broadcast_to(x, s.shape)
+        strict = np.broadcast_to(strict, s.shape)
+        memo = {}
+        for i in np.flatnonzero(amb):
+            key = (float(s[i]), bool(inc[i]), float(x[i]), bool(strict[i]))
+            if key not in memo:
+                memo[key] = _RampProfile.build(key[0], key[1]).steps_past(key[2], key[3])
+            k[i] = memo[key]
+    return k
+
+def compute_power_change_batch(
+    start_power,
+    target_power,
+    start_time,
+    cfg: Union[CalcConfig, Sequence[CalcConfig]],
+) -> BatchCalcResult:
+    """
+    Bản vector hoá của compute_power_change_and_pauses cho nhiều kịch bản một lúc.
+
+    start_power/target_power: mảng MW; start_time: mảng datetime64/datetime
+    (hoặc 1 giá trị dùng chung); cfg: 1 CalcConfig hoặc mảng CalcConfig cùng kích thước.
+    Các đầu vào được broadcast với nhau. Trả về các cột mốc thời gian (NaT nếu không có).
+    """
+    s, t, t0 = np.broadcast_arrays(
+        np.asarray(start_power, dtype=np.float64),
+        np.asarray(target_power, dtype=np.float64),
+        np.asarray(start_time, dtype="datetime64[ns]"),
+    )
+    s, t, t0 = s.ravel(), t.ravel(), t0.ravel()
+    shape = s.shape
+    thr, hold, p429, phold, is3 = _config_columns(cfg, shape)
+    if thr.shape != shape:
+        raise ValueError("cfg phải là 1 CalcConfig hoặc mảng cùng kích thước với đầu vào.")
+
+    inc = s < t
+    d = np.where(inc, 1.0, -1.0)
+    has_knee = np.where(inc, s < RATE_KNEE_MW, s >= RATE_KNEE_MW)
+    r2 = np.where(inc, RATE_HIGH, RATE_LOW)
+    r1 = np.where(has_knee, np.where(inc, RATE_LOW, RATE_HIGH), r2)
+
+    # bước đổi tốc độ: tăng -> p >= 330; giảm -> p < 330 (strict)
+    zero = np.zeros(shape, dtype=np.int64)
+    n_knee = _v_steps_past(s, inc, d, r1, r1, zero, RATE_KNEE_MW, ~inc, has_knee)
+    n_knee = np.where(has_knee, n_knee, 0)
+    dist_knee = r1 * n_knee
+
+    # số bước tới target (giống _RampProfile.steps_to)
+    dist = d * (t - s)
+    n_total = np.where(
+        dist <= dist_knee + EPS,
+        np.ceil((dist - EPS) / r1 - EPS),
+        n_knee + np.ceil((dist - dist_knee - EPS) / r2 - EPS),
+    )
+    n_total = np.where(dist <= EPS, 0, np.maximum(n_total, 0)).astype(np.int64)
+    n_total = np.clip(n_total, 1, MAX_SECONDS)
+
+    # mốc pause: 429 (cả 2 chiều) và holding MW (chỉ khi giảm)
+    cand_429 = np.where(inc, s < thr, s > thr)
+    cand_hold = ~inc & (t < hold) & (s > hold)
+    k_429 = _v_steps_past(s, inc, d, r1, r2, n_knee, thr, False, cand_429)
+    k_hold = _v_steps_past(s, inc, d, r1, r2, n_knee, hold, False, cand_hold)
+
+    ev_429 = cand_429 & (k_429 < n_total)
+    ev_hold = cand_hold & (k_hold < n_total)
+    pause_429 = np.where(inc, np.where(is3, 15, 0), np.where(is3, 25, p429)) * 60
+    pause_hold = np.where(is3, 15, phold) * 60
+    pause_429 = np.where(ev_429, pause_429, 0)
+    pause_hold = np.where(ev_hold, pause_hold, 0)
+
+    # hold trước 429 khi cùng bước (giống thứ tự trong vòng lặp)
+    sec_429 = k_429 + np.where(ev_hold & (k_hold <= k_429), pause_hold, 0)
+    sec_hold = k_hold + np.where(ev_429 & (k_429 < k_hold), pause_429, 0)
+    sec_final = n_total + pause_429 + pause_hold
+
+    one_s = np.timedelta64(1, "s")
+    nat = np.datetime64("NaT", "ns")
+    t_429 = t0 + sec_429 * one_s
+    t_hold = t0 + sec_hold * one_s
+    return BatchCalcResult(
+        final_load_time=t0 + sec_final * one_s,
+        time_reaching_429=np.where(ev_429, t_429, nat),
+        post_pause_time=np.where(ev_429, t_429 + pause_429 * one_s, nat),
+        time_holding_462=np.where(ev_hold, t_hold, nat),
+        hold_complete_time=np.where(ev_hold, t_hold + pause_hold * one_s, nat),
     )
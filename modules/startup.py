@@ -0,0 +1,124 @@
+# modules/startup.py
+# -*- coding: utf-8 -*-
+"""
+Khởi động nhanh cho app.py:
+
+- StartupClock: mốc thời gian các pha (import, tạo cửa sổ, vẽ lần đầu, canvas sẵn sàng...).
+- warm_up(): import trước các module nặng (pandas, openpyxl, pygame, gTTS, matplotlib)
+  trên thread nền sau khi cửa sổ đã hiện -> lần dùng đầu tiên không phải chờ import.
+- importtime_report(): chạy `python -X importtime -c "import <target>"` ở process con,
+  in bảng các import tốn thời gian nhất (self/cumulative) – xem phần còn lại đi đâu.
+"""
+from __future__ import annotations
+
+import importlib
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# module nặng, chỉ cần khi tính DF/MWh, ghi Excel, phát audio, vẽ
+WARM_UP_MODULES = (
+    "pandas",
+    "modules.df_plot",
+    "modules.energy",
+    "modules.compute_worker",
+    "modules.export_utils",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_agg",
+    "openpyxl",
+    "pygame",
+    "gtts",
+)
+
+
+class StartupClock:
+    """Ghi mốc (label, ms kể từ lúc tạo) – thread-safe, dùng được từ thread warm-up."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.marks: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def mark(self, label: str) -> float:
+        ms = (time.perf_counter() - self.t0) * 1000.0
+        with self._lock:
+            self.marks.append((label, ms))
+        return ms
+
+    def report(self) -> str:
+        with self._lock:
+            marks = sorted(self.marks, key=lambda m: m[1])
+        lines = ["startup phases:      ms"]
+        lines += [f"  {label:<24} {ms:8.1f}" for label, ms in marks]
+        return "\n".join(lines)
+
+
+def warm_up(
+    modules: Iterable[str] = WARM_UP_MODULES,
+    *,
+    clock: Optional[StartupClock] = None,
+    on_done: Optional[Callable[[Dict[str, float]], None]] = None,
+    background: bool = True,
+):
+    """
+    Import lần lượt các module; trả về thread (hoặc dict thời gian nếu background=False).
+    Module thiếu (vd gtts chưa cài) chỉ ghi nhận, không báo lỗi – sẽ báo khi thực sự dùng.
+    """
+    names = list(modules)
+
+    def _run() -> Dict[str, float]:
+        took: Dict[str, float] = {}
+        for name in names:
+            t = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"[WARN] warm-up: import {name} failed: {e}")
+                continue
+            took[name] = (time.perf_counter() - t) * 1000.0
+        if clock is not None:
+            clock.mark("warm-up done")
+        if on_done:
+            on_done(took)
+        return took
+
+    if not background:
+        return _run()
+    th = threading.Thread(target=_run, name="warm-up", daemon=True)
+    th.start()
+    return th
+
+
+def parse_importtime(text: str) -> List[Tuple[str, int, int, int]]:
+    """Dòng `import time: self | cumulative | name` -> [(name, self_us, cum_us, depth)]."""
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            depth = (len(name) - len(name.lstrip(" "))) // 2
+            rows.append((name.strip(), int(self_us), int(cum_us), depth))
+        except ValueError:
+            continue
+    return rows
+
+
+def importtime_report(target: str = "ui.main_window", *, top: int = 15, cwd: Optional[str] = None) -> str:
+    """Bảng `-X importtime` cho `import target` (process con, cold import)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, cwd=cwd,
+    )
+    rows = parse_importtime(proc.stderr)
+    if not rows:
+        return f"importtime: không đọc được kết quả (exit {proc.returncode})\n{proc.stderr[-500:]}"
+    total = max(cum for _, _, cum, _ in rows)
+    lines = [f"import {target}: {total / 1000:.1f} ms (cold, -X importtime)",
+             f"  {'cumulative ms':>13} {'self ms':>8}  module"]
+    # module gốc (depth 0/1) theo cumulative: import nào kéo theo nhiều nhất
+    heads = sorted((r for r in rows if r[3] <= 1), key=lambda r: -r[2])[:top]
+    lines += [f"  {cum / 1000:13.1f} {self_us / 1000:8.1f}  {name}" for name, self_us, cum, _ in heads]
+    return "\n".join(lines)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from modules.alarms import ALARM_PRIORITIES, AlarmScheduler
+
+
+def dt(day, h, m, s=0):
+    return datetime(2024, 1, day, h, m, s)
+
+
+def _scheduler():
+    said = []
+    sched = AlarmScheduler(lambda message, priority: said.append((message, priority)))
+    return sched, said
+
+
+def test_heap_order_and_fire_at_start_of_minute():
+    sched, said = _scheduler()
+    sched.schedule("final_load", dt(1, 9, 30, 40), "load")
+    sched.schedule("429", dt(1, 8, 15, 59), "429")
+    sched.schedule("holding_complete", dt(1, 9, 0), "hold")
+
+    assert sched.next_due() == dt(1, 8, 15)                 # giây bị bỏ: phát đầu phút
+    assert sched.fire_due(dt(1, 8, 14, 59)) == []
+    assert sched.fire_due(dt(1, 8, 15)) == ["429"]
+    assert sched.fire_due(dt(1, 9, 30)) == ["holding_complete", "final_load"]
+    assert said == [("429", 2), ("hold", 1), ("load", 1)]
+    assert len(sched) == 0 and sched.next_due() is None
+
+
+def test_reschedule_and_cancel_are_lazy():
+    sched, said = _scheduler()
+    sched.schedule("429", dt(1, 8, 0), "old")
+    sched.schedule("429", dt(1, 8, 30), "new")               # entry cũ vẫn trong heap, bị bỏ khi pop
+    sched.schedule("final_load", dt(1, 8, 10), "load")
+    sched.cancel("final_load")
+    assert len(sched._heap) == 3 and len(sched) == 1
+
+    assert sched.next_due() == dt(1, 8, 30)
+    assert sched.fire_due(dt(1, 8, 20)) == []
+    assert sched.fire_due(dt(1, 8, 30)) == ["429"]
+    assert said == [("new", ALARM_PRIORITIES["429"])]
+
+    sched.schedule("429", None, "x")                         # at=None -> huỷ
+    assert sched.next_due() is None
+
+
+def test_same_minute_fires_by_priority():
+    sched, said = _scheduler()
+    for key in ("429", "final_load", "override"):
+        sched.schedule(key, dt(1, 10, 0), key)
+    assert sched.fire_due(dt(1, 10, 0, 5)) == ["override", "final_load", "429"]
+    assert [p for _, p in said] == sorted(ALARM_PRIORITIES[k] for k in ("429", "final_load", "override"))
+
+
+def test_crossing_midnight_uses_full_datetime():
+    sched, said = _scheduler()
+    sched.schedule("final_load", dt(2, 0, 5), "after midnight")
+    sched.schedule("429", dt(1, 23, 58), "before midnight")
+
+    # due() cũ chỉ so giờ trong ngày: 23:59 >= 00:05 -> phát sớm gần 1 ngày
+    assert sched.fire_due(dt(1, 23, 59)) == ["429"]
+    assert sched.fire_due(dt(2, 0, 4)) == []
+    assert sched.fire_due(dt(2, 0, 5)) == ["final_load"]
+
+    # mốc trước nửa đêm, lần kiểm tra kế tiếp đã sang ngày mới: vẫn phát
+    sched.schedule("holding_complete", dt(2, 23, 59), "late")
+    assert sched.fire_due(dt(3, 0, 1)) == ["holding_complete"]
+
+
+def test_set_timeline_skips_fired_flags():
+    sched, _ = _scheduler()
+    sched.set_timeline({"429": dt(1, 8, 0), "final_load": dt(1, 9, 0), "override": None},
+                       {"429": True}, {"final_load": "load"})
+    assert len(sched) == 1 and sched.next_due() == dt(1, 9, 0)
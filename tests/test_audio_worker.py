@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import heapq
+
+from modules.audio_tts import AudioWorker
+
+
+class _StubCache:
+    def get_or_synthesize(self, text, lang):
+        raise AssertionError("không được synth/phát trong test")
+
+
+def _worker(maxsize=16):
+    w = AudioWorker(_StubCache(), maxsize=maxsize)
+    w.start = lambda: None          # không chạy thread: chỉ kiểm tra hàng đợi
+    return w
+
+
+def _drain(w):
+    return [(p, text) for p, _, text, _ in (heapq.heappop(w._heap) for _ in range(len(w._heap)))]
+
+
+def test_priority_then_submit_order():
+    w = _worker()
+    assert w.submit("reminder 429", priority=2)
+    assert w.submit("final load", priority=1)
+    assert w.submit("hold end", priority=0)
+    assert w.submit("override done", priority=0)
+    assert _drain(w) == [(0, "hold end"), (0, "override done"), (1, "final load"), (2, "reminder 429")]
+    assert w._thread is None
+
+
+def test_duplicate_pending_text_is_dropped():
+    w = _worker()
+    assert w.submit("hold end", priority=1)
+    assert not w.submit("hold end", priority=0)       # đang chờ -> bỏ, giữ entry cũ
+    assert w.submit("hold end", lang="vi", priority=0)  # khác ngôn ngữ -> câu khác
+    assert w.qsize() == 2
+    assert w._pending == {("hold end", "en"), ("hold end", "vi")}
+
+
+def test_full_queue_drops_worst():
+    w = _worker(maxsize=3)
+    for text, p in (("a", 1), ("b", 2), ("c", 2)):
+        assert w.submit(text, priority=p)
+
+    assert not w.submit("d", priority=2)              # không hơn câu tệ nhất -> bỏ câu mới
+    assert w.submit("urgent", priority=0)             # hơn -> bỏ câu tệ nhất (ưu tiên thấp, gửi sau cùng)
+    assert w._pending == {("a", "en"), ("b", "en"), ("urgent", "en")}
+    assert w.submit("c", priority=1)                  # câu đã bị bỏ được gửi lại bình thường
+    assert _drain(w) == [(0, "urgent"), (1, "a"), (1, "c")]
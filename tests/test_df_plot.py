@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.df_plot import build_plot_df, densify_uniform
+
+
+def hm(h, m, s=0):
+    return datetime(2024, 1, 1, h, m, s)
+
+
+MAIN = {"x": [hm(8, 0), hm(8, 10), hm(8, 20), hm(8, 30)], "y": [400.0, 429.0, 429.0, 450.0]}
+JOINED = {"x": [hm(8, 30), hm(8, 40)], "y": [430.0, 420.0]}
+HOLD = [(hm(8, 10), hm(8, 20), "Hold @429")]
+EVENTS = {"t_429": hm(8, 10), "post_pause": hm(8, 20, 20), "cut": hm(8, 25), "override_done": hm(8, 40),
+          "missing": None}
+
+
+def _df():
+    return build_plot_df(MAIN, JOINED, trim_time=hm(8, 25), trim_mw=440.0,
+                         hold_windows=[(a, b) for a, b, _ in HOLD], events=EVENTS)
+
+
+def _row(df, t, source):
+    rows = df[(df["t"] == pd.Timestamp(t)) & (df["source"] == source)]
+    assert len(rows) == 1, (t, source)
+    return rows.iloc[0]
+
+
+def test_build_plot_df_trims_joins_and_labels():
+    df = _df()
+    assert list(df.columns) == ["t", "mw", "source", "seg_id", "is_hold", "evt"]
+    assert list(df["t"]) == [pd.Timestamp(t) for t in
+                             (hm(8, 0), hm(8, 10), hm(8, 20), hm(8, 25), hm(8, 25), hm(8, 30), hm(8, 40))]
+    assert list(df["mw"]) == [400.0, 429.0, 429.0, 440.0, 440.0, 430.0, 420.0]
+    assert list(df["source"]) == ["main"] * 4 + ["joined"] * 3
+    assert list(df["seg_id"]) == [0] * 4 + [1] * 3
+    assert list(df["is_hold"]) == [False, True, True, False, False, False, False]
+    # điểm gần nhất; hoà (08:25 ở cả main và joined) -> dòng đứng trước
+    assert list(df["evt"]) == [None, "t_429", "post_pause", "cut", None, None, "override_done"]
+
+
+def test_densify_uniform_grid_hold_and_events():
+    out = densify_uniform(_df(), step_minutes=5, hold_windows_labeled=HOLD, plateau_429=429.0)
+    assert list(out.columns) == ["t", "mw", "source", "seg_id", "is_hold", "evt"]
+    main, joined = out[out["source"] == "main"], out[out["source"] == "joined"]
+    assert len(main) == 6 and len(joined) == 4
+    assert (main["seg_id"] == 0).all() and (joined["seg_id"] == 1).all()
+
+    assert _row(out, hm(8, 5), "main")["mw"] == pytest.approx(414.5)
+    assert _row(out, hm(8, 15), "main")["is_hold"] and _row(out, hm(8, 15), "main")["mw"] == 429.0
+    assert not _row(out, hm(8, 25), "main")["is_hold"]
+    assert _row(out, hm(8, 35), "joined")["mw"] == pytest.approx(425.0)
+
+    # evt chỉ ở mốc gốc trùng lưới, không lan sang điểm nội suy
+    assert _row(out, hm(8, 10), "main")["evt"] == "t_429"
+    assert _row(out, hm(8, 25), "main")["evt"] == "cut"
+    assert _row(out, hm(8, 40), "joined")["evt"] == "override_done"
+    assert pd.isna(_row(out, hm(8, 5), "main")["evt"])
+
+
+def test_densify_uniform_fractional_step():
+    out = densify_uniform(_df(), step_minutes=2.5)
+    main = out[out["source"] == "main"]
+    assert len(main) == 11
+    assert _row(out, hm(8, 2, 30), "main")["mw"] == pytest.approx(407.25)
+
+    out = densify_uniform(_df(), step_minutes=10 / 60)       # lưới 10 giây
+    main = out[out["source"] == "main"]
+    assert len(main) == 25 * 6 + 1
+    assert np.all(np.diff(main["t"].to_numpy()).astype("timedelta64[s]").astype(int) == 10)
+
+    with pytest.raises(ValueError):
+        densify_uniform(_df(), step_minutes=0)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from datetime import datetime
+
+from modules.excel_io import ExcelUpdater
+
+
+def _pending_lines(upd):
+    try:
+        with open(upd.pending_file, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def test_single_buffered_row_reaches_sidecar_after_interval(tmp_path):
+    upd = ExcelUpdater(str(tmp_path / "log.xlsx"), buffered=True, flush_rows=50, flush_interval_s=0.2)
+    try:
+        upd.append_data({"time_now": datetime(2024, 1, 1, 8, 0), "target_power": 500})
+        assert _pending_lines(upd) == []          # chưa tới hạn: vẫn trong RAM
+
+        deadline = time.monotonic() + 3.0
+        while not _pending_lines(upd) and time.monotonic() < deadline:
+            time.sleep(0.05)                      # không có lần append nào nữa
+
+        recs = _pending_lines(upd)
+        assert len(recs) == 1
+        assert recs[0]["k"] == ["time_now", "target_power"]
+        assert recs[0]["v"] == [{"$dt": "2024-01-01T08:00:00"}, 500]
+    finally:
+        upd.close()
+
+
+def test_flush_by_row_count_cancels_timer(tmp_path):
+    upd = ExcelUpdater(str(tmp_path / "log.xlsx"), buffered=True, flush_rows=2, flush_interval_s=60.0)
+    try:
+        upd.append_data({"a": 1})
+        assert upd._flush_timer is not None
+        upd.append_data({"a": 2})
+        assert len(_pending_lines(upd)) == 2
+        assert upd._flush_timer is None
+    finally:
+        upd.close()
+
+
+def _sheet_rows(path):
+    from openpyxl import load_workbook
+    return [list(r) for r in load_workbook(path).active.iter_rows(values_only=True)]
+
+
+def test_rows_with_different_keys_share_one_header(tmp_path):
+    path = str(tmp_path / "log.xlsx")
+    upd = ExcelUpdater(path)
+    upd.append_data({"time_now": "08:00", "start_power": 429, "target_power": 500})
+    upd.append_data_hold({"hold_start": "08:40", "hold_end": "08:50"})      # không key nào trùng
+    upd.append_data({"target_power": 450, "time_now": "09:00"})              # khác thứ tự, thiếu cột
+
+    assert _sheet_rows(path) == [
+        ["time_now", "start_power", "target_power", "hold_start", "hold_end"],
+        ["08:00", 429, 500, None, None],
+        [None, None, None, "08:40", "08:50"],
+        ["09:00", None, 450, None, None],
+    ]
+
+
+def test_headerless_sheet_is_written_by_position(tmp_path):
+    from openpyxl import Workbook
+    path = str(tmp_path / "old.xlsx")
+    wb = Workbook()
+    wb.active.append([datetime(2024, 1, 1, 8, 0), 429, 500])
+    wb.save(path)
+
+    ExcelUpdater(path).append_data({"time_now": "09:00", "target_power": 450})
+    assert _sheet_rows(path)[1] == ["09:00", 450, None]
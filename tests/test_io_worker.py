@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import gc
+import weakref
+
+from modules.io_worker import FileWriter
+
+
+def test_writes_in_order_and_coalesces(tmp_path):
+    out = []
+    w = FileWriter()
+    try:
+        w.submit("a", out.append, 1)
+        w.submit("b", out.append, 2, coalesce=True)
+        w.submit("b", out.append, 3, coalesce=True)     # có thể gộp nếu lệnh trước chưa chạy
+        assert w.flush(5.0)
+    finally:
+        w.close()
+    assert out[0] == 1 and out[-1] == 3 and len(out) == 2 + (w.coalesced == 0)
+    assert not w.submit("c", out.append, 4)             # đã đóng
+
+
+def test_close_unregisters_atexit_hook():
+    w = FileWriter()
+    w.submit("a", lambda: None)
+    w.close()
+    ref = weakref.ref(w)
+    del w
+    gc.collect()
+    assert ref() is None                                # atexit không còn giữ writer đã đóng
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from modules.planner import DECREASE_DELAY, Command, OverridePlanner
+from modules.power_logic import CalcConfig
+
+CFG = CalcConfig(pause_time_hold_min=0)
+T0 = datetime(2024, 1, 1, 8, 0)
+
+
+def _plan(specs):
+    """specs: [(target_mw, hold_minutes)] – lên lịch nối tiếp như widget/headless."""
+    planner = OverridePlanner()
+    for target, hold in specs:
+        cmd = Command(start_mw=429.0, target_mw=target, start_time=T0, hold_minutes=hold)
+        _, cmd.scheduled_start, _ = planner.schedule(
+            cmd, time_reaching_429=None, post_pause_time=None, now=lambda: T0)
+        planner.add(cmd, CFG)
+    return planner
+
+
+def test_edit_first_of_three_reschedules_followers():
+    planner = _plan([(500, 10), (400, 0), (480, 5)])
+    c0, c1, c2 = planner.commands
+    old_starts = (c1.scheduled_start, c2.scheduled_start)
+
+    c0.hold_minutes = 30                      # HOLD_END lệnh 0 lùi 20'
+    planner.invalidate_from(0)
+    planner.rebuild(CFG)
+
+    assert c0.hold_end == c0.hold_start + timedelta(minutes=30)
+    assert c1.scheduled_start == c0.hold_end + DECREASE_DELAY      # GIẢM: HOLD_END + 45'
+    assert c2.scheduled_start == c1.end_time                        # TĂNG: ngay khi lệnh 1 xong
+    assert (c1.scheduled_start, c2.scheduled_start) == tuple(t + timedelta(minutes=20) for t in old_starts)
+
+
+def test_rebuilt_plan_matches_fresh_plan():
+    planner = _plan([(500, 10), (400, 0), (480, 5)])
+    planner.commands[0].hold_minutes = 30
+    planner.invalidate_from(0)
+    planner.rebuild(CFG)
+
+    fresh = _plan([(500, 30), (400, 0), (480, 5)])
+    assert [c.scheduled_start for c in planner.commands] == [c.scheduled_start for c in fresh.commands]
+    assert [c.hold_end for c in planner.commands] == [c.hold_end for c in fresh.commands]
+    np.testing.assert_array_equal(planner.segments["t"], fresh.segments["t"])
+    np.testing.assert_array_equal(planner.segments["mw"], fresh.segments["mw"])
+    np.testing.assert_array_equal(planner.breakpoints["x"], fresh.breakpoints["x"])
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from modules.plotting import DECIMATE_MIN_RATIO, decimate_xy, lttb_indices
+
+
+def test_lttb_one_point_per_bucket_keeps_peaks():
+    x = np.arange(10_000, dtype=np.float64)
+    y = np.zeros_like(x)
+    y[[1234, 5678]] = [50.0, -50.0]
+    idx = lttb_indices(x, y, 200)
+
+    assert len(idx) == 200 and idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+    edges = np.linspace(1, len(x) - 1, 199).astype(np.int64)
+    assert np.array_equal(np.searchsorted(edges, idx[1:-1], side="right") - 1, np.arange(198))
+    assert {1234, 5678} <= set(idx.tolist())
+
+
+def test_decimate_keeps_event_times_and_skips_short_series():
+    t0 = datetime(2024, 1, 1, 8, 0)
+    t = np.datetime64(t0, "ns") + np.arange(20_000, dtype=np.int64) * np.int64(1_000_000_000)
+    y = np.interp(np.arange(20_000), [0, 5_000, 8_000, 20_000], [200.0, 429.0, 429.0, 560.0])
+    keep = [t0 + timedelta(seconds=5_000), t0 + timedelta(seconds=7_000, milliseconds=500)]
+
+    x, yy, marks = decimate_xy(t, y, 500, keep_times=keep)
+    assert len(x) <= 500 + len(keep)
+    assert list(x[marks[1:-1]]) == list(np.array(keep, dtype="datetime64[ns]"))
+    assert yy[marks[1]] == 429.0 and yy[marks[2]] == 429.0
+
+    n = 500 * DECIMATE_MIN_RATIO
+    x, yy, _ = decimate_xy(t[:n], y[:n], 500)
+    assert len(x) == n
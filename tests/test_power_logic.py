@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from modules.power_logic import CalcConfig, compute_power_change_and_pauses
+
+T0 = datetime(2024, 1, 1, 8, 0)
+
+
+def _reference_loop(start_power, target_power, start_time, cfg):
+    """Vòng lặp theo giây của bản gốc (trước khi đổi sang dạng đóng) – chuẩn để đối chiếu."""
+    current = float(start_power)
+    increasing = start_power < target_power
+    times, powers = [start_time], [float(start_power)]
+    ev = dict(t429=None, post=None, hold=None, hold_done=None)
+    paused = False
+    t = start_time
+    for _ in range(24 * 60 * 60):
+        rate = 0.11 if current < 330 else 0.22
+        if increasing:
+            if start_power < cfg.threshold_429 and current >= cfg.threshold_429 and ev["t429"] is None:
+                ev["t429"] = t
+                if not paused:
+                    t += timedelta(minutes=15 if cfg.pulverizer_mode == "3 Puls" else 0)
+                    ev["post"] = t
+                    paused = True
+            if current + rate > target_power:
+                rate = max(0.0, target_power - current)
+            current += rate
+        else:
+            if (target_power < cfg.hold_power and current <= cfg.hold_power
+                    and start_power > cfg.hold_power and ev["hold"] is None):
+                ev["hold"] = t
+                t += timedelta(minutes=15 if cfg.pulverizer_mode == "3 Puls" else cfg.pause_time_hold_min)
+                ev["hold_done"] = t
+            if start_power > cfg.threshold_429 and current <= cfg.threshold_429 and ev["t429"] is None:
+                ev["t429"] = t
+                if not paused:
+                    t += timedelta(minutes=25 if cfg.pulverizer_mode == "3 Puls" else cfg.pause_time_429_min)
+                    ev["post"] = t
+                    paused = True
+            if current - rate < target_power:
+                rate = max(0.0, current - target_power)
+            current -= rate
+        t += timedelta(seconds=1)
+        times.append(t)
+        powers.append(current)
+        if abs(current - target_power) < 1e-9:
+            break
+    return times, powers, t, ev
+
+
+CASES = [
+    # (start, target): tăng qua 330/429, tăng không qua 429, giảm qua 462/429/330, giảm từ giữa 462-429
+    (200, 560), (300, 330), (420, 440), (429, 500), (350, 420),
+    (560, 100), (500, 440), (462, 300), (440, 430), (600, 462), (331.5, 200.25),
+]
+
+
+@pytest.mark.parametrize("mode", ["3 Puls", "4 Puls"])
+@pytest.mark.parametrize("pauses", [(0, 0), (10, 30)], ids=["no-pause", "pause"])
+@pytest.mark.parametrize("start,target", CASES)
+def test_closed_form_matches_per_second_loop(start, target, mode, pauses):
+    cfg = CalcConfig(pause_time_429_min=pauses[0], pause_time_hold_min=pauses[1], pulverizer_mode=mode)
+    ref_t, ref_p, ref_end, ev = _reference_loop(start, target, T0, cfg)
+    res = compute_power_change_and_pauses(start, target, T0, cfg)
+
+    assert res.final_load_time == ref_end
+    assert (res.time_reaching_429, res.post_pause_time) == (ev["t429"], ev["post"])
+    assert (res.time_holding_462, res.hold_complete_time) == (ev["hold"], ev["hold_done"])
+
+    times, powers = res.sample()
+    np.testing.assert_array_equal(times, np.array(ref_t, dtype="datetime64[ns]"))
+    np.testing.assert_allclose(powers, ref_p, rtol=0, atol=1e-6)
+
+    # điểm gãy nằm đúng trên chuỗi theo giây
+    bp_t, bp_p = res.breakpoints()
+    pos = np.searchsorted(times, np.array(bp_t, dtype="datetime64[ns]"))
+    np.testing.assert_array_equal(times[pos], np.array(bp_t, dtype="datetime64[ns]"))
+    np.testing.assert_allclose(np.asarray(ref_p)[pos], bp_p, rtol=0, atol=1e-6)
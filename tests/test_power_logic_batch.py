@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from modules.power_logic import (
+    BatchCalcResult, CalcConfig, RampCache, compute_power_change_and_pauses, compute_power_change_batch,
+)
+
+T0 = datetime(2024, 1, 1, 8, 0)
+FIELDS = ("final_load_time", "time_reaching_429", "post_pause_time", "time_holding_462", "hold_complete_time")
+
+
+def _as_dt64(v):
+    return np.datetime64("NaT", "ns") if v is None else np.datetime64(v, "ns")
+
+
+def test_batch_matches_scalar():
+    rng = np.random.default_rng(7)
+    n = 400
+    starts = np.round(rng.uniform(100, 600, n), 2)
+    targets = np.round(rng.uniform(100, 600, n), 2)
+    targets[:10] = starts[:10]                     # start == target: không đổi tải
+    times = [T0 + timedelta(seconds=int(s)) for s in rng.integers(0, 86_400, n)]
+    cfgs = [CalcConfig(pause_time_429_min=int(p429), pause_time_hold_min=int(ph), pulverizer_mode=mode)
+            for p429, ph, mode in zip(rng.integers(0, 30, n), rng.integers(0, 45, n),
+                                      rng.choice(["3 Puls", "4 Puls"], n))]
+
+    batch = compute_power_change_batch(starts, targets, times, cfgs)
+    assert isinstance(batch, BatchCalcResult) and len(batch) == n
+    for i in range(n):
+        ref = compute_power_change_and_pauses(starts[i], targets[i], times[i], cfgs[i])
+        for f in FIELDS:
+            assert getattr(batch, f)[i] == _as_dt64(getattr(ref, f)) or (
+                np.isnat(getattr(batch, f)[i]) and getattr(ref, f) is None), (i, f)
+
+
+def test_batch_broadcasts_single_config_and_start_time():
+    cfg = CalcConfig(pulverizer_mode="3 Puls")
+    batch = compute_power_change_batch([200.0, 560.0], [560.0, 100.0], T0, cfg)
+    for i, (s, t) in enumerate([(200.0, 560.0), (560.0, 100.0)]):
+        ref = compute_power_change_and_pauses(s, t, T0, cfg)
+        assert batch.final_load_time[i] == _as_dt64(ref.final_load_time)
+
+
+def test_ramp_cache_hits_misses_and_eviction():
+    cache = RampCache(maxsize=2)
+    cfg = CalcConfig()
+
+    a = cache.get(200, 500, T0, cfg)
+    b = cache.get(200, 500, T0 + timedelta(hours=1), cfg)          # cùng hình dạng -> hit, chỉ dời giờ
+    assert cache.cache_info() == (1, 1, 2, 1)
+    assert b.final_load_time - a.final_load_time == timedelta(hours=1)
+    np.testing.assert_array_equal(b.powers_array, a.powers_array)
+
+    cache.get(500, 200, T0, cfg)                                     # miss
+    cache.get(200, 500, T0, cfg)                                     # hit -> (200, 500) mới dùng nhất
+    cache.get(300, 400, T0, cfg)                                     # miss, đẩy (500, 200) ra
+    assert cache.cache_info() == (2, 3, 2, 2)
+    cache.get(200, 500, T0, cfg)
+    cache.get(500, 200, T0, cfg)                                     # đã bị loại -> miss
+    assert cache.cache_info().misses == 4
+
+    cache.get(200, 500, T0, CalcConfig(pulverizer_mode="3 Puls"))   # cấu hình khác -> miss
+    assert cache.cache_info().misses == 5
+
+    cache.cache_clear()
+    assert cache.cache_info() == (0, 0, 2, 0)
+
+
+def test_cached_result_equals_uncached():
+    cache = RampCache()
+    cfg = CalcConfig(pause_time_429_min=5, pulverizer_mode="4 Puls")
+    ref = compute_power_change_and_pauses(560, 150, "08:00", cfg)      # chuỗi giờ -> ngày 1900-01-01
+    got = cache.get(560, 150, "08:00", cfg)
+    for f in FIELDS:
+        assert getattr(got, f) == getattr(ref, f)
+    np.testing.assert_array_equal(got.times_array, ref.times_array)
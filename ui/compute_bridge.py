@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from PySide6.QtCore import QObject, Signal
+
+from modules.compute_worker import ComputeWorker
+
+
+class ComputeSignals(QObject):
+    """Kết quả tính nền -> thread GUI (queued connection)."""
+    finished = Signal(int, object)  # ticket, kết quả (vd PlotFrame)
+    failed = Signal(int, str)       # ticket, lỗi
+
+
+def make_qt_compute_worker(parent=None):
+    """ComputeWorker có callback nối thẳng vào Signal; trả về (worker, signals)."""
+    signals = ComputeSignals(parent)
+    worker = ComputeWorker(on_result=signals.finished.emit, on_error=signals.failed.emit)
+    return worker, signals
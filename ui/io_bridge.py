@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from PySide6.QtCore import QObject, Signal
+
+from modules.io_worker import FileWriter
+
+
+class FileWriterSignals(QObject):
+    """Kết quả ghi file từ thread ghi -> thread GUI (Qt tự chuyển qua queued connection)."""
+    written = Signal(str)           # path
+    failed = Signal(str, str)       # path, lỗi
+
+
+def make_qt_file_writer(parent=None, *, maxsize: int = 64):
+    """FileWriter có callback nối thẳng vào Signal; trả về (writer, signals)."""
+    signals = FileWriterSignals(parent)
+    writer = FileWriter(maxsize=maxsize, on_done=signals.written.emit, on_error=signals.failed.emit)
+    return writer, signals
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from typing import Callable, Optional
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
+
+from modules.perf import PerfRecorder
+from modules.power_logic import ramp_cache_info
+
+# thứ tự hiển thị theo đường Enter → vẽ lại; tên khác (nếu có) xếp cuối
+HOT_PATHS = (
+    "compute_power_change_and_pauses",
+    "update_plot (GUI)",
+    "compute_plot_frame",
+    "build_plot_df",
+    "densify_uniform",
+    "energy_summary_from_breakpoints",
+    "energy_summary_mwh",
+    "plot_df.echo",
+    "render_plot (GUI)",
+    "PlotRenderer.update",
+    "draw_main_and_joined",
+    "canvas.blit",
+    "canvas.draw",
+)
+SLOW_MS = 50.0      # p95 trên ngưỡng này tô màu cảnh báo
+
+
+class PerfPanel(QFrame):
+    """Bảng thời gian p50/p95 các đường nóng, đặt cạnh ResultPanel; chỉ làm mới khi đang hiện."""
+    def __init__(self, recorder: PerfRecorder, parent=None, *,
+                 on_export: Optional[Callable[[], None]] = None, refresh_ms: int = 500):
+        super().__init__(parent)
+        self.setObjectName("PerfPanel")
+        self.recorder = recorder
+        self.on_export = on_export
+        self._timer = QTimer(self)
+        self._timer.setInterval(refresh_ms)
+        self._timer.timeout.connect(self.refresh)
+        self._build_ui()
+        self._apply_style()
+
+    def _build_ui(self):
+        self.layout = QVBoxLayout(self)
+        self.layout.setSpacing(6)
+
+        self.title_label = QLabel("Performance (ms, last 200)")
+        self.title_label.setProperty("role", "perf-title")
+        self.table_label = QLabel()
+        self.table_label.setProperty("role", "perf")
+        self.table_label.setTextFormat(Qt.RichText)
+        self.cache_label = QLabel("")
+        self.cache_label.setProperty("role", "perf")
+        self.status_label = QLabel("")
+        self.status_label.setProperty("role", "perf")
+
+        btn_row = QHBoxLayout()
+        self.export_btn = QPushButton("Export trace")
+        self.clear_btn = QPushButton("Clear")
+        self.export_btn.clicked.connect(self._on_export_clicked)
+        self.clear_btn.clicked.connect(self._on_clear_clicked)
+        btn_row.addWidget(self.export_btn, 0, Qt.AlignLeft)
+        btn_row.addWidget(self.clear_btn, 0, Qt.AlignLeft)
+        btn_row.addStretch(1)
+
+        self.layout.addWidget(self.title_label, 0, Qt.AlignLeft)
+        self.layout.addWidget(self.table_label, 0, Qt.AlignLeft)
+        self.layout.addWidget(self.cache_label, 0, Qt.AlignLeft)
+        self.layout.addLayout(btn_row)
+        self.layout.addWidget(self.status_label, 0, Qt.AlignLeft)
+        self.layout.addStretch(1)
+
+    def _apply_style(self):
+        self.setStyleSheet("""
+            QFrame#PerfPanel {
+                background: #0d1117;
+                border-left: 4px solid #29b6f6;
+                border-top: 1px solid #20262e;
+                border-bottom: 1px solid #20262e;
+                border-right: 1px solid #20262e;
+                border-radius: 8px;
+                padding: 8px;
+            }
+            QLabel[role="perf-title"] {
+                font-size: 14px;
+                font-weight: 700;
+                color: #29b6f6;
+            }
+            QLabel[role="perf"] {
+                font-family: monospace;
+                font-size: 12px;
+            }
+        """)
+
+    # ---------- làm mới chỉ khi đang hiện ----------
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    # ---------- Public API ----------
+    def refresh(self):
+        info = ramp_cache_info()
+        self.cache_label.setText(
+            f"ramp cache: hits={info.hits} misses={info.misses} size={info.currsize}/{info.maxsize}")
+        stats = self.recorder.stats()
+        names = [n for n in HOT_PATHS if n in stats] + sorted(n for n in stats if n not in HOT_PATHS)
+        if not names:
+            self.table_label.setText('<span style="color:#b0bec5;">Chưa có số đo.</span>')
+            return
+        cell = 'style="padding:0 6px;text-align:right;"'
+        rows = [f'<tr style="color:#b0bec5;"><th align="left">name</th><th {cell}>n</th>'
+                f'<th {cell}>last</th><th {cell}>p50</th><th {cell}>p95</th><th {cell}>max</th></tr>']
+        for n in names:
+            s = stats[n]
+            color = "#ffab91" if s["p95_ms"] >= SLOW_MS else "#00e676"
+            rows.append(
+                f'<tr><td>{n}</td><td {cell}>{s["count"]}</td><td {cell}>{s["last_ms"]:.1f}</td>'
+                f'<td {cell}>{s["p50_ms"]:.1f}</td>'
+                f'<td {cell}><span style="color:{color};font-weight:700;">{s["p95_ms"]:.1f}</span></td>'
+                f'<td {cell}>{s["max_ms"]:.1f}</td></tr>'
+            )
+        self.table_label.setText("<table>" + "".join(rows) + "</table>")
+
+    def set_status(self, text: Optional[str]):
+        self.status_label.setText(text or "")
+
+    def _on_export_clicked(self):
+        if self.on_export:
+            self.on_export()
+
+    def _on_clear_clicked(self):
+        self.recorder.reset()
+        self.set_status("")
+        self.refresh()
@@ -1,51 +1,69 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
-from typing import List, Optional
+from typing import Optional
 
-from PySide6.QtCore import Qt, QTimer, QTime
+from PySide6.QtCore import Qt, QEvent, QTimer, QTime
+from PySide6.QtGui import QKeySequence, QShortcut
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QTimeEdit,
     QPushButton, QComboBox, QMessageBox, QFrame
 )
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 
 # modules (anh đã tách sẵn)
-from modules.power_logic import CalcConfig, compute_power_change_and_pauses
+from modules.power_logic import CalcConfig, compute_power_change_cached
+from modules.planner import Command, OverridePlanner
+from modules.perf import PERF, timed
 from modules.excel_io import ExcelUpdater
-from modules.audio_tts import tts_and_play
-from modules.alarms import check_and_fire
+from modules.audio_tts import tts_and_play, presynthesize
+from modules.alarms import AlarmScheduler
 from ui.result_panel import ResultPanel
+from ui.io_bridge import make_qt_file_writer
+from ui.compute_bridge import make_qt_compute_worker
 
-from dataclasses import dataclass
 from datetime import datetime, timedelta
-from modules.plotting import draw_main_and_joined 
-from modules.df_plot import build_plot_df, densify_uniform
-from modules.df_plot import build_plot_df, densify_uniform
-from modules.energy import energy_summary_mwh
-from modules.export_utils import export_df_with_minutes
+# matplotlib (canvas + PlotRenderer), pandas (df_plot/energy/export) import lười:
+# cửa sổ hiện trước, canvas dựng ngay sau lần vẽ đầu (xem _ensure_plot_canvas)
+from modules.compute_worker import PlotRequest, compute_plot_frame
 import os  # nếu anh dùng đường dẫn ghi file
+import numpy as np
 
 
-
-@dataclass
-class Command:
-    start_mw: float
-    target_mw: float
-    start_time: datetime        # thời điểm người dùng nhập (ý định ban đầu)
-    hold_minutes: int           # thời gian hold sau khi đạt target (vd: 10’)
-    # các trường tính sau (điền khi lên timeline)
-    scheduled_start: datetime | None = None
-    hold_start: datetime | None = None
-    hold_end: datetime | None = None
+def _to_datetime(t) -> datetime:
+    """np.datetime64 -> datetime (giữ nguyên nếu đã là datetime)."""
+    if isinstance(t, np.datetime64):
+        return t.astype("datetime64[us]").item()
+    return t
 
 
 class PowerChangeWidget(QWidget):
+    # in 40 dòng đầu plot DF mỗi lần vẽ (gỡ lỗi): LOADCHANGE_ECHO_DF=1; mặc định tắt, đường vẽ không in stdout
+    echo_plot_df = os.environ.get("LOADCHANGE_ECHO_DF", "") not in ("", "0")
+
     def __init__(self, parent=None, *, excel_file: str = "abc.xlsx"):
         super().__init__(parent)
 
         # --- services/state ---
         # self.excel_updater = ExcelUpdater(excel_file)
+        self.excel_file = excel_file
+        # mọi ghi file (Excel log, export plot DF) đi qua 1 thread ghi, không chặn UI
+        self.file_writer, self.file_writer_signals = make_qt_file_writer(self)
+        self.file_writer_signals.written.connect(self._on_file_written)
+        self.file_writer_signals.failed.connect(self._on_file_write_failed)
+        # DF/densify/MWh của update_plot tính trên thread nền, chỉ nhận kết quả mới nhất
+        self.compute_worker, self.compute_signals = make_qt_compute_worker(self)
+        self.compute_signals.finished.connect(self._on_plot_frame_ready)
+        self.compute_signals.failed.connect(self._on_plot_frame_failed)
+        self._plot_ticket = 0
+        self._plot_render_args: dict = {}
+        # update_plot chỉ đánh dấu "dirty"; nhiều yêu cầu trong 1 lượt event loop
+        # (hoặc trong _PLOT_DEBOUNCE_MS) gộp thành 1 lần tính + vẽ
+        self._plot_dirty = False
+        self.plot_requests = 0              # số lần gọi update_plot
+        self.plot_redraws_avoided = 0       # số lần được gộp, không tính/vẽ lại
+        self._plot_timer = QTimer(self)
+        self._plot_timer.setSingleShot(True)
+        self._plot_timer.setInterval(self._PLOT_DEBOUNCE_MS)
+        self._plot_timer.timeout.connect(self._flush_plot)
         self.alarm_played_for_429 = False
         self.alarm_played_for_post_pause = False
         self.alarm_played_for_final_load = False
@@ -73,9 +91,11 @@ class PowerChangeWidget(QWidget):
         self.pause_time_hold_min = 30
         self.pulverizer_mode_default = "3 Puls"  # default
 
-        # data series for plotting
-        self.times1: List[datetime] = []
-        self.powers1: List[float] = []
+        # data series for plotting (mảng datetime64[ns]/float64 từ CalcResult)
+        self.times1: np.ndarray = np.empty(0, dtype="datetime64[ns]")
+        self.powers1: np.ndarray = np.empty(0, dtype=np.float64)
+        # điểm gãy của ramp chính (để tính MWh dạng đóng, không cần densify)
+        self.main_breakpoints: dict = {"x": [], "y": []}
         # self.times2: List[datetime] = []   # reserved (hidden layout 2)
         # self.powers2: List[float] = []
 
@@ -89,6 +109,8 @@ class PowerChangeWidget(QWidget):
 
         # --- UI ---
         self._build_ui()
+        # tổng hợp sẵn audio cho các câu báo động (thread nền) -> lúc báo chỉ đọc cache
+        self.sync_alarm_texts()
         # --- live time for QTimeEdit ---
         self._live_start_time = True    # Start Time auto-run ban đầu
         self._live_hold_time  = True    # True để chạy lifetime
@@ -98,13 +120,18 @@ class PowerChangeWidget(QWidget):
         self._time_timer.start(1000)    # tick mỗi giây
 
 
-        # Timer kiểm tra mốc báo động (không hiển thị đồng hồ)
+        # Báo động theo sự kiện: heap các mốc + 1 QTimer single-shot cho mốc gần nhất
+        # (hẹn lại khi timeline đổi: Enter / nối lệnh / reset)
+        self.alarm_scheduler = AlarmScheduler(tts_and_play)
         self.check_timer = QTimer(self)
+        self.check_timer.setSingleShot(True)
+        self.check_timer.setTimerType(Qt.PreciseTimer)
         self.check_timer.timeout.connect(self.check_and_alarm)
-        self.check_timer.start(1000)
         # --- Command queue và kế hoạch ---
-        self.command_queue: list[Command] = []
-        self.current_plan_segments: list[dict] = []
+        # lập lịch + plan tăng dần nằm ở modules/planner.py (không phụ thuộc widget);
+        # command_queue là chính list lệnh của planner
+        self.planner = OverridePlanner(threshold_429=self.threshold_429)
+        self.command_queue: list[Command] = self.planner.commands
         self.default_hold_minutes = 10  # hoặc lấy từ cấu hình của anh
         self._cut_after_join = False
 
@@ -128,6 +155,13 @@ class PowerChangeWidget(QWidget):
         # --- BÊN PHẢI: result_column (kết quả) ---
         self.result_panel = ResultPanel()
         master_layout.addWidget(self.result_panel, 1)
+        # bảng thời gian đường nóng (tuỳ chọn): Ctrl+Shift+P bật/tắt đo + hiện bảng
+        self._master_layout = master_layout
+        self.perf_panel = None
+        self._perf_trace_path = None
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, activated=self.toggle_perf_panel)
+        if PERF.enabled:
+            self.toggle_perf_panel(True)
 
         # Các nhãn kết quả
         
@@ -164,14 +198,13 @@ class PowerChangeWidget(QWidget):
         hold_row.addStretch(1)
         root.addLayout(hold_row)
 
-        # Matplotlib Figure (giữ 1 canvas suốt vòng đời widget)
-        self.figure = Figure(figsize=(6, 4), dpi=120)
-        self.ax = self.figure.add_subplot(111)
-        self.ax.set_title('TREND: POWER DEPEND ON TIMES')
-        self.ax.set_xlabel('TIMES')
-        self.ax.set_ylabel('POWER (MW)')
-        self.canvas = FigureCanvas(self.figure)
-        root.addWidget(self.canvas, 1)
+        # Matplotlib Figure (giữ 1 canvas suốt vòng đời widget) – dựng lười, tạm thời là placeholder
+        self.figure = self.ax = self.canvas = self.plot_renderer = None
+        self._plot_layout = root
+        self._plot_placeholder = QLabel("Loading chart…")
+        self._plot_placeholder.setAlignment(Qt.AlignCenter)
+        self._plot_placeholder.installEventFilter(self)
+        root.addWidget(self._plot_placeholder, 1)
 
         # Layout ẩn (tuỳ biến cảnh báo + pause + pulverizer)
         self.hidden_frame = QFrame()
@@ -187,6 +220,9 @@ class PowerChangeWidget(QWidget):
         self.edit_alarm_final = self._labeled_edit(hidden_layout, "Final Load Alert:", default=self.alarm_texts["final_load"], width=500)
         self.edit_alarm_hold10 = self._labeled_edit(hidden_layout, "Hold 10 Min Alert:", default=self.alarm_texts["hold_10_min"], width=500)
         self.edit_alarm_override = self._labeled_edit(hidden_layout, "Override Alert:", default=self.alarm_texts["override"], width=500)
+        for edit in (self.edit_alarm_429, self.edit_alarm_hold_comp, self.edit_alarm_final,
+                     self.edit_alarm_hold10, self.edit_alarm_override):
+            edit.editingFinished.connect(self.sync_alarm_texts)
 
 
         # pause + pulverizer
@@ -255,6 +291,44 @@ class PowerChangeWidget(QWidget):
     # ----------------------
     # Event handlers
     # ----------------------
+    def eventFilter(self, obj, event):
+        # placeholder đã được vẽ (cửa sổ đã hiện) -> mới dựng canvas (import matplotlib ~0.5 s)
+        if obj is self._plot_placeholder and event.type() == QEvent.Paint and self.canvas is None:
+            QTimer.singleShot(0, self._ensure_plot_canvas)
+        return super().eventFilter(obj, event)
+
+    def _ensure_plot_canvas(self):
+        """Tạo Figure/Canvas/PlotRenderer ở lần cần đầu tiên (thay placeholder)."""
+        if self.canvas is not None:
+            return
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+        from modules.plotting import PlotRenderer
+
+        self.figure = Figure(figsize=(6, 4), dpi=120)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_title('TREND: POWER DEPEND ON TIMES')
+        self.ax.set_xlabel('TIMES')
+        self.ax.set_ylabel('POWER (MW)')
+        self.canvas = FigureCanvas(self.figure)
+        self._plot_layout.replaceWidget(self._plot_placeholder, self.canvas)
+        self._plot_placeholder.removeEventFilter(self)
+        self._plot_placeholder.deleteLater()
+        self._plot_placeholder = None
+        # artist tạo 1 lần, update_plot chỉ set_data + blit/draw_idle
+        self.plot_renderer = PlotRenderer(self.ax)
+        # đo canvas.draw (vẽ đầy đủ từ draw_idle/paintEvent); tắt đo thì chỉ thêm 1 lần kiểm tra cờ
+        self.canvas.draw = timed("canvas.draw")(self.canvas.draw)
+
+    def sync_alarm_texts(self):
+        """Đọc câu báo động từ UI ẩn; câu nào mới/đổi thì tổng hợp trước vào cache audio."""
+        self.alarm_texts["429"] = self.edit_alarm_429.text()
+        self.alarm_texts["holding_complete"] = self.edit_alarm_hold_comp.text()
+        self.alarm_texts["final_load"] = self.edit_alarm_final.text()
+        self.alarm_texts["hold_10_min"] = self.edit_alarm_hold10.text()
+        self.alarm_texts["override"] = self.edit_alarm_override.text()
+        presynthesize(self.alarm_texts.values())
+
     def toggle_hidden_layout(self):
         self.hidden_frame.setVisible(not self.hidden_frame.isVisible())
 
@@ -269,11 +343,7 @@ class PowerChangeWidget(QWidget):
             return
 
         # cập nhật cấu hình từ UI ẩn (nếu người dùng đã mở và chỉnh)
-        self.alarm_texts["429"] = self.edit_alarm_429.text()
-        self.alarm_texts["holding_complete"] = self.edit_alarm_hold_comp.text()
-        self.alarm_texts["final_load"] = self.edit_alarm_final.text()
-        self.alarm_texts["hold_10_min"] = self.edit_alarm_hold10.text()
-        self.alarm_texts["override"] = self.edit_alarm_override.text() 
+        self.sync_alarm_texts()
 
         try:
             self.pause_time_429_min = int(self.pause_429_edit.text() or "0")
@@ -298,7 +368,7 @@ class PowerChangeWidget(QWidget):
             return
 
         # --- TÍNH TOÁN ---
-        result = compute_power_change_and_pauses(
+        result = compute_power_change_cached(
             start_power=start_power,
             target_power=target_power,
             start_time=start_dt,  # dùng datetime cùng ngày
@@ -306,8 +376,10 @@ class PowerChangeWidget(QWidget):
         )
 
         # Gán cho vẽ/logic
-        self.times1 = result.times
-        self.powers1 = result.powers
+        self.times1 = result.times_array
+        self.powers1 = result.powers_array
+        bx, by = result.breakpoints()
+        self.main_breakpoints = {"x": bx, "y": by}
         self.final_load_time    = result.final_load_time
         self.time_reaching_429  = result.time_reaching_429
         self.post_pause_time    = result.post_pause_time
@@ -334,6 +406,7 @@ class PowerChangeWidget(QWidget):
 
         # Vẽ đồ thị
         self.update_plot()
+        self.rearm_alarms()
 
         # # --- GHI EXCEL ---
         # copy_text = (
@@ -348,7 +421,7 @@ class PowerChangeWidget(QWidget):
         #     "start_time_str": start_dt.strftime("%H:%M"),  # thay vì biến cũ
         #     "copy_text": copy_text,
         # }
-        # self.excel_updater.append_data(data)
+        # self.file_writer.submit(self.excel_file, self.excel_updater.append_data, data)
 
 
     def on_hold_clicked(self):
@@ -369,7 +442,7 @@ class PowerChangeWidget(QWidget):
         }
         # (SỬA) dùng hàm đúng tên trong ExcelUpdater đã tách
         # if hasattr(self.excel_updater, "append_data_hold"):
-        #     self.excel_updater.append_data_hold(data1)
+        #     self.file_writer.submit(self.excel_file, self.excel_updater.append_data_hold, data1)
         # else:
         #     # fallback nếu class cũ
         #     self.excel_updater.append_data1(data1)
@@ -408,37 +481,63 @@ class PowerChangeWidget(QWidget):
         self.result_panel.reset()
 
         # 4) Xoá series + kết quả thời gian
-        self.times1.clear(); self.powers1.clear()
+        self.times1 = np.empty(0, dtype="datetime64[ns]")
+        self.powers1 = np.empty(0, dtype=np.float64)
+        self.main_breakpoints = {"x": [], "y": []}
         # self.times2.clear(); self.powers2.clear()
         self.final_load_time = None
         self.time_reaching_429 = None
         self.post_pause_time = None
         self.time_holding_462 = None
         self.hold_complete_time = None
+        self.rearm_alarms()   # timeline rỗng -> dừng timer báo động
         # 4b) Reset NỐI LỆNH (ô nhập + hàng đợi + timeline)
         if hasattr(self, "target_mw_edit"):
             self.target_mw_edit.clear()
         if hasattr(self, "join_time_edit"):
             self.join_time_edit.setTime(QTime.currentTime())
-        self.command_queue.clear()
-        self.current_plan_segments.clear()
-        # 5) Làm mới đồ thị (KHÔNG tạo Figure/Canvas mới)
-        self.ax.clear()
-        self.ax.set_title('TREND: POWER DEPEND ON TIMES')
-        self.ax.set_xlabel('TIMES')
-        self.ax.set_ylabel('POWER (MW)')
-        self.canvas.draw()
+        self.planner.clear()
+        # 5) Làm mới đồ thị (KHÔNG tạo Figure/Canvas mới, giữ artist – chỉ ẩn dữ liệu)
+        #    bỏ yêu cầu vẽ + kết quả tính nền còn dở để không vẽ đè lên trạng thái đã reset
+        self._plot_timer.stop()
+        self._plot_dirty = False
+        self.compute_worker.cancel()
+        self._plot_ticket = self.compute_worker.latest
+        if self.plot_renderer is not None:
+            self.plot_renderer.clear()
 
 
     # ----------------------
     # Plotting
     # ----------------------
 
+    # cửa sổ gộp các yêu cầu vẽ (ms)
+    _PLOT_DEBOUNCE_MS = 15
+
     def update_plot(self):
+        """Yêu cầu vẽ lại (không chặn): gộp các lần gọi dồn dập thành 1 lần _flush_plot."""
+        self.plot_requests += 1
+        if self._plot_dirty:
+            self.plot_redraws_avoided += 1
+            return
+        self._plot_dirty = True
+        self._plot_timer.start()
+
+    def _flush_plot(self):
+        """Tính + vẽ ngay nếu đang có yêu cầu chờ (timer gọi; gọi tay được khi cần kết quả liền)."""
+        self._plot_timer.stop()
+        if not self._plot_dirty:
+            return
+        self._plot_dirty = False
+        self._update_plot_now()
+
+    @timed("update_plot (GUI)")
+    def _update_plot_now(self):
         main_xy = {"x": self.times1, "y": self.powers1, "label": "Main Load Change"} \
-                if (self.times1 and self.powers1) else None
+                if (len(self.times1) and len(self.powers1)) else None
 
-        joined_segments = self.current_plan_segments or None
+        has_plan = len(self.current_plan_segments["t"]) > 0
+        joined_segments = self.current_plan_segments if has_plan else None
 
         hold_windows = []
         if self.time_reaching_429 and self.post_pause_time:
@@ -464,33 +563,24 @@ class PowerChangeWidget(QWidget):
     # CẮT MAIN ở đúng HOLD_END (post_pause_time).
     # Nếu vì lý do nào đó chưa có post_pause_time, fallback sang mốc đầu của plan nối.
             trim_time = self.post_pause_time
-            if trim_time is None and self.current_plan_segments:
-                trim_time = self.current_plan_segments[0]["t"]
+            if trim_time is None and has_plan:
+                trim_time = _to_datetime(self.current_plan_segments["t"][0])
             if trim_time is not None:
                 trim_mw = self.threshold_429
 
         # Phần nối vẫn bắt đầu từ mốc đầu tiên của plan nối (HOLD_END hoặc +45' tùy tăng/giảm)
-        if self._cut_after_join and self.current_plan_segments:
-            start_time = self.current_plan_segments[0]["t"]
+        if self._cut_after_join and has_plan:
+            start_time = _to_datetime(self.current_plan_segments["t"][0])
             start_mw   = self.threshold_429
 
-        # --- Build DataFrame “hậu cắt-ghép” song song với quá trình vẽ ---
+        # --- Build DataFrame “hậu cắt-ghép” + MWh trên thread nền ---
 
         # 1) joined_segments -> joined_xy (nếu có)
         joined_xy = None
         if joined_segments:
-            jx = [seg["t"] for seg in joined_segments]
-            jy = [seg["mw"] for seg in joined_segments]
-            joined_xy = {"x": jx, "y": jy}
-
-        # 2) hold_windows trong update_plot đang là (start, end, label)
-        #    chuyển về dạng (start, end) cho build_plot_df
-        _hold_windows_df = []
-        for hw in (hold_windows or []):
-            if len(hw) >= 2:
-                _hold_windows_df.append((hw[0], hw[1]))
-
-        # 3) Sự kiện để gắn nhãn vào DF (dùng thuộc tính của self trong widget này)
+            joined_xy = {"x": joined_segments["t"], "y": joined_segments["mw"]}
+
+        # 2) Sự kiện để gắn nhãn vào DF (dùng thuộc tính của self trong widget này)
         events = {
             "t_429":           getattr(self, "time_reaching_429", None),
             "post_pause":      getattr(self, "post_pause_time", None),
@@ -500,113 +590,72 @@ class PowerChangeWidget(QWidget):
         }
         # (nếu anh có “finish_time” dưới tên khác, bổ sung vào đây)
 
-        # 4) main_xy đã có ở đầu hàm (self.times1/self.powers1)
-        #    trim_time/trim_mw/start_time/start_mw đã được tính phía trên
-        try:
-            df = build_plot_df(
-                main_xy=main_xy or {"x": [], "y": []},
-                joined_xy=joined_xy,
-                trim_time=trim_time,
-                trim_mw=trim_mw,
-                hold_windows=_hold_windows_df,   # (start,end) để is_hold
-                events=events,
-            )
-            # Nội suy đều cả main + joined; ép phẳng vùng hold
-            df = densify_uniform(
-                df,
-                step_minutes=1,                       # đổi 1/5/10 nếu muốn
-                hold_windows_labeled=hold_windows,    # [(start, end, "Hold @429"), ...]
-                plateau_429=self.threshold_429,
-                plateau_462=self.holding_complete_mw,
-            )
+        # 3) ảnh chụp bất biến của state -> worker; lệnh cũ chưa xong sẽ bị bỏ
+        request = PlotRequest.snapshot(
+            main_xy=main_xy,
+            joined_xy=joined_xy,
+            main_breakpoints=self.main_breakpoints,
+            joined_breakpoints=self.current_plan_breakpoints if has_plan else None,
+            trim_time=trim_time,
+            trim_mw=trim_mw,
+            hold_windows=hold_windows,          # [(start, end, "Hold @429"), ...]
+            events=events,
+            plateau_429=self.threshold_429,
+            plateau_462=self.holding_complete_mw,
+        )
+        self._plot_ticket = self.compute_worker.submit(compute_plot_frame, request, echo=self.echo_plot_df)
+        # tham số vẽ đi kèm ticket; chỉ dùng khi kết quả của đúng ticket này về
+        self._plot_render_args = dict(
+            main_xy=main_xy,
+            joined_segments=joined_segments,
+            hold_windows=hold_windows,
+            override_point=override_point,
+            trim_time=trim_time, trim_mw=trim_mw,
+            start_time=start_time, start_mw=start_mw,
+            # giảm điểm khi vẽ nhưng giữ đúng điểm gãy + mốc sự kiện (marker chỉ tại các mốc này)
+            main_keep=list(self.main_breakpoints["x"]) + [
+                events["t_429"], events["post_pause"], events["hold_start_462"], events["hold_end_462"],
+            ],
+            joined_keep=list(self.current_plan_breakpoints["x"]) if has_plan else None,
+        )
 
-            self._last_plot_df = df
+    def _on_plot_frame_ready(self, ticket: int, frame):
+        if ticket != self._plot_ticket:
+            return      # kết quả của lần bấm cũ
+        self._last_plot_df = frame.df
         #     try:
-        #         # Ghi ngay cạnh file chạy, tên cố định:
-        #         export_df_with_minutes(df, "last_plot_df.xlsx")
+        #         # Ghi ngay cạnh file chạy, tên cố định (thread ghi, gộp các lần ghi dồn dập):
+        #         self.export_plot_df("last_plot_df.xlsx")
         #         # hoặc, nếu muốn theo timestamp:
         #         # from datetime import datetime
         #         # fname = f"plot_{datetime.now():%Y%m%d_%H%M%S}.xlsx"
-        #         # export_df_with_minutes(df, os.path.join(os.getcwd(), fname))
+        #         # self.export_plot_df(os.path.join(os.getcwd(), fname))
         #     except Exception as ex:
         #         print("[WARN] export_df_with_minutes failed:", ex)
         #     # ⬆️⬆️ HẾT PHẦN THÊM ⬆️⬆️
 
-        #     print("\n=== PLOT_DF (first 40 rows) ===")
-        #     print(df.head(40).to_string(index=False))
-
-        # except Exception as e:
-        #     print("[WARN] build_plot_df/densify failed:", e)
-            # --- TÍNH MWh & HIỂN THỊ ---
-            summary = energy_summary_mwh(df)   # {'origin_mwh', 'override_mwh', 'total_mwh', 'hold_mwh', 'ramp_mwh'}
-            self.result_panel.set_origin_capacity(
-                f"{summary['origin_mwh']:.2f} MWh" if summary['origin_mwh'] > 0 else ""
-            )
-            self.result_panel.set_override_capacity(
-                f"{summary['override_mwh']:.2f} MWh" if summary['override_mwh'] > 0 else ""
-            )
-
-            print("\n=== PLOT_DF (first 40 rows) ===")
-            print(df.head(40).to_string(index=False))
-
-        except Exception as e:
-            print("[WARN] build_plot_df/densify/energy failed:", e)
-
+        # --- HIỂN THỊ MWh ---
+        summary = frame.summary     # {'origin_mwh', 'override_mwh', 'total_mwh', 'hold_mwh', 'ramp_mwh'}
+        self.result_panel.set_origin_capacity(
+            f"{summary['origin_mwh']:.2f} MWh" if summary['origin_mwh'] > 0 else ""
+        )
+        self.result_panel.set_override_capacity(
+            f"{summary['override_mwh']:.2f} MWh" if summary['override_mwh'] > 0 else ""
+        )
+        self._render_plot(dict(frame.overlay))
 
+    def _on_plot_frame_failed(self, ticket: int, error: str):
+        if ticket != self._plot_ticket:
+            return
+        print("[WARN] build_plot_df/densify/energy failed:", error)
+        self._render_plot({})
 
-        draw_main_and_joined(
-            self.ax,
-            main_xy=main_xy,
-            joined_segments=joined_segments,
-            hold_windows=hold_windows,
-            override_point=override_point,
-            trim_time=trim_time, trim_mw=trim_mw,
-            start_time=start_time, start_mw=start_mw,
-        )
+    @timed("render_plot (GUI)")
+    def _render_plot(self, overlay: dict):
         # --- OVERLAY: vẽ lại từ DataFrame để đối chiếu chính xác ---
-        try:
-            if hasattr(self, "_last_plot_df"):
-                df = self._last_plot_df
-                if (df is not None) and (not df.empty):
-                    dfo = df.sort_values(["seg_id", "t"], kind="stable")
-
-                    # main
-                    main_df = dfo[dfo["source"] == "main"]
-                    if not main_df.empty:
-                        self.ax.plot(
-                            main_df["t"], main_df["mw"],
-                            linestyle="--", linewidth=1.2, alpha=0.9,
-                            label="DF main (check)", zorder=5
-                        )
-
-                    # joined
-                    joined_df = dfo[dfo["source"] == "joined"]
-                    if not joined_df.empty:
-                        self.ax.plot(
-                            joined_df["t"], joined_df["mw"],
-                            color="blue",
-                            linestyle="--", linewidth=1.2, alpha=0.9,
-                            label="DF joined (check)", zorder=5
-                        )
-
-                    # marker các điểm có evt (tùy chọn)
-                    evt_df = dfo[dfo["evt"].notna()]
-                    if not evt_df.empty:
-                        self.ax.scatter(
-                            evt_df["t"], evt_df["mw"],
-                            s=18, alpha=0.9, label="DF events", zorder=6
-                        )
-
-                    # cập nhật legend sau khi thêm overlay
-                    self.ax.legend()
-        except Exception as e:
-            print("[WARN] DF overlay plot failed:", e)
-
-        # Định dạng & render
-        # self.figure.autofmt_xdate()
-        # self.canvas.draw()
-        self.figure.autofmt_xdate()
-        self.canvas.draw()
+        # Định dạng & render: artist có sẵn -> set_data; blit nếu trục không đổi, ngược lại draw_idle
+        self._ensure_plot_canvas()
+        self.plot_renderer.update(overlay=overlay, **self._plot_render_args)
 
 
     def _tick_time_edits(self):
@@ -621,32 +670,84 @@ class PowerChangeWidget(QWidget):
             self.join_time_edit.setTime(now)
 
     # ----------------------
-    # Alarm checking (no clock UI)
+    # File output (thread ghi riêng)
     # ----------------------
-    def check_and_alarm(self):
-        now = datetime.now()
+    def export_plot_df(self, path: str = "last_plot_df.xlsx") -> bool:
+        """Xếp lệnh export plot DF hiện tại; nhiều lần liên tiếp cùng path chỉ ghi bản mới nhất."""
+        df = getattr(self, "_last_plot_df", None)
+        if df is None or df.empty:
+            return False
+        from modules.export_utils import export_df_with_minutes
+        return self.file_writer.submit(path, export_df_with_minutes, df, path, coalesce=True)
+
+    def _on_file_written(self, path: str):
+        print(f"[IO] saved {path}")
+        if path == self._perf_trace_path and self.perf_panel is not None:
+            self.perf_panel.set_status(f"Trace: {os.path.basename(path)}")
+
+    # ----------------------
+    # Performance panel
+    # ----------------------
+    def toggle_perf_panel(self, show: Optional[bool] = None):
+        """Bật đo + hiện bảng p50/p95 cạnh ResultPanel; gọi lại để ẩn + tắt đo."""
+        if show is None:
+            show = self.perf_panel is None or not self.perf_panel.isVisible()
+        if show and self.perf_panel is None:
+            from ui.perf_panel import PerfPanel
+            self.perf_panel = PerfPanel(PERF, self, on_export=self.export_perf_trace)
+            self._master_layout.addWidget(self.perf_panel, 1)
+        PERF.enabled = show
+        if self.perf_panel is not None:
+            self.perf_panel.setVisible(show)
+
+    def export_perf_trace(self, path: Optional[str] = None) -> bool:
+        """Ghi trace (Chrome Trace Event JSON) của các lần đo gần nhất qua thread ghi."""
+        path = path or f"perf_trace_{datetime.now():%Y%m%d_%H%M%S}.json"
+        self._perf_trace_path = path
+        return self.file_writer.submit(path, PERF.export_trace, path, PERF.snapshot_trace())
+
+    def _on_file_write_failed(self, path: str, error: str):
+        print(f"[WARN] write {path} failed: {error}")
+
+    # ----------------------
+    # Alarm scheduling (no clock UI)
+    # ----------------------
+    # key báo động -> thuộc tính cờ "đã phát"
+    _ALARM_FLAG_ATTRS = {
+        "429": "alarm_played_for_429",
+        "holding_complete": "alarm_played_for_post_pause",
+        "final_load": "alarm_played_for_final_load",
+        "hold_10_min": "alarm_played_for_hold_complete",
+        "override": "alarm_played_for_override",
+    }
+    # QTimer giới hạn int32 ms -> hẹn tối đa 1h rồi tự hẹn lại
+    _ALARM_MAX_WAIT_MS = 3600 * 1000
+
+    def rearm_alarms(self):
+        """Nạp lại các mốc báo động vào scheduler rồi hẹn timer cho mốc gần nhất."""
         timeline = {
             "429": self.time_reaching_429,
             "holding_complete": self.post_pause_time,
             "final_load": self.final_load_time,
             "hold_10_min": self.hold_complete_time,
-            "override": self.override_complete_time,  # ⬅️ NEW
+            "override": self.override_complete_time,
         }
-        flags = {
-            "429": self.alarm_played_for_429,
-            "holding_complete": self.alarm_played_for_post_pause,
-            "final_load": self.alarm_played_for_final_load,
-            "hold_10_min": self.alarm_played_for_hold_complete,
-            "override": self.alarm_played_for_override,  # ⬅️ NEW
-        }
-        flags = check_and_fire(now, timeline, flags, tts_and_play, self.alarm_texts)
+        flags = {key: getattr(self, attr) for key, attr in self._ALARM_FLAG_ATTRS.items()}
+        self.alarm_scheduler.set_timeline(timeline, flags, self.alarm_texts)
+        self._arm_alarm_timer()
+
+    def _arm_alarm_timer(self):
+        self.check_timer.stop()
+        at = self.alarm_scheduler.next_due()
+        if at is None:
+            return
+        wait_ms = int((at - datetime.now()).total_seconds() * 1000)
+        self.check_timer.start(max(0, min(wait_ms, self._ALARM_MAX_WAIT_MS)))
 
-        # cập nhật cờ
-        self.alarm_played_for_429 = flags["429"]
-        self.alarm_played_for_post_pause = flags["holding_complete"]
-        self.alarm_played_for_final_load = flags["final_load"]
-        self.alarm_played_for_hold_complete = flags["hold_10_min"]
-        self.alarm_played_for_override = flags["override"]  # ⬅️ NEW
+    def check_and_alarm(self):
+        for key in self.alarm_scheduler.fire_due(datetime.now()):
+            setattr(self, self._ALARM_FLAG_ATTRS[key], True)
+        self._arm_alarm_timer()
 
 
     #Hàm “Enter để nối lệnh” có kiểm tra nằm trong HOLD lệnh trước
@@ -692,6 +793,7 @@ class PowerChangeWidget(QWidget):
         # mốc hoàn thành lệnh nối = ramp end của lệnh nối (đã set vào hold_start)
         self.override_complete_time = new_cmd.hold_start
         self.alarm_played_for_override = False  # cho phép chuông lần này
+        self.rearm_alarms()
 
     # --- DEBUG PRINT thời gian hoàn thành lệnh nối ---
         def _fmt(dt): return dt.strftime("%H:%M") if dt else "—"
@@ -713,147 +815,43 @@ class PowerChangeWidget(QWidget):
         target > 429 -> TĂNG  ⇒ bắt đầu sau HOLD_END(429)
         target < 429 -> GIẢM  ⇒ bắt đầu sau HOLD_END(429) + 45'
         """
-        prev_hold_start, prev_hold_end = self._compute_last_command_hold_window()
-        if prev_hold_start is None or prev_hold_end is None:
-            prev_hold_end = self._compute_last_command_end_time()
-
-        user_dt = new_cmd.start_time
-
-        pivot = self.threshold_429  # 429.0
-        is_increasing = new_cmd.target_mw > pivot
-
-        # ✅ Quy tắc đúng:
-        required_start = prev_hold_end if is_increasing else (prev_hold_end + timedelta(minutes=45))
+        return self.planner.schedule(
+            new_cmd,
+            time_reaching_429=self.time_reaching_429,
+            post_pause_time=self.post_pause_time,
+            pause_time_429_min=self.pause_time_429_min,
+        )
 
-        in_hold_window = (prev_hold_start is not None and prev_hold_start <= user_dt <= prev_hold_end)
-        if in_hold_window:
-            scheduled_start = required_start
-            return True, scheduled_start, ""
-        else:
-            scheduled_start = required_start
-            action = "Tăng (sau HOLD_END)" if is_increasing else "Giảm (sau HOLD_END + 45')"
-            msg = (
-                "Thời điểm anh nhập nằm trong giai đoạn HOLD của lệnh trước.\n"
-                "Để đảm bảo hold đủ thời gian, lệnh kế sẽ được tự động dời theo quy định:\n"
-                f"- {action} theo mốc 429 MW.\n"
-                f"Giờ người nhập: {user_dt.strftime('%H:%M')}\n"
-                f"Giờ yêu cầu:    {scheduled_start.strftime('%H:%M')}"
-            )
-            return False, scheduled_start, msg
+    @property
+    def current_plan_segments(self) -> dict:
+        return self.planner.segments
 
+    @property
+    def current_plan_breakpoints(self) -> dict:
+        return self.planner.breakpoints
 
+    def invalidate_plan_from(self, idx: int):
+        """Lệnh thứ idx thay đổi → bỏ block từ idx; rebuild tới lên lịch + tính lại các lệnh sau."""
+        self.planner.invalidate_from(idx)
 
-    def _build_segments_for_one_command(self, start_mw: float, target_mw: float,
-                                    start_dt: datetime, hold_minutes: int):
-        """
-        Kết quả: (segments, hold_start, hold_end)
-        segments: list[{"t": datetime, "mw": float, "tag": str}]
-        """
-        # Lấy cấu hình hiện tại từ UI/state
+    def _plan_config(self) -> CalcConfig:
+        """Các tham số UI ảnh hưởng tới ramp của lệnh nối (hold lấy theo từng lệnh)."""
         pulverizer_mode = self.pulverizer_combo.currentText() if hasattr(self, "pulverizer_combo") else "3 Puls"
-        cfg = CalcConfig(
+        return CalcConfig(
             threshold_429=self.threshold_429,
             hold_power=self.holding_complete_mw,
             pause_time_429_min=self.pause_time_429_min,
-            # dùng hold theo lệnh này để vẽ đoạn hold sau ramp
-            pause_time_hold_min=hold_minutes,
+            pause_time_hold_min=0,
             pulverizer_mode=pulverizer_mode,
         )
 
-        # GỌI HÀM TRẢ VỀ OBJECT, KHÔNG UNPACK
-        result = compute_power_change_and_pauses(
-            start_power=start_mw,
-            target_power=target_mw,
-            start_time=start_dt,   # datetime ok (hàm của anh đã hỗ trợ)
-            cfg=cfg,               # tham số tên 'cfg' đúng như on_enter_clicked
-        )
-
-        times = result.times
-        mw_values = result.powers
-
-        segs = []
-        if times and mw_values:
-            segs = [{"t": t, "mw": mw, "tag": "ramp"} for t, mw in zip(times, mw_values)]
-
-        ramp_end  = times[-1] if times else None
-        hold_start = ramp_end           # dùng như “thời điểm hoàn tất lệnh nối”
-        hold_end   = None               # không có HoldEnd khi hold_minutes == 0
-
-        if ramp_end is not None and hold_minutes > 0:
-            hold_end = ramp_end + timedelta(minutes=hold_minutes)
-            segs.append({"t": hold_start, "mw": target_mw, "tag": "hold_start"})
-            segs.append({"t": hold_end,  "mw": target_mw, "tag": "hold_end"})
-
-        return segs, hold_start, hold_end
-
-
-
-
     def rebuild_joined_plan(self):
-        if not self.command_queue:
-            self.current_plan_segments = []
-            return
-
-        plan_segments = []
-        for idx, cmd in enumerate(self.command_queue):
-            if idx == 0:
-                scheduled = cmd.scheduled_start or cmd.start_time
-            else:
-                # đã tính ở _validate_and_schedule_next_command
-                scheduled = cmd.scheduled_start
-
-            segs, h_start, h_end = self._build_segments_for_one_command(
-                start_mw=self.threshold_429,
-                target_mw=cmd.target_mw,
-                start_dt=scheduled,
-                hold_minutes=cmd.hold_minutes
-            )
-
-            # cập nhật lại vào command để truy vấn sau
-            cmd.hold_start = h_start
-            cmd.hold_end = h_end
-
-            plan_segments.extend(segs)
-
-        self.current_plan_segments = plan_segments
-        self.update_plot()
+        # chỉ tính các lệnh chưa có block; đổi cấu hình -> planner tự tính lại toàn bộ
+        self.planner.rebuild(self._plan_config())
+        if self.command_queue:
+            self.update_plot()
         # self.persist_plan_to_excel()
     
-    def render_plan(self):
-        """Vẽ timeline của queue nối lệnh từ self.current_plan_segments."""
-        if not self.current_plan_segments:
-            # Không có gì để vẽ, xóa trục cho sạch
-            self.ax.clear()
-            self.ax.set_title('TREND: POWER DEPEND ON TIMES (Joined Plan)')
-            self.ax.set_xlabel('TIMES')
-            self.ax.set_ylabel('POWER (MW)')
-            self.canvas.draw_idle()
-            return
-
-        xs = [seg["t"] for seg in self.current_plan_segments]
-        ys = [seg["mw"] for seg in self.current_plan_segments]
-
-        self.ax.clear()
-        self.ax.set_title('TREND: POWER DEPEND ON TIMES (Joined Plan)')
-        self.ax.set_xlabel('TIMES')
-        self.ax.set_ylabel('POWER (MW)')
-
-        # dùng draw_series như các chỗ khác cho thống nhất
-        # draw_main_and_joined(
-        #     self.ax,
-        #     main_xy=None,
-        #     joined_segments=self.current_plan_segments,  # [{"t": dt, "mw": val}, ...]
-        #     hold_windows=None,
-        #     override_point=None,
-        #     trim_time=None, trim_mw=None,
-        #     start_time=xs[0] if xs else None,
-        #     start_mw=ys[0] if ys else None,
-        # )
-
-        self.figure.autofmt_xdate()
-        self.canvas.draw_idle()
-
-
     # def persist_plan_to_excel(self):
     #     """
     #     Ghi timeline tối giản vào Excel.
@@ -878,57 +876,6 @@ class PowerChangeWidget(QWidget):
         #         self.excel_updater.append_data(r)
 
     
-    def _compute_last_command_hold_window(self) -> tuple[datetime | None, datetime | None]:
-        # Nếu đã có lệnh nối → giữ nguyên như anh đang làm (quét từ command_queue / segments)
-        if self.command_queue:
-            last = self.command_queue[-1]
-            h_start, h_end = last.hold_start, last.hold_end
-            if h_start is not None and h_end is not None:
-                return h_start, h_end
-            if self.current_plan_segments:
-                hold_end = None
-                hold_start = None
-                for seg in reversed(self.current_plan_segments):
-                    tag = seg.get("tag")
-                    if hold_end is None and tag == "hold_end":
-                        hold_end = seg["t"]
-                    elif tag == "hold_start":
-                        hold_start = seg["t"]
-                        if hold_end is not None:
-                            break
-                if hold_start is not None and hold_end is not None:
-                    last.hold_start, last.hold_end = hold_start, hold_end
-                    return hold_start, hold_end
-            return None, None
-
-        # ⬇️ Fallback khi CHƯA có lệnh nối: dùng cửa sổ HOLD ở 429 (không dùng 462)
-        hold_start_429 = self.time_reaching_429
-        hold_end_429   = self.post_pause_time  # kết thúc pause ở 429 ⇒ tiếp tục ramp
-        return hold_start_429, hold_end_429
-
-
-
-    def _compute_last_command_end_time(self) -> datetime:
-        if not self.command_queue:
-            # end = HOLD_END của 429; nếu thiếu, suy từ 429 + pause_429
-            if self.post_pause_time:
-                return self.post_pause_time
-            if self.time_reaching_429 is not None:
-                return self.time_reaching_429 + timedelta(minutes=self.pause_time_429_min or 0)
-            return datetime.now()
-
-        last = self.command_queue[-1]
-        if last.hold_end is not None:
-            return last.hold_end
-
-        if self.current_plan_segments:
-            for seg in reversed(self.current_plan_segments):
-                if seg.get("tag") == "hold_end":
-                    return seg["t"]
-            return self.current_plan_segments[-1]["t"]
-
-        return last.scheduled_start or last.start_time
-
     def _build_join_inputs(self, parent_layout: QVBoxLayout):
         """Cụm ô nhập NỐI LỆNH (không còn Start MW)."""
         join_row = QHBoxLayout()